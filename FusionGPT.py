@@ -1,14 +1,24 @@
 import os
 import sys
+import threading
 
 # Get the absolute path to the "/lib" folder relative to the current file.
 lib_path = os.path.join(os.path.dirname(__file__), "lib")
 if lib_path not in sys.path:
     sys.path.insert(0, lib_path)
 
+from .lib.startup_timer import StartupTimer
+
+startup_timer = StartupTimer()
+
 # Import the commands module and utilities
-from . import commands
-from .lib import fusionAddInUtils as futil
+with startup_timer.measure('import commands'):
+    from . import commands
+    from .lib import fusionAddInUtils as futil
+
+from . import config
+from .lib import openai_client
+from .lib.storage import storage
 
 # Import FusionGPT class (optional, for advanced features)
 try:
@@ -19,21 +29,39 @@ except ImportError as e:
     FUSIONGPT_AVAILABLE = False
 
 def run(context):
+    try:
+        # Start all commands - this is the main functionality
+        with startup_timer.measure('register commands'):
+            commands.start()
+        print("CadxStudio AI Copilot: Add-in started successfully")
+        futil.log(startup_timer.report())
+
+        # Database, key validation and the OpenAI connection are set up off the main thread
+        threading.Thread(target=_initialize_in_background, name="FusionGPT-startup", daemon=True).start()
+
+    except Exception as e:
+        futil.handle_error('run')
+        print(f"CadxStudio AI Copilot: Error during startup: {e}")
+
+def _initialize_in_background():
     try:
         # Initialize FusionGPT if available (optional)
         if FUSIONGPT_AVAILABLE:
-            fusiongpt = FusionGPT()
+            with startup_timer.measure('FusionGPT init (SQLite, key check)'):
+                FusionGPT()
             print("CadxStudio AI Copilot: FusionGPT initialized successfully")
         else:
             print("CadxStudio AI Copilot: Running in basic mode")
 
-        # Start all commands - this is the main functionality
-        commands.start()
-        print("CadxStudio AI Copilot: Add-in started successfully")
-
+        # Open the OpenAI connection so the first command doesn't pay for it
+        if config.AI_WARM_UP and openai_client.get_client() is not None:
+            with startup_timer.measure('OpenAI connection warm-up'):
+                openai_client.warm_up()
     except Exception as e:
-        futil.handle_error('run')
-        print(f"CadxStudio AI Copilot: Error during startup: {e}")
+        print(f"CadxStudio AI Copilot: Error during background initialization: {e}")
+    finally:
+        # The Fusion API is not used from this thread, so the report goes to the console only
+        print(startup_timer.report())
 
 def stop(context):
     try:
@@ -42,8 +70,10 @@ def stop(context):
 
         # Stop all commands
         commands.stop()
+        openai_client.close_client()
+        storage.close()
         print("CadxStudio AI Copilot: Add-in stopped successfully")
 
     except Exception as e:
         futil.handle_error('stop')
-        print(f"CadxStudio AI Copilot: Error during shutdown: {e}")
\ No newline at end of file
+        print(f"CadxStudio AI Copilot: Error during shutdown: {e}")
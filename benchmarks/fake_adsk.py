@@ -0,0 +1,1096 @@
+"""
+Recording stand-in for the parts of ``adsk.core`` and ``adsk.fusion`` used by
+lib/ai_modeling_actions.py, so the modeling actions run outside Fusion.
+
+No geometry kernel is involved: features only create the bodies, faces and
+timeline items Fusion would, and sketch profiles are derived from the curves
+in the sketch (concentric circles become disks/annuli, fitted splines one
+closed region). Every public method or property used from outside the fake is
+counted as one API call, every fake object created as one allocation, which
+is what the benchmarks in this directory report.
+
+``install()`` registers the fake as ``adsk``, ``adsk.core`` and
+``adsk.fusion`` in sys.modules; ``new_document()`` gives the shared
+application a fresh, empty parametric design.
+"""
+import itertools
+import sys
+import types
+from collections import Counter
+from functools import wraps
+
+
+class Recorder:
+    """Counts API calls and object allocations made from outside the fake"""
+
+    def __init__(self):
+        self.calls = Counter()
+        self.allocations = Counter()
+        self.depth = 0
+
+    def reset(self):
+        self.calls.clear()
+        self.allocations.clear()
+        self.depth = 0
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    @property
+    def total_allocations(self) -> int:
+        return sum(self.allocations.values())
+
+
+recorder = Recorder()
+_ids = itertools.count(1)
+
+
+def _recorded(name, func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        # Calls the fake makes on itself are implementation detail, not API traffic
+        if recorder.depth == 0:
+            if args and isinstance(args[0], _APIObject):
+                # Report inherited members under the class they were called on
+                recorder.calls[f"{type(args[0]).__name__}.{name}"] += 1
+            else:
+                recorder.calls[name] += 1
+        recorder.depth += 1
+        try:
+            return func(*args, **kwargs)
+        finally:
+            recorder.depth -= 1
+    return wrapper
+
+
+class _APIObject:
+    """Base of every fake API class; wraps public members for recording"""
+
+    def __new__(cls, *args, **kwargs):
+        recorder.allocations[cls.__name__] += 1
+        return super().__new__(cls)
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for attr, value in list(vars(cls).items()):
+            if attr.startswith('_'):
+                continue
+            if isinstance(value, property):
+                setattr(cls, attr, property(
+                    _recorded(attr, value.fget) if value.fget else None,
+                    _recorded(attr + "=", value.fset) if value.fset else None
+                ))
+            elif isinstance(value, staticmethod):
+                setattr(cls, attr, staticmethod(_recorded(f"{cls.__name__}.{attr}", value.__func__)))
+            elif callable(value):
+                setattr(cls, attr, _recorded(attr, value))
+
+
+class _Collection(_APIObject):
+    def __init__(self, items=None):
+        self._items = list(items or [])
+
+    @property
+    def count(self):
+        return len(self._items)
+
+    def item(self, index):
+        return self._items[index]
+
+    def __iter__(self):
+        # Fusion collections iterate through item(), one API call per element
+        for index in range(len(self._items)):
+            yield self.item(index)
+
+    def __len__(self):
+        return len(self._items)
+
+
+# ---------------------------------------------------------------- adsk.core
+
+class Point3D(_APIObject):
+    def __init__(self, x=0.0, y=0.0, z=0.0):
+        self._x, self._y, self._z = x, y, z
+
+    @staticmethod
+    def create(x=0.0, y=0.0, z=0.0):
+        return Point3D(x, y, z)
+
+    @property
+    def x(self):
+        return self._x
+
+    @property
+    def y(self):
+        return self._y
+
+    @property
+    def z(self):
+        return self._z
+
+
+class Vector3D(Point3D):
+    @staticmethod
+    def create(x=0.0, y=0.0, z=0.0):
+        return Vector3D(x, y, z)
+
+    def add(self, other):
+        self._x += other._x
+        self._y += other._y
+        self._z += other._z
+        return True
+
+
+class Plane(_APIObject):
+    def __init__(self, origin, normal):
+        self._origin = origin
+        self._normal = normal
+
+    def isCoPlanarTo(self, other):
+        # Fake faces are all horizontal, so planes only differ in height
+        return abs(self._origin._z - other._origin._z) < 1e-9
+
+
+class Matrix3D(_APIObject):
+    def __init__(self, translation=None):
+        self._translation = translation or Vector3D()
+
+    @staticmethod
+    def create():
+        return Matrix3D()
+
+    @property
+    def translation(self):
+        t = self._translation
+        return Vector3D(t._x, t._y, t._z)
+
+    @translation.setter
+    def translation(self, vector):
+        self._translation = Vector3D(vector._x, vector._y, vector._z)
+
+    def _copy(self):
+        return Matrix3D(Vector3D(self._translation._x, self._translation._y, self._translation._z))
+
+
+class ObjectCollection(_Collection):
+    @staticmethod
+    def create():
+        return ObjectCollection()
+
+    def add(self, item):
+        self._items.append(item)
+        return True
+
+
+class ValueInput(_APIObject):
+    def __init__(self, value):
+        self._value = value
+
+    @staticmethod
+    def createByReal(value):
+        return ValueInput(float(value))
+
+    @staticmethod
+    def createByString(expression):
+        return ValueInput(expression)
+
+
+class Selection(_APIObject):
+    def __init__(self, entity):
+        self._entity = entity
+
+    @property
+    def entity(self):
+        return self._entity
+
+
+class Selections(_Collection):
+    def add(self, entity):
+        self._items.append(Selection(entity))
+        return True
+
+    def clear(self):
+        self._items.clear()
+        return True
+
+
+class UserInterface(_APIObject):
+    def __init__(self):
+        self._selections = Selections()
+
+    @property
+    def activeSelections(self):
+        return self._selections
+
+    def messageBox(self, text, *args):
+        return 0
+
+
+class Application(_APIObject):
+    _instance = None
+
+    def __init__(self):
+        self._ui = UserInterface()
+        self._product = None
+
+    @staticmethod
+    def get():
+        if Application._instance is None:
+            Application._instance = Application()
+        return Application._instance
+
+    @property
+    def userInterface(self):
+        return self._ui
+
+    @property
+    def activeProduct(self):
+        return self._product
+
+
+# -------------------------------------------------------------- adsk.fusion
+
+class DesignTypes:
+    DirectDesignType = 0
+    ParametricDesignType = 1
+
+
+class FeatureOperations:
+    JoinFeatureOperation = 0
+    CutFeatureOperation = 1
+    IntersectFeatureOperation = 2
+    NewBodyFeatureOperation = 3
+    NewComponentFeatureOperation = 4
+
+
+class PatternComputeOptions:
+    OptimizedPatternCompute = 0
+    IdenticalPatternCompute = 1
+    AdjustPatternCompute = 2
+
+
+class PatternDistanceType:
+    ExtentPatternDistanceType = 0
+    SpacingPatternDistanceType = 1
+
+
+class TimelineGroup(_APIObject):
+    def __init__(self, start, end):
+        self._range = (start, end)
+        self._name = "Group"
+
+    @property
+    def name(self):
+        return self._name
+
+    @name.setter
+    def name(self, value):
+        self._name = value
+
+
+class TimelineGroups(_Collection):
+    def add(self, start, end):
+        group = TimelineGroup(start, end)
+        self._items.append(group)
+        return group
+
+
+class Timeline(_APIObject):
+    def __init__(self):
+        self._count = 0
+        self._groups = TimelineGroups()
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def timelineGroups(self):
+        return self._groups
+
+
+class Snapshots(_APIObject):
+    def __init__(self):
+        self._pending = False
+
+    @property
+    def hasPendingSnapshot(self):
+        return self._pending
+
+    def add(self):
+        self._pending = False
+        return True
+
+
+class Design(_APIObject):
+    def __init__(self, design_type=DesignTypes.ParametricDesignType):
+        self._type = design_type
+        self._timeline = Timeline()
+        self._snapshots = Snapshots()
+        self._root = Component(self, "Root")
+
+    @staticmethod
+    def cast(obj):
+        return obj if isinstance(obj, Design) else None
+
+    @property
+    def designType(self):
+        return self._type
+
+    @property
+    def rootComponent(self):
+        return self._root
+
+    @property
+    def timeline(self):
+        return self._timeline
+
+    @property
+    def snapshots(self):
+        return self._snapshots
+
+    def _add_timeline_item(self):
+        if self._type == DesignTypes.ParametricDesignType:
+            self._timeline._count += 1
+
+
+class ConstructionPlane(_APIObject):
+    def __init__(self, name, normal):
+        self._name = name
+        self._normal = normal
+
+
+class ConstructionAxisInput(_APIObject):
+    def __init__(self):
+        self._definition = None
+
+    def setByNormalToFaceAtPoint(self, face, point):
+        self._definition = (face, point)
+        return True
+
+
+class ConstructionAxis(_APIObject):
+    def __init__(self, name):
+        self._name = name
+
+
+class ConstructionAxes(_Collection):
+    def __init__(self, component):
+        super().__init__()
+        self._component = component
+
+    def createInput(self, occurrence=None):
+        return ConstructionAxisInput()
+
+    def add(self, axis_input):
+        axis = ConstructionAxis(f"Axis{len(self._items) + 1}")
+        self._items.append(axis)
+        self._component._design._add_timeline_item()
+        return axis
+
+
+class Component(_APIObject):
+    def __init__(self, design, name):
+        self._design = design
+        self._id = f"component-{next(_ids)}"
+        self._name = name
+        self._valid = True
+        self._sketches = Sketches(self)
+        self._features = Features(self)
+        self._occurrences = Occurrences(self)
+        self._bodies = BRepBodies()
+        self._axes = ConstructionAxes(self)
+        self._planes = {
+            "xy": ConstructionPlane("XY", (0, 0, 1)),
+            "xz": ConstructionPlane("XZ", (0, 1, 0))
+        }
+        self._axis = {name: ConstructionAxis(name) for name in ("X", "Y", "Z")}
+
+    @property
+    def id(self):
+        return self._id
+
+    @property
+    def name(self):
+        return self._name
+
+    @name.setter
+    def name(self, value):
+        self._name = value
+
+    @property
+    def isValid(self):
+        return self._valid
+
+    @property
+    def sketches(self):
+        return self._sketches
+
+    @property
+    def features(self):
+        return self._features
+
+    @property
+    def occurrences(self):
+        return self._occurrences
+
+    @property
+    def bRepBodies(self):
+        return self._bodies
+
+    @property
+    def constructionAxes(self):
+        return self._axes
+
+    @property
+    def xYConstructionPlane(self):
+        return self._planes["xy"]
+
+    @property
+    def xZConstructionPlane(self):
+        return self._planes["xz"]
+
+    @property
+    def xConstructionAxis(self):
+        return self._axis["X"]
+
+    @property
+    def yConstructionAxis(self):
+        return self._axis["Y"]
+
+    @property
+    def zConstructionAxis(self):
+        return self._axis["Z"]
+
+
+class Occurrence(_APIObject):
+    def __init__(self, component, transform):
+        self._component = component
+        self._transform = transform._copy()
+        self._valid = True
+
+    @property
+    def component(self):
+        return self._component
+
+    @property
+    def transform2(self):
+        return self._transform._copy()
+
+    @transform2.setter
+    def transform2(self, matrix):
+        self._transform = matrix._copy()
+        self._component._design._snapshots._pending = True
+
+    @property
+    def isValid(self):
+        return self._valid
+
+    def deleteMe(self):
+        self._valid = False
+        self._component._design._root._occurrences._items.remove(self)
+        return True
+
+
+class Occurrences(_Collection):
+    def __init__(self, component):
+        super().__init__()
+        self._component = component
+
+    def addNewComponent(self, transform):
+        design = self._component._design
+        occurrence = Occurrence(Component(design, f"Component{len(self._items) + 1}"), transform)
+        self._items.append(occurrence)
+        design._add_timeline_item()
+        return occurrence
+
+    def addExistingComponent(self, component, transform):
+        occurrence = Occurrence(component, transform)
+        self._items.append(occurrence)
+        self._component._design._add_timeline_item()
+        return occurrence
+
+
+class BRepFace(_APIObject):
+    def __init__(self, body, center, occurrence=None, native=None):
+        self._body = body
+        self._center = center
+        self._occurrence = occurrence
+        self._native = native
+
+    @property
+    def body(self):
+        return self._body
+
+    @property
+    def pointOnFace(self):
+        return Point3D(*self._center)
+
+    @property
+    def geometry(self):
+        return Plane(Point3D(*self._center), Vector3D(0.0, 0.0, 1.0))
+
+    @property
+    def assemblyContext(self):
+        return self._occurrence
+
+    @property
+    def nativeObject(self):
+        return self._native
+
+    def createForAssemblyContext(self, occurrence):
+        return BRepFace(self._body.createForAssemblyContext(occurrence), self._center, occurrence, self)
+
+
+class BRepFaces(_Collection):
+    pass
+
+
+class BRepBody(_APIObject):
+    def __init__(self, component, faces=6, occurrence=None, native=None, offset=0.0):
+        self._component = component
+        self._occurrence = occurrence
+        self._native = native
+        # Face i lies at height i; bodies side by side along X
+        self._faces = BRepFaces(BRepFace(self, (offset, 0.0, float(index))) for index in range(faces))
+
+    @property
+    def parentComponent(self):
+        return self._component
+
+    @property
+    def faces(self):
+        return self._faces
+
+    @property
+    def assemblyContext(self):
+        return self._occurrence
+
+    @property
+    def nativeObject(self):
+        return self._native
+
+    def createForAssemblyContext(self, occurrence):
+        proxy = BRepBody(self._component, 0, occurrence, self)
+        proxy._faces = BRepFaces(BRepFace(proxy, face._center, occurrence, face) for face in self._faces._items)
+        return proxy
+
+
+class BRepBodies(_Collection):
+    pass
+
+
+# Sketches and profiles
+
+class SketchPoint(_APIObject):
+    def __init__(self, point):
+        self._point = point
+
+    @property
+    def geometry(self):
+        return Point3D(self._point._x, self._point._y, self._point._z)
+
+
+class SketchCurve(_APIObject):
+    def __init__(self, sketch):
+        self._sketch = sketch
+        self._construction = False
+
+    @property
+    def isConstruction(self):
+        return self._construction
+
+    @isConstruction.setter
+    def isConstruction(self, value):
+        self._construction = value
+        self._sketch._changed()
+
+
+class SketchLine(SketchCurve):
+    pass
+
+
+class SketchCircle(SketchCurve):
+    def __init__(self, sketch, center, radius):
+        super().__init__(sketch)
+        self._center = center
+        self._radius = radius
+
+
+class SketchArc(SketchCurve):
+    pass
+
+
+class SketchFittedSpline(SketchCurve):
+    def __init__(self, sketch, points):
+        super().__init__(sketch)
+        self._points = points
+
+    @property
+    def endSketchPoint(self):
+        return SketchPoint(self._points[-1])
+
+
+class SketchLineList(_Collection):
+    pass
+
+
+class SketchLines(_Collection):
+    def __init__(self, sketch):
+        super().__init__()
+        self._sketch = sketch
+
+    def addByTwoPoints(self, start, end):
+        line = SketchLine(self._sketch)
+        self._items.append(line)
+        self._sketch._changed()
+        return line
+
+    def addTwoPointRectangle(self, corner, opposite):
+        lines = [SketchLine(self._sketch) for _ in range(4)]
+        self._items.extend(lines)
+        self._sketch._changed()
+        return SketchLineList(lines)
+
+
+class SketchCircles(_Collection):
+    def __init__(self, sketch):
+        super().__init__()
+        self._sketch = sketch
+
+    def addByCenterRadius(self, center, radius):
+        circle = SketchCircle(self._sketch, center, radius)
+        self._items.append(circle)
+        self._sketch._changed()
+        return circle
+
+
+class SketchArcs(_Collection):
+    def __init__(self, sketch):
+        super().__init__()
+        self._sketch = sketch
+
+    def addByCenterStartEnd(self, center, start, end):
+        return self._add()
+
+    def addByThreePoints(self, start, middle, end):
+        return self._add()
+
+    def _add(self):
+        arc = SketchArc(self._sketch)
+        self._items.append(arc)
+        self._sketch._changed()
+        return arc
+
+
+class SketchFittedSplines(_Collection):
+    def __init__(self, sketch):
+        super().__init__()
+        self._sketch = sketch
+
+    def add(self, points):
+        spline = SketchFittedSpline(self._sketch, list(points._items))
+        self._items.append(spline)
+        self._sketch._changed()
+        return spline
+
+
+class SketchCurves(_APIObject):
+    def __init__(self, sketch):
+        self._lines = SketchLines(sketch)
+        self._circles = SketchCircles(sketch)
+        self._arcs = SketchArcs(sketch)
+        self._splines = SketchFittedSplines(sketch)
+
+    @property
+    def sketchLines(self):
+        return self._lines
+
+    @property
+    def sketchCircles(self):
+        return self._circles
+
+    @property
+    def sketchArcs(self):
+        return self._arcs
+
+    @property
+    def sketchFittedSplines(self):
+        return self._splines
+
+
+class SketchPoints(_Collection):
+    def add(self, point):
+        sketch_point = SketchPoint(point)
+        self._items.append(sketch_point)
+        return sketch_point
+
+
+class ProfileCurve(_APIObject):
+    def __init__(self, entity):
+        self._entity = entity
+
+    @property
+    def sketchEntity(self):
+        return self._entity
+
+
+class ProfileCurves(_Collection):
+    pass
+
+
+class ProfileLoop(_APIObject):
+    def __init__(self, curves):
+        self._curves = ProfileCurves(ProfileCurve(curve) for curve in curves)
+
+    @property
+    def profileCurves(self):
+        return self._curves
+
+
+class ProfileLoops(_Collection):
+    pass
+
+
+class Profile(_APIObject):
+    def __init__(self, loops):
+        self._loops = ProfileLoops(ProfileLoop(curves) for curves in loops)
+
+    @property
+    def profileLoops(self):
+        return self._loops
+
+
+class Profiles(_Collection):
+    pass
+
+
+class Sketch(_APIObject):
+    def __init__(self, component, plane):
+        self._component = component
+        self._plane = plane
+        self._deferred = False
+        self._curves = SketchCurves(self)
+        self._points = SketchPoints()
+        self._profiles = None
+        self.computeCount = 0
+
+    @property
+    def isComputeDeferred(self):
+        return self._deferred
+
+    @isComputeDeferred.setter
+    def isComputeDeferred(self, value):
+        self._deferred = value
+        if not value:
+            self._changed()
+
+    @property
+    def sketchCurves(self):
+        return self._curves
+
+    @property
+    def sketchPoints(self):
+        return self._points
+
+    @property
+    def profiles(self):
+        if self._profiles is None:
+            self._profiles = self._compute_profiles()
+        return self._profiles
+
+    def modelToSketchSpace(self, point):
+        return Point3D(point._x, point._y, 0.0)
+
+    def _changed(self):
+        # Fusion re-solves the sketch after every edit unless compute is deferred
+        self._profiles = None
+        if not self._deferred:
+            self.computeCount += 1
+            recorder.calls["Sketch.<compute>"] += 1
+
+    def _compute_profiles(self):
+        curves = self._curves
+        solid = lambda items: [curve for curve in items._items if not curve._construction]
+        circles = sorted(solid(curves._circles), key=lambda circle: circle._radius, reverse=True)
+        splines = solid(curves._splines)
+        profiles = []
+        if splines:
+            # Tooth-like region closed by splines and arcs
+            profiles.append(Profile([splines + solid(curves._arcs)]))
+        elif solid(curves._lines) or solid(curves._arcs):
+            profiles.append(Profile([solid(curves._lines) + solid(curves._arcs)]))
+        # Concentric circles: annuli from the outside in, the innermost a disk.
+        # Circles around different centers are separate regions.
+        centers = {}
+        for circle in circles:
+            centers.setdefault((circle._center._x, circle._center._y), []).append(circle)
+        for group in centers.values():
+            for index, circle in enumerate(group):
+                loops = [[circle]] if index == len(group) - 1 else [[circle], [group[index + 1]]]
+                profiles.append(Profile(loops))
+        return Profiles(profiles)
+
+
+class Sketches(_Collection):
+    def __init__(self, component):
+        super().__init__()
+        self._component = component
+
+    def add(self, plane_or_face, occurrence=None):
+        sketch = Sketch(self._component, plane_or_face)
+        self._items.append(sketch)
+        self._component._design._add_timeline_item()
+        return sketch
+
+    def addWithoutEdges(self, plane_or_face, occurrence=None):
+        return self.add(plane_or_face, occurrence)
+
+
+# Features
+
+class _FeatureInput(_APIObject):
+    def __init__(self, entities, operation=FeatureOperations.NewBodyFeatureOperation):
+        self._entities = entities
+        self._operation = operation
+        self._extent = None
+        self._participants = None
+
+    @property
+    def participantBodies(self):
+        return list(self._participants or [])
+
+    @participantBodies.setter
+    def participantBodies(self, bodies):
+        self._participants = list(bodies)
+
+
+class ExtrudeFeatureInput(_FeatureInput):
+    def setDistanceExtent(self, is_symmetric, distance):
+        self._extent = distance
+        return True
+
+
+class RevolveFeatureInput(_FeatureInput):
+    def setAngleExtent(self, is_symmetric, angle):
+        self._extent = angle
+        return True
+
+
+class MoveFeatureInput(_FeatureInput):
+    def __init__(self, entities):
+        super().__init__(entities)
+        self._transform = Matrix3D()
+
+    @property
+    def inputEntities(self):
+        return self._entities
+
+    @property
+    def transform(self):
+        return self._transform
+
+    @transform.setter
+    def transform(self, matrix):
+        self._transform = matrix
+
+
+class _PatternInput(_FeatureInput):
+    def __init__(self, entities):
+        super().__init__(entities)
+        self._compute = PatternComputeOptions.OptimizedPatternCompute
+
+    @property
+    def patternComputeOption(self):
+        return self._compute
+
+    @patternComputeOption.setter
+    def patternComputeOption(self, value):
+        self._compute = value
+
+
+class CircularPatternFeatureInput(_PatternInput):
+    def __init__(self, entities, axis):
+        super().__init__(entities)
+        self._axis = axis
+        self._quantity = ValueInput(1.0)
+        self._angle = ValueInput("360 deg")
+        self._symmetric = False
+
+    @property
+    def quantity(self):
+        return self._quantity
+
+    @quantity.setter
+    def quantity(self, value):
+        self._quantity = value
+
+    @property
+    def totalAngle(self):
+        return self._angle
+
+    @totalAngle.setter
+    def totalAngle(self, value):
+        self._angle = value
+
+    @property
+    def isSymmetric(self):
+        return self._symmetric
+
+    @isSymmetric.setter
+    def isSymmetric(self, value):
+        self._symmetric = value
+
+
+class RectangularPatternFeatureInput(_PatternInput):
+    def __init__(self, entities, direction, quantity, distance, distance_type):
+        super().__init__(entities)
+        self._directions = [(direction, quantity, distance)]
+
+    def setDirectionTwo(self, direction, quantity, distance):
+        self._directions.append((direction, quantity, distance))
+        return True
+
+
+class Feature(_APIObject):
+    def __init__(self, bodies):
+        self._bodies = BRepBodies(bodies)
+
+    @property
+    def bodies(self):
+        return self._bodies
+
+
+class _FeatureCollection(_Collection):
+    def __init__(self, component):
+        super().__init__()
+        self._component = component
+
+    def _add(self, feature_input):
+        bodies = []
+        if feature_input._operation == FeatureOperations.NewBodyFeatureOperation and feature_input._entities is not None:
+            body = BRepBody(self._component)
+            self._component._bodies._items.append(body)
+            bodies.append(body)
+        elif feature_input._participants:
+            bodies.extend(feature_input._participants)
+        feature = Feature(bodies)
+        self._items.append(feature)
+        self._component._design._add_timeline_item()
+        return feature
+
+
+class ExtrudeFeatures(_FeatureCollection):
+    def createInput(self, profile, operation):
+        return ExtrudeFeatureInput(profile, operation)
+
+    def add(self, feature_input):
+        return self._add(feature_input)
+
+
+class RevolveFeatures(_FeatureCollection):
+    def createInput(self, profile, axis, operation):
+        return RevolveFeatureInput(profile, operation)
+
+    def add(self, feature_input):
+        return self._add(feature_input)
+
+
+class MoveFeatures(_FeatureCollection):
+    def createInput(self, entities):
+        return MoveFeatureInput(entities)
+
+    def add(self, feature_input):
+        feature_input._operation = None
+        return self._add(feature_input)
+
+
+class CircularPatternFeatures(_FeatureCollection):
+    def createInput(self, entities, axis):
+        return CircularPatternFeatureInput(entities, axis)
+
+    def add(self, feature_input):
+        feature_input._operation = None
+        return self._add(feature_input)
+
+
+class RectangularPatternFeatures(_FeatureCollection):
+    def createInput(self, entities, direction, quantity, distance, distance_type):
+        return RectangularPatternFeatureInput(entities, direction, quantity, distance, distance_type)
+
+    def add(self, feature_input):
+        feature_input._operation = None
+        return self._add(feature_input)
+
+
+class Features(_APIObject):
+    def __init__(self, component):
+        self._extrudes = ExtrudeFeatures(component)
+        self._revolves = RevolveFeatures(component)
+        self._moves = MoveFeatures(component)
+        self._circular = CircularPatternFeatures(component)
+        self._rectangular = RectangularPatternFeatures(component)
+
+    @property
+    def extrudeFeatures(self):
+        return self._extrudes
+
+    @property
+    def revolveFeatures(self):
+        return self._revolves
+
+    @property
+    def moveFeatures(self):
+        return self._moves
+
+    @property
+    def circularPatternFeatures(self):
+        return self._circular
+
+    @property
+    def rectangularPatternFeatures(self):
+        return self._rectangular
+
+
+# ------------------------------------------------------------------ install
+
+_CORE = [Application, UserInterface, Selections, Selection, Point3D, Vector3D, Plane, Matrix3D, ObjectCollection,
+         ValueInput]
+_FUSION = [
+    Design, DesignTypes, FeatureOperations, PatternComputeOptions, PatternDistanceType, Component, Occurrence,
+    Occurrences, BRepBody, BRepBodies, BRepFace, BRepFaces, Sketch, Sketches, SketchPoint, SketchLine, SketchCircle,
+    SketchArc, SketchFittedSpline, Profile, ProfileLoop, ProfileCurve, ConstructionAxis, ConstructionPlane,
+    Timeline, TimelineGroup, Snapshots, Feature
+]
+
+
+def install() -> types.ModuleType:
+    """Register the fake as the ``adsk`` package and return it"""
+    if 'adsk' in sys.modules and getattr(sys.modules['adsk'], '__fake__', False):
+        return sys.modules['adsk']
+
+    adsk = types.ModuleType('adsk')
+    adsk.__fake__ = True
+    adsk.core = types.ModuleType('adsk.core')
+    adsk.fusion = types.ModuleType('adsk.fusion')
+    for module, classes in ((adsk.core, _CORE), (adsk.fusion, _FUSION)):
+        for cls in classes:
+            setattr(module, cls.__name__, cls)
+    sys.modules.update({'adsk': adsk, 'adsk.core': adsk.core, 'adsk.fusion': adsk.fusion})
+    return adsk
+
+
+def new_document(design_type=DesignTypes.ParametricDesignType) -> Design:
+    """Give the application a new empty design and clear the selection"""
+    app = Application.get()
+    app._product = Design(design_type)
+    app._ui._selections._items.clear()
+    return app._product
+
+
+def select(*entities) -> None:
+    """Replace the active selection with the given entities"""
+    selections = Application.get()._ui._selections
+    selections._items.clear()
+    selections._items.extend(Selection(entity) for entity in entities)
@@ -0,0 +1,218 @@
+"""
+Benchmarks for the geometry actions in lib/ai_modeling_actions.py, run
+outside Fusion against the recording fake in fake_adsk.py.
+
+Every case runs one action (or batch) on a fresh design and reports the
+median wall time, the number of Fusion API calls, the number of API objects
+allocated and the peak Python memory. API calls and allocations are exact,
+so any increase over the stored baseline is a regression. Wall time depends
+on the machine the baselines were taken on; it is reported as "slower" when it
+grows by more than the tolerance and only fails the run with --fail-on-time.
+
+    python benchmarks/run_benchmarks.py                    # run and compare
+    python benchmarks/run_benchmarks.py --update-baselines # store new baselines
+    python benchmarks/run_benchmarks.py --filter gear --detail
+"""
+import argparse
+import importlib
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+import types
+from pathlib import Path
+
+import fake_adsk
+
+ROOT = Path(__file__).resolve().parent.parent
+BASELINES = Path(__file__).resolve().parent / "baselines.json"
+PACKAGE = "fusiongpt_addin"
+
+
+def load_actions_module():
+    """Import lib.ai_modeling_actions as part of the add-in package, on the fake adsk"""
+    fake_adsk.install()
+    if PACKAGE not in sys.modules:
+        # The add-in folder is loaded by Fusion as a package; mirror that
+        package = types.ModuleType(PACKAGE)
+        package.__path__ = [str(ROOT)]
+        sys.modules[PACKAGE] = package
+    module = importlib.import_module(f"{PACKAGE}.lib.ai_modeling_actions")
+    # Keep benchmark runs out of the add-in's metrics table
+    module.metrics.enabled = False
+    return module
+
+
+# Setups run before measuring and return nothing; the selection they leave is what the action sees
+
+def _first_part(design):
+    occurrence = design._root._occurrences._items[-1]
+    body = occurrence._component._bodies._items[0]
+    return body.createForAssemblyContext(occurrence)
+
+
+def select_box_face(actions, design):
+    actions.execute_command("create_box", {"length": 200, "width": 200, "height": 20})
+    fake_adsk.select(_first_part(design).faces.item(0))
+
+
+def select_box_body(actions, design):
+    actions.execute_command("create_box", {"length": 20, "width": 20, "height": 20})
+    fake_adsk.select(_first_part(design))
+
+
+def _root_bodies(design, count):
+    root = design._root
+    for index in range(count):
+        root._bodies._items.append(fake_adsk.BRepBody(root, offset=10.0 * index))
+    return root._bodies._items
+
+
+def select_coplanar_faces(actions, design):
+    fake_adsk.select(*(body.faces.item(0) for body in _root_bodies(design, 20)))
+
+
+def select_root_bodies(actions, design):
+    fake_adsk.select(*_root_bodies(design, 20))
+
+
+def existing_gear(actions, design):
+    actions.execute_command("create_gear", {"number_of_teeth": 40})
+
+
+def _case(name, action, parameters, setup=None):
+    return {"name": name, "action": action, "parameters": parameters, "setup": setup}
+
+
+def build_cases():
+    cases = [
+        _case("box", "create_box", {"length": 30, "width": 20, "height": 10}),
+        _case("cylinder", "create_cylinder", {"radius": 10, "height": 25}),
+        _case("sphere", "create_sphere", {"radius": 15}),
+    ]
+    for teeth in (10, 20, 50, 100, 200, 500):
+        cases.append(_case(f"gear_{teeth}_teeth", "create_gear", {"number_of_teeth": teeth, "module": 2.0}))
+    cases += [
+        _case("gear_instance", "create_gear", {"number_of_teeth": 40}, existing_gear),
+        _case("hole", "create_hole", {"diameter": 8, "depth": 15}, select_box_face),
+        _case("extrude_face", "extrude_face", {"distance": 10}, select_box_face),
+        _case("move_body", "move_body", {"x": 15, "y": 0, "z": 0}, select_box_body),
+        _case("hole_20_faces", "create_hole", {"diameter": 8, "depth": 15}, select_coplanar_faces),
+        _case("extrude_20_faces", "extrude_face", {"distance": 10}, select_coplanar_faces),
+        _case("move_20_bodies", "move_body", {"x": 15, "y": 0, "z": 0}, select_root_bodies),
+    ]
+    for rows, columns in ((2, 2), (5, 5), (20, 20)):
+        cases.append(_case(f"rectangular_pattern_{rows}x{columns}", "rectangular_pattern",
+                           {"rows": rows, "columns": columns, "row_spacing": 8, "column_spacing": 8}, select_box_face))
+    for count in (6, 24, 100):
+        cases.append(_case(f"circular_pattern_{count}", "circular_pattern",
+                           {"count": count, "radius": 60}, select_box_face))
+    for size in (10, 50):
+        steps = [{"action": "create_box", "parameters": {"length": 10 + index, "width": 10, "height": 10}}
+                 for index in range(size)]
+        cases.append(_case(f"batch_{size}_boxes", "execute_actions", steps))
+    return cases
+
+
+def run_case(module, case, repeat):
+    """Run one case ``repeat`` times; API counts come from the last run, time is the median"""
+    times = []
+    peak = 0
+    result = None
+    for _ in range(repeat):
+        design = fake_adsk.new_document()
+        actions = module.AIModelingActions()
+        if case["setup"]:
+            case["setup"](actions, design)
+
+        fake_adsk.recorder.reset()
+        tracemalloc.start()
+        start = time.perf_counter()
+        if case["action"] == "execute_actions":
+            result = actions.execute_actions(case["parameters"])
+        else:
+            result = actions.execute_command(case["action"], case["parameters"])
+        times.append((time.perf_counter() - start) * 1000)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    recorder = fake_adsk.recorder
+    return {
+        "success": bool(result.get("success")),
+        "message": result.get("message", ""),
+        "wall_ms": round(statistics.median(times), 3),
+        "api_calls": recorder.total_calls,
+        "objects": recorder.total_allocations,
+        "peak_kib": round(peak / 1024, 1),
+        "calls": dict(recorder.calls),
+    }
+
+
+def compare(measured, baseline, tolerance):
+    """Return (regressions, slowdowns) of one case against its baseline"""
+    if not baseline:
+        return [], []
+    regressions = [
+        f"{key} {baseline[key]} -> {measured[key]}"
+        for key in ("api_calls", "objects") if measured[key] > baseline[key]
+    ]
+    slowdowns = []
+    # Sub-millisecond differences are noise
+    if measured["wall_ms"] > baseline["wall_ms"] * (1 + tolerance) and measured["wall_ms"] - baseline["wall_ms"] > 0.5:
+        slowdowns.append(f"wall_ms {baseline['wall_ms']} -> {measured['wall_ms']}")
+    return regressions, slowdowns
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Fusion geometry actions on a fake adsk")
+    parser.add_argument("--filter", default="", help="only run cases whose name contains this text")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per case (median wall time is reported)")
+    parser.add_argument("--tolerance", type=float, default=1.0, help="allowed relative wall time increase")
+    parser.add_argument("--fail-on-time", action="store_true", help="treat wall time increases as regressions")
+    parser.add_argument("--update-baselines", action="store_true", help="store the results as the new baselines")
+    parser.add_argument("--detail", action="store_true", help="print the API calls made by each case")
+    args = parser.parse_args(argv)
+
+    module = load_actions_module()
+    baselines = json.loads(BASELINES.read_text()) if BASELINES.exists() else {}
+    cases = [case for case in build_cases() if args.filter in case["name"]]
+
+    print(f"{'case':<28}{'wall ms':>10}{'API calls':>11}{'objects':>9}{'peak KiB':>10}  status")
+    results = {}
+    failures = 0
+    for case in cases:
+        measured = run_case(module, case, max(1, args.repeat))
+        results[case["name"]] = measured
+        if not measured["success"]:
+            status = f"FAILED: {measured['message']}"
+            failures += 1
+        else:
+            regressions, slowdowns = compare(measured, baselines.get(case["name"]), args.tolerance)
+            if args.fail_on_time:
+                regressions, slowdowns = regressions + slowdowns, []
+            if regressions:
+                status = "REGRESSION: " + ", ".join(regressions)
+            elif slowdowns:
+                status = "slower: " + ", ".join(slowdowns)
+            else:
+                status = "ok" if case["name"] in baselines else "new"
+            failures += bool(regressions)
+        print(f"{case['name']:<28}{measured['wall_ms']:>10.3f}{measured['api_calls']:>11}"
+              f"{measured['objects']:>9}{measured['peak_kib']:>10.1f}  {status}")
+        if args.detail:
+            for call, count in sorted(measured["calls"].items(), key=lambda item: (-item[1], item[0])):
+                print(f"    {count:>6}  {call}")
+
+    if args.update_baselines:
+        for name, measured in results.items():
+            if measured["success"]:
+                baselines[name] = {key: measured[key] for key in ("wall_ms", "api_calls", "objects")}
+        BASELINES.write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n")
+        print(f"Baselines written to {BASELINES}")
+        return 0
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
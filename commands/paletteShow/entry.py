@@ -1,10 +1,15 @@
 import json
+import threading
+import time
+import uuid
 import adsk.core
+import adsk.fusion
 import os
 from ...lib import fusionAddInUtils as futil
+from ...lib.metrics import metrics
+from ...lib.palette_bus import PaletteBus
+from ...lib.storage import storage
 from ... import config
-from ...lib.ai_service import AIService
-from ...lib.ai_modeling_actions import AIModelingActions
 from datetime import datetime
 
 app = adsk.core.Application.get()
@@ -35,12 +40,115 @@ COMMAND_BESIDE_ID = 'ScriptsManagerCommand'
 # Resource location for command icons
 ICON_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resources', '')
 
+# Custom event used to hand interpretations from the worker threads back to the main thread
+AI_RESULT_EVENT_ID = f'{config.COMPANY_NAME}_{config.ADDIN_NAME}_aiResult'
+
 # Local list of event handlers
 local_handlers = []
 
-# Initialize AI services
-ai_service = AIService()
-modeling_actions = AIModelingActions()
+# AI services are created on first use so loading the add-in stays cheap
+_ai_service = None
+_modeling_actions = None
+_ai_workers = None
+_history = None
+ai_result_event = None
+
+# request id -> perf_counter() when the command was queued, for the command_total span
+_submitted_at = {}
+
+# request id -> prompt, for the command history
+_prompts = {}
+
+# job id -> running design table batch
+_batch_jobs = {}
+
+
+def _send_to_palette(action: str, data: str) -> bool:
+    palette = ui.palettes.itemById(PALETTE_ID)
+    if palette is None:
+        return False
+    palette.sendInfoToHTML(action, data)
+    return True
+
+
+def _schedule_flush(delay: float):
+    """Send the progress the bus is holding back once delay seconds have passed"""
+    timer = threading.Timer(delay, app.fireCustomEvent, (AI_RESULT_EVENT_ID, json.dumps({"type": "busFlush"})))
+    timer.daemon = True
+    timer.start()
+
+
+def _log_bus(message: str, error: bool):
+    level = adsk.core.LogLevels.ErrorLogLevel if error else adsk.core.LogLevels.InfoLogLevel
+    futil.log(f'{CMD_NAME}: {message}', level)
+
+
+def _log_storage_error(message: str):
+    """Hand a failed storage write to the main thread, which logs it"""
+    app.fireCustomEvent(AI_RESULT_EVENT_ID, json.dumps({"type": "storageError", "message": message}))
+
+
+# Request/response channel to palette.js; handlers are registered below by message type
+bus = PaletteBus(_send_to_palette, config.PALETTE_FRAME_INTERVAL, _schedule_flush, _log_bus)
+
+
+def get_ai_service():
+    global _ai_service
+    if _ai_service is None:
+        from ...lib.ai_service import AIService
+        _ai_service = AIService()
+        _ai_service.design_index = get_modeling_actions().index
+    return _ai_service
+
+
+def get_modeling_actions():
+    global _modeling_actions
+    if _modeling_actions is None:
+        from ...lib.ai_modeling_actions import AIModelingActions
+        _modeling_actions = AIModelingActions()
+        # Exports run one per custom event so Fusion handles input between files
+        _modeling_actions.exports.schedule = lambda: app.fireCustomEvent(
+            AI_RESULT_EVENT_ID, json.dumps({"type": "exportStep"}))
+    return _modeling_actions
+
+
+def get_history():
+    global _history
+    if _history is None:
+        from ...lib.command_history import CommandHistory
+        _history = CommandHistory(max_entries=config.HISTORY_MAX_ENTRIES)
+    return _history
+
+
+def get_ai_workers():
+    global _ai_workers
+    if _ai_workers is None:
+        from ...lib.ai_worker import AIWorkerPool
+        _ai_workers = AIWorkerPool(
+            get_ai_service(),
+            _on_interpretation_complete,
+            max_workers=config.AI_WORKER_THREADS,
+            on_progress=_on_interpretation_progress
+        )
+    return _ai_workers
+
+
+def _on_interpretation_complete(request_id: str, ai_response: dict):
+    """Called on a worker thread; forwards the result to the main thread."""
+    app.fireCustomEvent(AI_RESULT_EVENT_ID, json.dumps({
+        "type": "result",
+        "requestId": request_id,
+        "aiResponse": ai_response
+    }))
+
+
+def _on_interpretation_progress(request_id: str, status: str):
+    """Called on a worker thread while a response streams in."""
+    app.fireCustomEvent(AI_RESULT_EVENT_ID, json.dumps({
+        "type": "progress",
+        "requestId": request_id,
+        "status": status
+    }))
 
 
 def start():
@@ -57,6 +165,17 @@ def start():
     control = panel.controls.addCommand(cmd_def, COMMAND_BESIDE_ID, False)
     control.isPromoted = IS_PROMOTED
 
+    # Register the event that delivers AI interpretations back to the main thread
+    global ai_result_event
+    ai_result_event = app.registerCustomEvent(AI_RESULT_EVENT_ID)
+    futil.add_handler(ai_result_event, ai_result_ready)
+    # Storage writes fail on its flusher thread; they are logged here through the same event
+    storage.log = _log_storage_error
+
+    # Keep the design index current as documents switch and commands change the design
+    futil.add_handler(app.documentActivated, document_activated)
+    futil.add_handler(ui.commandTerminated, command_terminated)
+
 
 def stop():
     """Executed when add-in is stopped."""
@@ -67,6 +186,27 @@ def stop():
     command_definition = ui.commandDefinitions.itemById(CMD_ID)
     palette = ui.palettes.itemById(PALETTE_ID)
 
+    # Stop interpreting and release the custom event
+    global _ai_workers, _ai_service, _modeling_actions, _history, ai_result_event
+    if _ai_workers:
+        _ai_workers.shutdown()
+        _ai_workers = None
+    if _ai_service:
+        _ai_service.close()
+        _ai_service = None
+    if _modeling_actions:
+        # Nothing will handle the exportStep events of what is still queued
+        _modeling_actions.exports.clear()
+        _modeling_actions = None
+    _history = None
+    _submitted_at.clear()
+    _prompts.clear()
+    _batch_jobs.clear()
+    storage.log = None
+    if ai_result_event:
+        app.unregisterCustomEvent(AI_RESULT_EVENT_ID)
+        ai_result_event = None
+
     # Delete the button command control
     if command_control:
         command_control.deleteMe()
@@ -137,88 +277,414 @@ def palette_navigating(args: adsk.core.NavigationEventArgs):
 
 
 def palette_incoming(html_args: adsk.core.HTMLEventArgs):
-    """Handle events sent from JavaScript in the palette."""
-    futil.log(f'{CMD_NAME}: Palette incoming event.')
-
+    """Handle messages sent from JavaScript in the palette."""
     try:
-        message_data: dict = json.loads(html_args.data)
-        message_action = html_args.action
-
-        log_msg = f"Event received from {html_args.firingEvent.sender.name}\n"
-        log_msg += f"Action: {message_action}\n"
-        log_msg += f"Data: {message_data}"
-        futil.log(log_msg, adsk.core.LogLevels.InfoLogLevel)
-
-        # Handle AI command processing
-        if message_action == 'processAICommand':
-            response = process_ai_command(message_data)
-            html_args.returnData = json.dumps(response)
-            return
-
-        # Handle legacy message from palette
-        elif message_action == 'messageFromPalette':
-            arg1 = message_data.get('arg1', 'arg1 not sent')
-            arg2 = message_data.get('arg2', 'arg2 not sent')
-
-            msg = 'An event has been fired from the html to Fusion with the following data:<br/>'
-            msg += f'<b>Action</b>: {message_action}<br/><b>arg1</b>: {arg1}<br/><b>arg2</b>: {arg2}'               
-            ui.messageBox(msg)
-
-        # Return timestamp
-        now = datetime.now()
-        currentTime = now.strftime('%H:%M:%S')
-        html_args.returnData = f'OK - {currentTime}'
-
+        html_args.returnData = bus.dispatch(html_args.action, html_args.data)
     except Exception as e:
         error_msg = f"Error processing palette message: {str(e)}"
-        futil.log(error_msg, adsk.core.LogLevels.ErrorLogLevel)
+        futil.log(f"{error_msg}\nAction: {html_args.action}\nData: {html_args.data}",
+                  adsk.core.LogLevels.ErrorLogLevel)
         html_args.returnData = json.dumps({
             "success": False,
             "error": error_msg
         })
+    # Results the handler queued go out in one frame
+    bus.flush()
 
 
-def process_ai_command(message_data: dict) -> dict:
-    """Process AI command and execute in Fusion 360."""
-    try:
-        command = message_data.get('command', '').strip()
-        
-        if not command:
-            return {
-                "success": False,
-                "error": "No command provided"
-            }
+# Report prompt cache counters
+@bus.handler('getCacheStats')
+def get_cache_stats(message_data: dict, request_id: str = None) -> dict:
+    return get_ai_service().get_cache_stats()
 
-        futil.log(f"Processing AI command: {command}")
 
-        # Step 1: Process natural language with AI
-        ai_response = ai_service.process_natural_language_command(command)
-        
+# Latency percentiles per stage and action for the performance panel
+@bus.handler('getMetrics')
+def get_metrics(message_data: dict, request_id: str = None) -> dict:
+    return metrics.summary(message_data.get('sinceSeconds'))
+
+
+# Timings only the palette can measure
+@bus.handler('reportMetric')
+def report_metric(message_data: dict, request_id: str = None) -> dict:
+    if message_data.get('stage') == 'palette_round_trip':
+        metrics.record(
+            'palette_round_trip',
+            float(message_data.get('durationMs', 0)),
+            action=message_data.get('action'),
+            success=bool(message_data.get('success', True)),
+            request_id=message_data.get('requestId')
+        )
+    return {"success": True}
+
+
+# Command history and macros
+@bus.handler('getHistory')
+def get_command_history(message_data: dict, request_id: str = None) -> dict:
+    return {
+        "success": True,
+        "entries": get_history().recent(int(message_data.get('limit', 50))),
+        "macros": get_history().macros()
+    }
+
+
+@bus.handler('saveMacro')
+def save_macro(message_data: dict, request_id: str = None) -> dict:
+    return get_history().save_macro(
+        message_data.get('name', ''), message_data.get('fromId', 0), message_data.get('toId', 0)
+    )
+
+
+@bus.handler('runMacro')
+def run_macro_request(message_data: dict, request_id: str = None) -> dict:
+    return run_macro(message_data.get('name', ''))
+
+
+@bus.handler('deleteMacro')
+def delete_macro(message_data: dict, request_id: str = None) -> dict:
+    if get_history().delete_macro(message_data.get('name', '')):
+        return {"success": True}
+    return {"success": False, "error": "No such macro"}
+
+
+@bus.handler('cancelExports')
+def cancel_exports(message_data: dict, request_id: str = None) -> dict:
+    dropped = get_modeling_actions().exports.clear()
+    return {"success": True, "message": f"Cancelled {dropped} queued exports"}
+
+
+# Handle legacy message from palette
+@bus.handler('messageFromPalette')
+def message_from_palette(message_data: dict, request_id: str = None) -> str:
+    arg1 = message_data.get('arg1', 'arg1 not sent')
+    arg2 = message_data.get('arg2', 'arg2 not sent')
+
+    msg = 'An event has been fired from the html to Fusion with the following data:<br/>'
+    msg += f'<b>Action</b>: messageFromPalette<br/><b>arg1</b>: {arg1}<br/><b>arg2</b>: {arg2}'
+    ui.messageBox(msg)
+
+    # Return timestamp
+    now = datetime.now()
+    currentTime = now.strftime('%H:%M:%S')
+    return f'OK - {currentTime}'
+
+
+def sync_design_index():
+    """
+    Bring the design index up to date on the main thread, before a worker
+    reads its summary or new parts are placed
+    """
+    design = adsk.fusion.Design.cast(app.activeProduct)
+    if design:
+        with metrics.span("design_index"):
+            get_modeling_actions().index.sync(design)
+
+
+def document_activated(args: adsk.core.DocumentEventArgs):
+    if _modeling_actions is None:
+        return
+    design = adsk.fusion.Design.cast(args.document.products.itemByProductType('DesignProductType'))
+    if design:
+        _modeling_actions.index.sync(design)
+
+
+def command_terminated(args: adsk.core.ApplicationCommandEventArgs):
+    from ...lib.design_index import VIEW_COMMANDS
+    if _modeling_actions is not None and args.commandId not in VIEW_COMMANDS:
+        _modeling_actions.index.mark_stale()
+
+
+@bus.handler('processAICommand')
+def process_ai_command(message_data: dict, request_id: str = None) -> dict:
+    """Validate an AI command and queue it for interpretation on a worker thread."""
+    command = message_data.get('command', '').strip()
+    request_id = request_id or message_data.get('requestId') or uuid.uuid4().hex
+
+    if not command:
+        return {
+            "success": False,
+            "requestId": request_id,
+            "error": "No command provided"
+        }
+
+    futil.log(f"Processing AI command [{request_id}]: {command}")
+    _submitted_at[request_id] = time.perf_counter()
+    _prompts[request_id] = command
+    sync_design_index()
+    get_ai_workers().submit(request_id, command)
+    bus.open(request_id, 'processAICommand')
+
+    return {
+        "success": True,
+        "accepted": True,
+        "requestId": request_id
+    }
+
+
+@bus.on_cancel('processAICommand')
+def cancel_ai_command(request_id: str) -> dict:
+    """Drop a command before it reaches the design; one already executing is not undone."""
+    get_ai_workers().cancel(request_id)
+    _submitted_at.pop(request_id, None)
+    _prompts.pop(request_id, None)
+    bus.result(request_id, 'processAICommand', {
+        "success": False,
+        "cancelled": True,
+        "requestId": request_id,
+        "error": "Command cancelled"
+    })
+    return {"success": True}
+
+
+def ai_result_ready(args: adsk.core.CustomEventArgs):
+    """Handle work handed to the main thread by custom events and push its outcome to the palette."""
+    event_data: dict = json.loads(args.additionalInfo)
+    event_type = event_data.get('type')
+    request_id = event_data.get('requestId')
+
+    if event_type == 'batchStep':
+        run_design_table_step(event_data.get('jobId'))
+    elif event_type == 'exportStep':
+        run_export_step()
+    elif event_type == 'progress':
+        # Cancelled commands are no longer in _prompts
+        if request_id in _prompts:
+            bus.progress(request_id, 'processAICommand', {"status": event_data.get('status', '')})
+    elif event_type == 'result':
+        finish_ai_command(request_id, event_data.get('aiResponse', {}))
+    elif event_type == 'storageError':
+        futil.log(f'{CMD_NAME}: {event_data.get("message", "")}', adsk.core.LogLevels.ErrorLogLevel)
+
+    # Sends what the step queued, and progress held back since the last frame once it is due
+    bus.flush(force=event_type == 'busFlush')
+
+
+def finish_ai_command(request_id: str, ai_response: dict):
+    """Execute an interpreted command and record it. Must run on the main thread."""
+    prompt = _prompts.pop(request_id, None)
+    if prompt is None:
+        # Cancelled while the result was on its way to the main thread
+        return
+
+    with metrics.request(request_id):
+        response = execute_ai_response(ai_response)
+    response['requestId'] = request_id
+
+    get_history().record(
+        prompt,
+        ai_response.get('actions', []),
+        response.get('success', False),
+        response.get('message') or response.get('error', ''),
+        source=ai_response.get('source') or ('cache' if ai_response.get('cached') else 'openai'),
+        request_id=request_id
+    )
+
+    submitted_at = _submitted_at.pop(request_id, None)
+    if submitted_at is not None:
+        metrics.record(
+            'command_total',
+            (time.perf_counter() - submitted_at) * 1000,
+            action=ai_response.get('action'),
+            detail=ai_response.get('source') or ('cache' if ai_response.get('cached') else 'openai'),
+            success=response.get('success', False),
+            request_id=request_id
+        )
+
+    bus.result(request_id, 'processAICommand', response)
+
+
+def run_macro(name: str) -> dict:
+    """Replay a saved macro's steps without interpreting anything. Must run on the main thread."""
+    actions = get_history().macro_actions(name)
+    if actions is None:
+        return {"success": False, "error": f"No macro named '{name}'"}
+
+    # execute_actions runs every step through execute_command inside one timeline group
+    request_id = f"macro:{name}"
+    started = time.perf_counter()
+    with metrics.request(request_id):
+        sync_design_index()
+        result = get_modeling_actions().execute_actions(actions)
+    metrics.record(
+        'command_total',
+        (time.perf_counter() - started) * 1000,
+        action=actions[0]['action'] if actions else None,
+        detail='macro',
+        success=result.get('success', False),
+        request_id=request_id
+    )
+
+    message = result.get('message', '')
+    get_history().record(f"macro: {name}", actions, result.get('success', False), message, source='macro')
+    if result.get('success', False):
+        return {"success": True, "message": f"Ran macro '{name}': {message}", "actions": actions, "steps": result['steps']}
+    return {"success": False, "error": message or f"Macro '{name}' failed", "steps": result.get('steps', [])}
+
+
+@bus.handler('runDesignTable')
+def start_design_table(message_data: dict, request_id: str = None) -> dict:
+    """Load a design table and queue its variants; rows run one per custom event so Fusion stays responsive."""
+    from ...lib.design_table import DesignTableError, DesignTableRuns, load_design_table
+
+    design = adsk.fusion.Design.cast(app.activeProduct)
+    if not design:
+        return {"success": False, "error": "Open a design to run a design table in"}
+
+    path = message_data.get('path')
+    if not path:
+        dialog = ui.createFileDialog()
+        dialog.title = 'Choose a design table'
+        dialog.filter = 'Design tables (*.csv;*.json)'
+        if dialog.showOpen() != adsk.core.DialogResults.DialogOK:
+            return {"success": False, "error": "No design table chosen"}
+        path = dialog.filename
+
+    try:
+        variants = load_design_table(path, message_data.get('action') or None, message_data.get('columns'))
+    except DesignTableError as e:
+        return {"success": False, "error": str(e)}
+
+    runs = DesignTableRuns()
+    run_id = runs.run_id(design.rootComponent.id, variants)
+    if message_data.get('restart'):
+        runs.reset(run_id)
+    done = runs.done_rows(run_id)
+    pending = [variant for variant in variants if done.get(variant.index) != variant.key]
+
+    # Variants are placed clear of what is already in the design
+    sync_design_index()
+    job_id = request_id or uuid.uuid4().hex
+    name = os.path.splitext(os.path.basename(path))[0]
+    _batch_jobs[job_id] = {
+        "runId": run_id,
+        "name": name,
+        "pending": pending,
+        "total": len(variants),
+        "skipped": len(variants) - len(pending),
+        "done": 0,
+        "failed": 0,
+        "cancelled": False,
+        "export": message_data.get('export') or None,
+        "refinement": message_data.get('refinement') or None,
+        "layout": message_data.get('layout') or None,
+        "timelineStart": get_modeling_actions().timeline_position(),
+        "startedAt": time.perf_counter()
+    }
+    futil.log(f"Design table {name}: {len(pending)} of {len(variants)} rows to generate")
+    bus.open(job_id, 'runDesignTable')
+    app.fireCustomEvent(AI_RESULT_EVENT_ID, json.dumps({"type": "batchStep", "jobId": job_id}))
+    return {
+        "success": True,
+        "accepted": True,
+        "jobId": job_id,
+        "name": name,
+        "total": len(variants),
+        "skipped": len(variants) - len(pending)
+    }
+
+
+@bus.on_cancel('runDesignTable')
+def cancel_design_table(job_id: str) -> dict:
+    """Stop a design table job after the row being built; its result reports what was left"""
+    job = _batch_jobs.get(job_id)
+    if job:
+        job['cancelled'] = True
+    return {"success": job is not None}
+
+
+def run_design_table_step(job_id: str):
+    """Generate the next variant of a design table job and report it to the palette."""
+    from ...lib.design_table import DesignTableRuns
+
+    job = _batch_jobs.get(job_id)
+    if job is None:
+        return
+
+    if job['pending'] and not job['cancelled']:
+        variant = job['pending'].pop(0)
+        started = time.perf_counter()
+        with metrics.request(f"table:{job['runId']}"):
+            result = get_modeling_actions().create_variant(variant.action, variant.parameters, variant.name,
+                                                           job['layout'])
+        duration_ms = (time.perf_counter() - started) * 1000
+        success = result.get('success', False)
+        job['done' if success else 'failed'] += 1
+        DesignTableRuns().record(job['runId'], variant, success, duration_ms,
+                                 result.get('message', ''), result.get('component'))
+        if success and job['export']:
+            get_modeling_actions().export_variant(variant.action, variant.parameters, job['export'], job['refinement'])
+        # Each row is a line of the palette's log, so rows are batched but never coalesced
+        bus.progress(job_id, 'runDesignTable', {
+            "row": variant.index + 1,
+            "total": job['total'],
+            "completed": job['skipped'] + job['done'] + job['failed'],
+            "success": success,
+            "component": result.get('component'),
+            "message": result.get('message', ''),
+            "durationMs": round(duration_ms, 1)
+        }, coalesce=False)
+        if job['pending'] and not job['cancelled']:
+            app.fireCustomEvent(AI_RESULT_EVENT_ID, json.dumps({"type": "batchStep", "jobId": job_id}))
+            return
+
+    # Finished or cancelled
+    del _batch_jobs[job_id]
+    get_modeling_actions().group_timeline(job['timelineStart'], f"Design table {job['name']}")
+    summary = (f"Design table {job['name']}: {job['done']} generated, {job['skipped']} already present, "
+               f"{job['failed']} failed")
+    if job['cancelled']:
+        summary += f", {len(job['pending'])} cancelled"
+    futil.log(summary)
+    bus.result(job_id, 'runDesignTable', {
+        "success": job['failed'] == 0 and not job['cancelled'],
+        "message": summary,
+        "durationMs": round((time.perf_counter() - job['startedAt']) * 1000, 1)
+    })
+
+
+def run_export_step():
+    """Write the next queued export file and report it to the palette."""
+    exports = get_modeling_actions().exports
+    progress = exports.run_next()
+    if progress is None:
+        return
+    if progress['status'] == 'failed':
+        futil.log(progress['message'])
+    bus.event('exportProgress', dict(progress, **exports.stats()))
+    if exports.pending:
+        app.fireCustomEvent(AI_RESULT_EVENT_ID, json.dumps({"type": "exportStep"}))
+
+
+def execute_ai_response(ai_response: dict) -> dict:
+    """Execute every interpreted step of an AI command in Fusion 360. Must run on the main thread."""
+    try:
         if not ai_response.get('success', False):
             return {
                 "success": False,
                 "error": ai_response.get('error', 'AI processing failed')
             }
 
-        action = ai_response.get('action')
-        parameters = ai_response.get('parameters', {})
+        actions = ai_response.get('actions', [])
         
-        futil.log(f"AI interpreted action: {action}, parameters: {parameters}")
+        futil.log(f"AI interpreted actions: {actions}")
 
-        # Step 2: Execute the modeling action
-        execution_result = modeling_actions.execute_command(action, parameters)
+        execution_result = get_modeling_actions().execute_actions(actions)
         
         if execution_result.get('success', False):
+            message = execution_result.get('message', 'Command executed successfully')
+            if ai_response.get('fallback_reason'):
+                message += f" (interpreted locally: {ai_response['fallback_reason']})"
             return {
                 "success": True,
-                "message": execution_result.get('message', 'Command executed successfully'),
-                "action": action,
-                "parameters": parameters
+                "message": message,
+                "actions": actions,
+                "steps": execution_result['steps']
             }
         else:
             return {
                 "success": False,
-                "error": execution_result.get('message', 'Execution failed')
+                "error": execution_result.get('message', 'Execution failed'),
+                "steps": execution_result.get('steps', [])
             }
 
     except Exception as e:
@@ -1,9 +1,77 @@
 // Global variables
-let isProcessing = false;
+let activeRequests = 0;
+// request id -> performance.now() when an AI command was sent
+const pendingCommands = new Map();
+let designTableJobId = null;
+
+// Versioned request/response channel to Fusion (lib/palette_bus.py). Every
+// request gets an id; Fusion answers it at once through the returned promise
+// and may follow up with progress messages and one result under the same id,
+// all delivered in batched "busFrame" messages. Several requests can be in
+// flight at a time.
+const bus = {
+    version: 1,
+    // request id -> { onProgress, onResult }
+    pending: new Map(),
+    // event type -> handler
+    listeners: {},
+
+    request(type, data = {}, callbacks = {}) {
+        const id = createRequestId();
+        this.pending.set(id, callbacks);
+        const envelope = { v: this.version, id: id, kind: 'request', type: type, data: data };
+        const reply = adsk.fusionSendData('bus', JSON.stringify(envelope))
+            .then((result) => {
+                const response = JSON.parse(result).data;
+                // Only accepted requests send progress or a result later
+                if (!response || !response.accepted) {
+                    this.pending.delete(id);
+                }
+                return response;
+            }, (error) => {
+                this.pending.delete(id);
+                throw error;
+            });
+        reply.id = id;
+        return reply;
+    },
+
+    cancel(id) {
+        const envelope = { v: this.version, id: id, kind: 'cancel', type: 'cancel', data: {} };
+        return adsk.fusionSendData('bus', JSON.stringify(envelope)).then((result) => JSON.parse(result).data);
+    },
+
+    on(type, handler) {
+        this.listeners[type] = handler;
+    },
+
+    receive(frame) {
+        if (frame.v !== this.version) {
+            console.log(`Ignoring palette frame of protocol v${frame.v}`);
+            return;
+        }
+        for (const message of frame.messages) {
+            if (message.kind === 'event') {
+                const handler = this.listeners[message.type];
+                if (handler) handler(message.data);
+                continue;
+            }
+            const callbacks = this.pending.get(message.id);
+            if (!callbacks) continue;
+            if (message.kind === 'progress' && callbacks.onProgress) {
+                callbacks.onProgress(message.data);
+            } else if (message.kind === 'result') {
+                this.pending.delete(message.id);
+                if (callbacks.onResult) callbacks.onResult(message.data);
+            }
+        }
+    }
+};
 
 // Initialize when page loads
 document.addEventListener('DOMContentLoaded', function() {
     setupKeyboardShortcuts();
+    bus.on('exportProgress', handleExportProgress);
     updateResponseArea('Ready to process your commands...', 'info');
 });
 
@@ -37,8 +105,6 @@ function insertMockCommand(command) {
 }
 
 function processAICommand() {
-    if (isProcessing) return;
-    
     const input = document.getElementById('aiCommandInput');
     const command = input.value.trim();
     
@@ -48,56 +114,282 @@ function processAICommand() {
     }
     
     // Set processing state
-    isProcessing = true;
-    const button = document.getElementById('processCommand');
-    const originalText = button.textContent;
-    button.textContent = 'Processing...';
-    button.disabled = true;
-    button.classList.add('loading');
+    setProcessingState(true);
     
     updateResponseArea('🤖 Processing your command with AI...', 'processing');
     
-    // Send command to Fusion 360 Python backend
-    const messageData = {
-        command: command,
-        timestamp: new Date().toISOString()
-    };
-    
-    // Send the data to Fusion as a JSON string
-    adsk.fusionSendData("processAICommand", JSON.stringify(messageData))
-        .then((result) => {
-            try {
-                const response = JSON.parse(result);
+    // Fusion only acknowledges the request here; the outcome arrives later
+    // as the request's result
+    const sentAt = performance.now();
+    const request = bus.request("processAICommand", { command: command, timestamp: new Date().toISOString() }, {
+        onProgress: (progress) => updateResponseArea(`🤖 ${progress.status}`, 'processing'),
+        onResult: (response) => handleAIResult(response)
+    });
+    pendingCommands.set(request.id, sentAt);
+    updateCancelButton();
+
+    request
+        .then((response) => {
+            if (!response.accepted) {
+                finishCommand(request.id);
                 handleAIResponse(response);
-            } catch (e) {
-                updateResponseArea(`Response: ${result}`, 'success');
             }
         })
         .catch((error) => {
+            finishCommand(request.id);
             updateResponseArea(`Error: ${error}`, 'error');
+        });
+}
+
+function cancelAICommands() {
+    for (const id of pendingCommands.keys()) {
+        bus.cancel(id);
+    }
+}
+
+function finishCommand(id) {
+    pendingCommands.delete(id);
+    setProcessingState(false);
+    updateCancelButton();
+}
+
+function updateCancelButton() {
+    document.getElementById('cancelCommand').disabled = pendingCommands.size === 0;
+}
+
+function createRequestId() {
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 10)}`;
+}
+
+function setProcessingState(processing) {
+    activeRequests = Math.max(0, activeRequests + (processing ? 1 : -1));
+    const button = document.getElementById('processCommand');
+    button.textContent = activeRequests > 1 ? `Processing (${activeRequests})...` :
+        activeRequests ? 'Processing...' : 'Process Command';
+    button.classList.toggle('loading', activeRequests > 0);
+}
+
+function handleAIResult(response) {
+    const sentAt = pendingCommands.get(response.requestId);
+    finishCommand(response.requestId);
+    if (!response.cancelled) {
+        reportRoundTrip(response, sentAt);
+    }
+    handleAIResponse(response);
+}
+
+function reportRoundTrip(response, sentAt) {
+    // Time from sending the command to showing its result, as seen by the user
+    const metric = {
+        stage: 'palette_round_trip',
+        durationMs: performance.now() - sentAt,
+        requestId: response.requestId,
+        action: response.actions && response.actions.length ? response.actions[0].action : null,
+        success: !!response.success
+    };
+    bus.request("reportMetric", metric);
+}
+
+function loadMetrics() {
+    const since = document.getElementById('metricsWindow').value;
+    const request = since ? { sinceSeconds: Number(since) } : {};
+    bus.request("getMetrics", request)
+        .then(renderMetrics)
+        .catch((error) => {
+            document.getElementById('metricsTable').innerHTML = `<div class="status-message status-error">${error}</div>`;
+        });
+}
+
+function renderMetrics(summary) {
+    const container = document.getElementById('metricsTable');
+    if (!summary.success) {
+        container.innerHTML = `<div class="status-message status-error">${summary.error}</div>`;
+        return;
+    }
+    if (!summary.samples) {
+        container.innerHTML = 'No measurements yet.';
+        return;
+    }
+    const rows = (items, label) => items.map(item => `
+        <tr>
+            <td>${label(item)}</td>
+            <td>${item.count}</td>
+            <td>${item.p50.toFixed(1)}</td>
+            <td>${item.p95.toFixed(1)}</td>
+            <td>${item.p99.toFixed(1)}</td>
+        </tr>`).join('');
+    const table = (title, items, label) => `
+        <table class="metrics-table">
+            <thead><tr><th>${title}</th><th>n</th><th>p50 ms</th><th>p95 ms</th><th>p99 ms</th></tr></thead>
+            <tbody>${rows(items, label)}</tbody>
+        </table>`;
+    container.innerHTML =
+        table('Stage', summary.stages, item => item.stage) +
+        table('Stage / action', summary.actions, item => `${item.stage} · ${item.action}`);
+}
+
+function loadHistory() {
+    bus.request("getHistory", { limit: 50 })
+        .then(renderHistory)
+        .catch((error) => {
+            document.getElementById('historyList').innerHTML = `<div class="status-message status-error">${error}</div>`;
+        });
+}
+
+function renderHistory(history) {
+    const list = document.getElementById('historyList');
+    if (!history.success) {
+        list.innerHTML = `<div class="status-message status-error">${history.error}</div>`;
+        return;
+    }
+    list.innerHTML = history.entries.length ? history.entries.map(entry => `
+        <label class="history-entry ${entry.success ? '' : 'failed'}">
+            <input type="checkbox" class="history-select" value="${entry.id}" ${entry.success ? '' : 'disabled'}>
+            <span>${escapeHtml(entry.prompt)}</span>
+        </label>`).join('') : 'No commands yet.';
+
+    document.getElementById('macroList').innerHTML = history.macros.map(macro => `
+        <div class="macro-entry">
+            <span>▶ ${escapeHtml(macro.name)} · ${macro.steps} steps · ${macro.runs} runs</span>
+            <button class="ai-button" data-macro="${escapeHtml(macro.name)}" onclick="runMacro(this.dataset.macro)">Run</button>
+            <button class="ai-button" data-macro="${escapeHtml(macro.name)}" onclick="deleteMacro(this.dataset.macro)">Delete</button>
+        </div>`).join('');
+}
+
+function saveMacro() {
+    const name = document.getElementById('macroName').value.trim();
+    const ids = Array.from(document.querySelectorAll('.history-select:checked')).map(box => Number(box.value));
+    if (!name || !ids.length) {
+        updateResponseArea('Enter a macro name and tick the commands it should contain.', 'error');
+        return;
+    }
+    // The ticked commands mark the range; every successful command between them is included
+    const request = { name: name, fromId: Math.min(...ids), toId: Math.max(...ids) };
+    bus.request("saveMacro", request)
+        .then((response) => {
+            if (response.success) {
+                updateResponseArea(`✅ ${escapeHtml(response.message)}`, 'success');
+                loadHistory();
+            } else {
+                updateResponseArea(`❌ ${escapeHtml(response.error)}`, 'error');
+            }
+        });
+}
+
+function runMacro(name) {
+    setProcessingState(true);
+    updateResponseArea(`▶ Running macro ${escapeHtml(name)}...`, 'processing');
+    bus.request("runMacro", { name: name })
+        .then((response) => {
+            setProcessingState(false);
+            handleAIResponse(response);
+            loadHistory();
         })
-        .finally(() => {
-            // Reset processing state
-            isProcessing = false;
-            button.textContent = originalText;
-            button.disabled = false;
-            button.classList.remove('loading');
+        .catch((error) => {
+            setProcessingState(false);
+            updateResponseArea(`Error: ${error}`, 'error');
         });
 }
 
+function deleteMacro(name) {
+    bus.request("deleteMacro", { name: name })
+        .then(() => loadHistory());
+}
+
+function runDesignTable() {
+    const request = {
+        action: document.getElementById('designTableAction').value,
+        restart: document.getElementById('designTableRestart').checked,
+        export: document.getElementById('designTableExport').value,
+        refinement: document.getElementById('exportRefinement').value,
+        layout: document.getElementById('designTableLayout').value
+    };
+    const job = bus.request("runDesignTable", request, {
+        onProgress: handleBatchProgress,
+        onResult: handleBatchResult
+    });
+    job.then((response) => {
+        const progress = document.getElementById('designTableProgress');
+        if (!response.success) {
+            progress.innerHTML = `<div class="status-message status-error">${escapeHtml(response.error)}</div>`;
+            return;
+        }
+        designTableJobId = job.id;
+        progress.innerHTML = `<div class="status-message status-processing">` +
+            `${escapeHtml(response.name)}: ${response.skipped} of ${response.total} rows already built</div>`;
+    });
+}
+
+function cancelDesignTable() {
+    if (designTableJobId) {
+        bus.cancel(designTableJobId);
+    }
+}
+
+function handleBatchResult(result) {
+    designTableJobId = null;
+    const type = result.success ? 'success' : 'error';
+    document.getElementById('designTableProgress').insertAdjacentHTML('afterbegin',
+        `<div class="status-message status-${type}">${escapeHtml(result.message)} ` +
+        `in ${(result.durationMs / 1000).toFixed(1)} s</div>`);
+}
+
+function handleBatchProgress(progress) {
+    const container = document.getElementById('designTableProgress');
+    const line = `${progress.success ? '✅' : '❌'} ${progress.completed}/${progress.total} · row ${progress.row} · ` +
+        `${escapeHtml(progress.message)} · ${Math.round(progress.durationMs)} ms`;
+    container.insertAdjacentHTML('afterbegin', `<div class="history-entry ${progress.success ? '' : 'failed'}">${line}</div>`);
+}
+
+function handleExportProgress(progress) {
+    const icons = { exported: '✅', unchanged: '⏭️', failed: '❌' };
+    const container = document.getElementById('exportProgress');
+    const line = `${icons[progress.status] || '•'} ${escapeHtml(progress.message)} · ` +
+        `${Math.round(progress.durationMs)} ms · ${progress.remaining} queued`;
+    container.insertAdjacentHTML('afterbegin',
+        `<div class="history-entry ${progress.status === 'failed' ? 'failed' : ''}">${line}</div>`);
+}
+
+function cancelExports() {
+    bus.request("cancelExports")
+        .then((response) => {
+            document.getElementById('exportProgress').insertAdjacentHTML('afterbegin',
+                `<div class="history-entry">${escapeHtml(response.message)}</div>`);
+        });
+}
+
+function escapeHtml(text) {
+    const element = document.createElement('div');
+    element.textContent = text;
+    return element.innerHTML.replace(/"/g, '&quot;');
+}
+
 function handleAIResponse(response) {
-    if (response.success) {
+    // Multi-step commands list the outcome of every step
+    if (response.steps && response.steps.length > 1) {
+        updateResponseArea(formatSteps(response), response.success ? 'success' : 'error');
+    } else if (response.success) {
         updateResponseArea(`✅ ${response.message}`, 'success');
-        
+    } else {
+        updateResponseArea(`❌ ${response.error || response.message}`, 'error');
+    }
+    
+    if (response.success) {
         // Clear input on successful execution
         setTimeout(() => {
             document.getElementById('aiCommandInput').value = '';
         }, 1000);
-    } else {
-        updateResponseArea(`❌ ${response.error || response.message}`, 'error');
     }
 }
 
+function formatSteps(response) {
+    const icons = { done: '✅', failed: '❌', skipped: '⏭️' };
+    const lines = response.steps.map((step, index) =>
+        `${icons[step.status] || '•'} ${index + 1}. ${step.message || step.action}`
+    );
+    return lines.join('<br/>');
+}
+
 function updateResponseArea(message, type = 'info') {
     const responseArea = document.getElementById('aiResponse');
     const timestamp = new Date().toLocaleTimeString();
@@ -157,9 +449,8 @@ window.fusionJavaScriptHandler = {
         try {
             if (action === "updateMessage") {
                 updateMessage(data);
-            } else if (action === "aiResponse") {
-                const response = JSON.parse(data);
-                handleAIResponse(response);
+            } else if (action === "busFrame") {
+                bus.receive(JSON.parse(data));
             } else if (action === "debugger") {
                 debugger;
             } else {
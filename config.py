@@ -25,34 +25,148 @@ AI_API_KEY = ""  # Set your OpenAI API key here or leave empty for mock mode
 AI_MODEL = "gpt-4"
 AI_MAX_TOKENS = 1000
 
+# Model tiers, cheapest first. A prompt goes to the first tier whose max_complexity is at
+# least its complexity score (see lib/model_router.py; a short single-action prompt the local
+# parser half understood scores about 1.5, a multi-step one 4 or more). When a tier's answer
+# is unusable the next tier is asked. With routing disabled every request uses AI_MODEL.
+AI_ROUTING_ENABLED = True
+AI_MODEL_TIERS = [
+    {"name": "fast", "model": "gpt-4o-mini", "max_complexity": 2.5},
+    {"name": "large", "model": AI_MODEL, "max_complexity": None},
+]
+
+# Shared OpenAI HTTP connection pool
+AI_CONNECT_TIMEOUT = 5.0  # seconds
+AI_REQUEST_TIMEOUT = 60.0  # seconds
+AI_MAX_CONNECTIONS = 4
+AI_KEEPALIVE_EXPIRY = 300.0  # seconds an idle connection is kept open
+AI_WARM_UP = True  # open the connection in the background when the add-in starts
+AI_KEY_VALIDATION_TTL = 24 * 3600  # seconds a validated API key is trusted without a network check
+
+# Stream completions so progress reaches the palette while tokens arrive
+# (the actions still run once the whole response is in)
+AI_STREAMING = True
+
+# Alternative OpenAI-compatible endpoint, e.g. a local fake server for testing.
+# Leave empty to use the OpenAI API.
+AI_BASE_URL = ""
+
+# Send only the tools whose keywords appear in the command (all tools when none match)
+AI_TOOL_SELECTION = True
+
+# Version of the structured {actions: [{action, parameters}]} response. Bump it whenever the
+# response shape changes so cached interpretations are invalidated.
+AI_RESPONSE_SCHEMA_VERSION = 3
+
+# Latency budget of a command that needs OpenAI. When it runs out, the local parser's
+# answer is used (if it has one) and the request finishes in the background, filling the
+# caches. 0 waits for OpenAI without a deadline.
+AI_LATENCY_BUDGET = 8.0  # seconds
+AI_MAX_RETRIES = 2  # retries of timeouts, rate limits and 5xx responses within the budget
+AI_RETRY_BASE_DELAY = 0.5  # seconds, doubled per retry with random jitter
+AI_RETRY_MAX_DELAY = 4.0  # seconds
+
+# After this many consecutive failed requests every command goes to the local parser
+# for the cool-down, then a single request probes whether OpenAI has recovered
+AI_BREAKER_FAILURES = 3
+AI_BREAKER_COOLDOWN = 30.0  # seconds
+
+# Local intent parser: commands parsed with at least this confidence (0-1)
+# skip the OpenAI request entirely
+LOCAL_PARSER_MIN_CONFIDENCE = 0.8
+
+# Prompt -> command cache (in memory and in fusionGPT.db)
+AI_CACHE_ENABLED = True
+AI_CACHE_TTL_SECONDS = 7 * 24 * 3600
+AI_CACHE_MEMORY_ENTRIES = 256
+AI_CACHE_DISK_ENTRIES = 5000
+
+# fusionGPT.db: writes nobody waits for are committed in batches by a background thread
+STORAGE_FLUSH_INTERVAL = 0.5  # seconds between batches
+
+# Palette messages: progress from Fusion is coalesced and sent in frames at most this often
+PALETTE_FRAME_INTERVAL = 0.05  # seconds
+
+# Executed commands kept for replay and macros
+HISTORY_MAX_ENTRIES = 10000
+
+# Per-stage latency spans written to the metrics table of fusionGPT.db
+METRICS_ENABLED = True
+METRICS_MAX_ROWS = 50000  # oldest spans are dropped beyond this
+
+# Reuse the interpretation of a similar earlier prompt ("25 mm cube" for "cube 40mm"),
+# refilling its numbers, instead of calling OpenAI
+AI_SIMILARITY_CACHE_ENABLED = True
+AI_SIMILARITY_THRESHOLD = 0.9  # cosine similarity of prompt templates (0-1)
+AI_SIMILARITY_MAX_ENTRIES = 50000
+
+# Place another occurrence of an existing component when a part is requested
+# again with identical parameters instead of rebuilding its geometry. Parts
+# always get their own component, so they are placed either way.
+INSTANCE_REPEATED_PARTS = True
+
+# Where new parts go: "row" (along +X), "grid" (PLACEMENT_GRID_COLUMNS per row),
+# "pack" (against existing parts, close to the origin) or "origin" (no placement).
+# Parts keep PLACEMENT_GAP mm from each other; "next to the gear" overrides the layout.
+PLACEMENT_LAYOUT = "row"
+PLACEMENT_GAP = 10.0  # mm
+PLACEMENT_GRID_COLUMNS = 5
+
+# Exports queued by export_bodies and design tables. Files go to a folder per design
+# under EXPORT_FOLDER; bodies whose geometry is unchanged since their last export are skipped.
+EXPORT_FOLDER = os.path.join(os.path.expanduser('~'), 'Documents', 'FusionGPT Exports')
+EXPORT_DEFAULT_FORMAT = "stl"  # stl, step or f3d
+EXPORT_DEFAULT_REFINEMENT = "medium"  # STL mesh refinement: low, medium or high
+
+# Bodies and parts in the active design are indexed as the copilot and the user
+# change it. Prompts that refer to existing geometry ("drill a hole in the gear")
+# get a summary of the index of at most AI_DESIGN_CONTEXT_TOKENS tokens.
+AI_DESIGN_CONTEXT_ENABLED = True
+AI_DESIGN_CONTEXT_TOKENS = 400
+
+# Number of background threads used to interpret commands so Fusion's UI stays responsive
+AI_WORKER_THREADS = 2
+
 # Supported AI Commands for natural language processing
 SUPPORTED_AI_COMMANDS = {
     "create_box": {
         "description": "Creates a rectangular box/cube",
-        "parameters": ["length", "width", "height"]
+        "parameters": ["length", "width", "height", "near", "side"]
     },
     "create_cylinder": {
         "description": "Creates a cylinder",
-        "parameters": ["radius", "height"]
+        "parameters": ["radius", "height", "near", "side"]
     },
     "create_sphere": {
         "description": "Creates a sphere",
-        "parameters": ["radius"]
+        "parameters": ["radius", "near", "side"]
     },
     "create_gear": {
         "description": "Creates a spur gear with teeth",
-        "parameters": ["number_of_teeth", "module", "bore_diameter", "thickness"]
+        "parameters": ["number_of_teeth", "module", "bore_diameter", "thickness", "near", "side"]
     },
     "create_hole": {
         "description": "Creates a hole in selected face",
-        "parameters": ["diameter", "depth"]
+        "parameters": ["diameter", "depth", "target"]
     },
     "extrude_face": {
         "description": "Extrudes selected face",
-        "parameters": ["distance"]
+        "parameters": ["distance", "target"]
     },
     "move_body": {
         "description": "Moves selected body",
-        "parameters": ["x", "y", "z"]
+        "parameters": ["x", "y", "z", "target"]
+    },
+    "rectangular_pattern": {
+        "description": "Creates a grid of holes in the selected face, or of copies of the selected body, as one pattern feature",
+        "parameters": ["rows", "columns", "row_spacing", "column_spacing", "hole_diameter", "hole_depth", "target"]
+    },
+    "circular_pattern": {
+        "description": "Creates holes evenly spaced on a circle in the selected face, or copies of the selected body around Z, as one pattern feature",
+        "parameters": ["count", "radius", "angle", "hole_diameter", "hole_depth", "target"]
+    },
+    "export_bodies": {
+        "description": "Exports the selected bodies, or every body the copilot created, to STL, STEP or F3D files in the background",
+        "parameters": ["format", "refinement"]
     }
 }
\ No newline at end of file
@@ -1,35 +1,26 @@
 import os
-from sqlite3 import connect,Connection,Cursor
-from .helper import checkSqlite, initSqlite
+import time
+import hashlib
+from .. import openai_client
+from ..storage import storage
+from ... import config
 
 # Removed automatic openai installation to prevent Fusion 360 startup issues
-# The add-in will use mock AI responses if openai is not available
-try:
-    from openai import OpenAI
-    OPENAI_AVAILABLE = True
-except ImportError:
-    OPENAI_AVAILABLE = False
-    print("OpenAI library not available. Using mock AI responses.")
+# The add-in will use mock AI responses if openai is not available.
+# The openai library itself is imported lazily by openai_client.
 
 class FusionGPT:
 
-    api:OpenAI
-    sqlite:Connection
-    cursor:Cursor
+    api:object
     path:str
 
     def __init__(self):
         self.api                    = None
-        self.sqlite                 = None
-        self.cursor                 = None
         self.path                   = os.path.dirname(__file__)
-        if not checkSqlite():
-            initSqlite()
-        self.sqlite                 = connect(os.path.join(self.path,"fusionGPT.db"))
-        self.cursor                 = self.sqlite.cursor()
+        storage.migrate()
         
         # Only attempt to set up OpenAI if the library is available
-        if OPENAI_AVAILABLE:
+        if openai_client.is_available():
             if not self.__checkOpenAIKey():
                 print("OpenAI API Key not found. Using mock AI responses.")
             elif not self.__checkOpenAIKeyValid():
@@ -38,26 +29,35 @@ class FusionGPT:
             print("OpenAI library not installed. Using mock AI responses for testing.")
 
     def __checkOpenAIKey(self) -> bool:
-        if not OPENAI_AVAILABLE:
-            return False
-            
-        self.cursor.execute("SELECT value FROM keys WHERE name='OPENAI_API_KEY'")
-        key = self.cursor.fetchone()
+        key = storage.query_one("SELECT value FROM keys WHERE name='OPENAI_API_KEY'")
         if key is None:
             return False
         else:
-            self.api = OpenAI(api_key=key[0])
-        return True
+            openai_client.register_api_key(key[0])
+            self.api = openai_client.get_client()
+        return self.api is not None
 
     def __checkOpenAIKeyValid(self) -> bool:
-        if not OPENAI_AVAILABLE or self.api is None:
+        if self.api is None:
             return False
+
+        # Validation needs a network round trip; reuse a recent result
+        key_hash = hashlib.sha256(self.api.api_key.encode('utf-8')).hexdigest()
+        cached = storage.query_one("SELECT valid, checked_at FROM key_checks WHERE key_hash=?", (key_hash,))
+        if cached is not None and time.time() - cached[1] < config.AI_KEY_VALIDATION_TTL:
+            return bool(cached[0])
             
         try:
             models = self.api.models.list().to_dict()
-            if len(models) > 0:
-                return True
-            else:
+            valid = len(models) > 0
+        except Exception as e:
+            # Only a rejected key is remembered; network problems are retried next start
+            if type(e).__name__ != 'AuthenticationError':
                 return False
-        except:
-            return False
\ No newline at end of file
+            valid = False
+
+        storage.write(
+            "INSERT OR REPLACE INTO key_checks (key_hash, valid, checked_at) VALUES (?, ?, ?)",
+            (key_hash, int(valid), time.time())
+        )
+        return valid
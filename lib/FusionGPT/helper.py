@@ -2,7 +2,6 @@ import subprocess
 import sys
 import os
 
-from sqlite3 import connect
 
 def install(package):
     """
@@ -15,28 +14,21 @@ def install(package):
 def freeze():
     subprocess.check_call([sys.executable, "-m", "pip", "freeze"])
 
+def getDbPath() -> str:
+    return os.path.join(os.path.dirname(__file__),"fusionGPT.db")
+
 def checkSqlite() -> bool:
+    from ..storage import storage
     try:
-        conn = connect(os.path.join(os.path.dirname(__file__),"fusionGPT.db"))
-        cursor = conn.cursor()
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='keys'")
-        result = cursor.fetchone() is not None
-        conn.close()
-        return result
-    except:
+        return storage.query_one("SELECT name FROM sqlite_master WHERE type='table' AND name='keys'") is not None
+    except Exception:
         return False
 
-def initSqlite():
+def initSqlite(conn=None):
+    """Bring fusionGPT.db up to the current schema. The connection argument is ignored;
+    the storage layer owns the connections."""
+    from ..storage import storage
     try:
-        conn = connect(os.path.join(os.path.dirname(__file__),"fusionGPT.db"))
-        cursor = conn.cursor()
-        cursor.execute('''CREATE TABLE keys (
-        id    INTEGER    PRIMARY KEY AUTOINCREMENT
-                        UNIQUE,
-        name  TEXT (255) UNIQUE,
-        value TEXT)
-        ''')
-        conn.commit()
-        conn.close()
+        storage.migrate()
     except Exception as e:
-        print(f"Error initializing SQLite database: {e}")
\ No newline at end of file
+        print(f"Error initializing SQLite database: {e}")
@@ -0,0 +1,176 @@
+import copy
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, Any, Callable, Optional
+
+from .metrics import metrics
+from .storage import Storage, storage as default_storage
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Lower-case a prompt and collapse whitespace and trailing punctuation"""
+    prompt = re.sub(r'\s+', ' ', prompt.strip().lower())
+    return prompt.rstrip(' .!?')
+
+
+class CommandCache:
+    """Two-tier prompt -> structured command cache.
+
+    Tier one is an in-memory LRU, tier two a ``command_cache`` table in
+    fusionGPT.db. Keys combine the normalized prompt with the model and the
+    response schema version so a model or schema change never serves stale
+    commands. Identical prompts that are already being interpreted wait for
+    the running request instead of starting another one.
+    """
+
+    def __init__(self, model: str, schema_version: int, ttl_seconds: float = 7 * 24 * 3600,
+                 memory_entries: int = 256, disk_entries: int = 5000, store: Optional[Storage] = None):
+        self.model = model
+        self.schema_version = schema_version
+        self.ttl_seconds = ttl_seconds
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self.store = store or default_storage
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def make_key(self, prompt: str) -> str:
+        raw = f"{normalize_prompt(prompt)}\x00{self.model}\x00{self.schema_version}"
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def get(self, prompt: str) -> Optional[Dict[str, Any]]:
+        """Return a cached command for the prompt, or None"""
+        return self._lookup(self.make_key(prompt))
+
+    def put(self, prompt: str, response: Dict[str, Any]) -> None:
+        """Store a successful interpretation in both tiers"""
+        self._store(self.make_key(prompt), prompt, response)
+
+    def get_or_compute(self, prompt: str, compute: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """Return the cached command or compute it, sharing work between identical prompts"""
+        key = self.make_key(prompt)
+        with metrics.span("cache_lookup"):
+            cached = self._lookup(key)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return copy.deepcopy(future.result())
+
+        try:
+            response = compute()
+            if response.get('success', False):
+                self._store(key, prompt, response)
+            future.set_result(response)
+            return copy.deepcopy(response)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+        self.store.execute("DELETE FROM command_cache")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory)
+            }
+
+    def _lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                response, expires_at = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return self._mark_cached(response)
+                del self._memory[key]
+
+        row = None
+        try:
+            row = self.store.query_one(
+                "SELECT response, expires_at FROM command_cache WHERE key = ? AND expires_at > ?",
+                (key, now)
+            )
+            if row is not None:
+                self.store.write("UPDATE command_cache SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, key))
+        except sqlite3.Error as e:
+            print(f"Command cache read failed: {e}")
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            response = json.loads(row[0])
+            self._remember(key, response, row[1])
+        return self._mark_cached(response)
+
+    def _store(self, key: str, prompt: str, response: Dict[str, Any]) -> None:
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        response = copy.deepcopy(response)
+        response.pop('cached', None)
+
+        with self._lock:
+            self._remember(key, response, expires_at)
+
+        # Queued; the storage flusher commits them together
+        self.store.write(
+            "INSERT OR REPLACE INTO command_cache (key, prompt, model, schema_version, response, created_at, last_used, expires_at, hits) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)",
+            (key, normalize_prompt(prompt), self.model, self.schema_version, json.dumps(response), now, now, expires_at)
+        )
+        self.store.write("DELETE FROM command_cache WHERE expires_at <= ?", (now,))
+        self.store.write(
+            "DELETE FROM command_cache WHERE key IN "
+            "(SELECT key FROM command_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.disk_entries,)
+        )
+
+    def _remember(self, key: str, response: Dict[str, Any], expires_at: float) -> None:
+        # Caller holds self._lock
+        self._memory[key] = (response, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _mark_cached(self, response: Dict[str, Any]) -> Dict[str, Any]:
+        response = copy.deepcopy(response)
+        response['cached'] = True
+        return response
@@ -1,32 +1,144 @@
 import adsk.core
 import adsk.fusion
 import math
-from typing import Dict, Any
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+from .design_index import DesignIndex
+from .export_queue import ExportQueue
+from .gear_geometry import InvoluteGear
+from .intent_parser import PARAMETER_DEFAULTS
+from .spatial_index import shift
+from .metrics import metrics
+from .. import config
 
 app = adsk.core.Application.get()
 
+# Actions that build a standalone part and can be instanced when repeated
+INSTANCEABLE_ACTIONS = {"create_box", "create_cylinder", "create_sphere", "create_gear"}
+
+# Parameters that say where a part goes, not what it is
+PLACEMENT_PARAMETERS = {"near", "side"}
+
 class AIModelingActions:
     def __init__(self):
         self.app = app
         self.ui = app.userInterface
+        # design id -> {(action, normalized parameters): component}
+        self._part_registry: Dict[str, Dict[tuple, Any]] = {}
+        self._bulk_depth = 0
+        self._current_action = None
+        self._current_parameters: Dict[str, Any] = {}
+        # What the copilot built, for prompts and exports that refer to it
+        self.index = DesignIndex(config.AI_DESIGN_CONTEXT_TOKENS)
+        self.exports = ExportQueue()
+    
+    @contextmanager
+    def bulk_execution(self, name: str = "AI Copilot"):
+        """
+        Run several actions as one batch. Sketches defer their compute until
+        their profiles are needed, and everything the batch adds to the
+        timeline is collapsed into a single named group at the end.
+        Nested batches join the outermost one.
+        """
+        design = adsk.fusion.Design.cast(app.activeProduct)
+        timeline = None
+        start_index = 0
+        if self._bulk_depth == 0 and design and design.designType == adsk.fusion.DesignTypes.ParametricDesignType:
+            timeline = design.timeline
+            start_index = timeline.count
+        
+        self._bulk_depth += 1
+        try:
+            yield self
+        finally:
+            self._bulk_depth -= 1
+            if timeline is not None:
+                self._group_timeline(timeline, start_index, name)
+    
+    def timeline_position(self) -> Optional[int]:
+        """Number of timeline items of a parametric design, or None for direct modeling"""
+        design = adsk.fusion.Design.cast(app.activeProduct)
+        if design and design.designType == adsk.fusion.DesignTypes.ParametricDesignType:
+            return design.timeline.count
+        return None
+    
+    def group_timeline(self, start_index: Optional[int], name: str) -> None:
+        """Collapse the timeline items added since start_index into one named group"""
+        if start_index is not None:
+            self._group_timeline(adsk.fusion.Design.cast(app.activeProduct).timeline, start_index, name)
+    
+    def _group_timeline(self, timeline, start_index: int, name: str) -> None:
+        if timeline.count - start_index > 1:
+            try:
+                group = timeline.timelineGroups.add(start_index, timeline.count - 1)
+                group.name = name
+            except Exception as e:
+                print(f"Could not group timeline items: {e}")
+    
+    @contextmanager
+    def _deferred_compute(self, sketch):
+        """
+        Solve the sketch once when the block ends instead of after every curve.
+        Profiles only exist once it is solved, so they are read after the block;
+        compute resumes even when drawing fails.
+        """
+        sketch.isComputeDeferred = True
+        try:
+            yield sketch
+        finally:
+            sketch.isComputeDeferred = False
+    
+    def _add_feature(self, features, feature_input):
+        """Add a feature to its collection, timing the compute Fusion does for it"""
+        with metrics.span("fusion_feature", action=self._current_action, detail=type(features).__name__):
+            feature = features.add(feature_input)
+        self.index.track(feature, self._current_action, self._current_parameters)
+        return feature
     
     def execute_command(self, action: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
         """Execute the AI-interpreted command in Fusion 360"""
+        self._current_action = action
+        self._current_parameters = parameters
+        started = time.perf_counter()
+        result = self._dispatch(action, parameters)
+        metrics.record("fusion_action", (time.perf_counter() - started) * 1000, action,
+                       success=result.get('success', False))
+        return result
+    
+    def create_variant(self, action: str, parameters: Dict[str, Any], name: Optional[str] = None,
+                       layout: Optional[str] = None) -> Dict[str, Any]:
+        """Build one part of a family (a design table row) in its own component, laid out by layout"""
+        self._current_action = action
+        self._current_parameters = parameters
+        started = time.perf_counter()
+        try:
+            result = self._create_part(action, parameters, name, layout)
+        except Exception as e:
+            result = {
+                "success": False,
+                "message": f"Error executing {action}: {str(e)}"
+            }
+        metrics.record("fusion_action", (time.perf_counter() - started) * 1000, action, detail="variant",
+                       success=result.get('success', False))
+        return result
+    
+    def _dispatch(self, action: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
         try:
-            if action == "create_box":
-                return self._create_box(parameters)
-            elif action == "create_cylinder":
-                return self._create_cylinder(parameters)
-            elif action == "create_sphere":
-                return self._create_sphere(parameters)
-            elif action == "create_gear":
-                return self._create_gear(parameters)
+            if action in INSTANCEABLE_ACTIONS:
+                return self._create_part(action, parameters)
             elif action == "create_hole":
                 return self._create_hole(parameters)
             elif action == "extrude_face":
                 return self._extrude_face(parameters)
             elif action == "move_body":
                 return self._move_body(parameters)
+            elif action == "rectangular_pattern":
+                return self._rectangular_pattern(parameters)
+            elif action == "circular_pattern":
+                return self._circular_pattern(parameters)
+            elif action == "export_bodies":
+                return self._export_bodies(parameters)
             else:
                 return {
                     "success": False,
@@ -38,36 +150,190 @@ class AIModelingActions:
                 "message": f"Error executing {action}: {str(e)}"
             }
     
-    def _create_box(self, params: Dict[str, Any]) -> Dict[str, Any]:
-        """Create a box/cube"""
+    def execute_actions(self, actions: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Execute an ordered list of {action, parameters} steps, stopping at the first failure"""
+        if len(actions) > 1 and self._bulk_depth == 0:
+            with self.bulk_execution():
+                return self.execute_actions(actions)
+        
+        steps = []
+        failed = False
+        for step in actions:
+            action = step.get('action')
+            parameters = step.get('parameters', {})
+            if failed:
+                steps.append({
+                    "action": action,
+                    "parameters": parameters,
+                    "status": "skipped",
+                    "success": False,
+                    "message": "Skipped because a previous step failed"
+                })
+                continue
+
+            result = self.execute_command(action, parameters)
+            failed = not result.get('success', False)
+            steps.append({
+                "action": action,
+                "parameters": parameters,
+                "status": "failed" if failed else "done",
+                "success": not failed,
+                "message": result.get('message', '')
+            })
+
+        return {
+            "success": bool(steps) and not failed,
+            "message": "; ".join(step['message'] for step in steps if step['status'] != "skipped"),
+            "steps": steps
+        }
+    
+    def _create_part(self, action: str, params: Dict[str, Any], name: Optional[str] = None,
+                     layout: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Build a part in its own component, or, with INSTANCE_REPEATED_PARTS,
+        place another occurrence of the component built earlier with the same
+        action and parameters. The occurrence goes to free room in the design
+        (see PLACEMENT_LAYOUT).
+        """
+        design = adsk.fusion.Design.cast(app.activeProduct)
+        if not design:
+            return {
+                "success": False,
+                "message": "Open a design to build parts in"
+            }
+        rootComp = design.rootComponent
+        design_id = rootComp.id
+        registry = self._part_registry.setdefault(design_id, {})
+        key = self._part_key(action, params)
+        
+        footprint = self._footprint(action, params)
+        offset = self.index.place(design_id, footprint, layout or config.PLACEMENT_LAYOUT, config.PLACEMENT_GAP,
+                                  config.PLACEMENT_GRID_COLUMNS, params.get('near'), params.get('side'))
+        transform = adsk.core.Matrix3D.create()
+        if any(offset):
+            transform.translation = adsk.core.Vector3D.create(*(value / 10 for value in offset))  # mm to cm
+        
+        existing = registry.get(key) if config.INSTANCE_REPEATED_PARTS else None
+        if existing is not None and existing.isValid:
+            occurrence = rootComp.occurrences.addExistingComponent(existing, transform)
+            self.index.track(occurrence, action, params)
+            self.index.reserve(design_id, shift(footprint, *offset), action)
+            existing_name = existing.name
+            return {
+                "success": True,
+                "instanced": True,
+                "component": existing_name,
+                "message": f"Placed another instance of {existing_name}"
+            }
+        
+        occurrence = rootComp.occurrences.addNewComponent(transform)
+        component = occurrence.component
+        builders = {
+            "create_box": self._create_box,
+            "create_cylinder": self._create_cylinder,
+            "create_sphere": self._create_sphere,
+            "create_gear": self._create_gear
+        }
+        result = builders[action](params, component)
+        
+        if result.get('success', False):
+            result["component"] = name or self._part_name(action, key[1])
+            component.name = result["component"]
+            registry[key] = component
+            self.index.track(occurrence, action, params)
+            self.index.reserve(design_id, shift(footprint, *offset), action)
+        else:
+            occurrence.deleteMe()
+        return result
+    
+    def export_variant(self, action: str, parameters: Dict[str, Any], fmt: Optional[str] = None,
+                       refinement: Optional[str] = None) -> Dict[str, Any]:
+        """Queue the export of the component built for a design table row"""
+        design = adsk.fusion.Design.cast(app.activeProduct)
+        if not design:
+            return {
+                "success": False,
+                "message": "Open a design to export from"
+            }
+        root = design.rootComponent
+        component = self._part_registry.get(root.id, {}).get(self._part_key(action, parameters))
+        if component is None or not component.isValid:
+            return {
+                "success": False,
+                "message": f"No component was built for this {action.replace('create_', '')}"
+            }
+        return self.exports.add([component], fmt, refinement, design.parentDocument.name, root)
+    
+    def _part_key(self, action: str, params: Dict[str, Any]) -> tuple:
+        """Registry key: the action plus its parameters with defaults filled in and floats rounded"""
+        merged = dict(PARAMETER_DEFAULTS.get(action, {}))
+        merged.update((name, value) for name, value in params.items() if name not in PLACEMENT_PARAMETERS)
+        normalized = tuple(sorted(
+            (name, round(float(value), 6) if isinstance(value, (int, float)) else value)
+            for name, value in merged.items()
+        ))
+        return (action, normalized)
+    
+    def _footprint(self, action: str, params: Dict[str, Any]) -> tuple:
+        """Bounding box in mm, around the component origin, of the part the builders make from params"""
+        merged = dict(PARAMETER_DEFAULTS.get(action, {}))
+        merged.update(params)
+        if action == "create_box":
+            length, width = merged['length'] / 2, merged['width'] / 2
+            return (-length, -width, 0.0, length, width, merged['height'])
+        if action == "create_cylinder":
+            radius = merged['radius']
+            return (-radius, -radius, 0.0, radius, radius, merged['height'])
+        if action == "create_sphere":
+            radius = merged['radius']
+            return (-radius, -radius, -radius, radius, radius, radius)
+        gear = InvoluteGear(int(merged['number_of_teeth']), merged['module'], merged.get('pressure_angle', 20.0))
+        return (-gear.outer_radius, -gear.outer_radius, 0.0, gear.outer_radius, gear.outer_radius, merged['thickness'])
+    
+    def _part_name(self, action: str, normalized: tuple) -> str:
+        label = action.replace('create_', '').capitalize()
+        values = " ".join(f"{name}={value:g}" if isinstance(value, float) else f"{name}={value}" for name, value in normalized)
+        return f"{label} {values}"
+    
+    def _forget_part(self, component) -> None:
+        """Stop instancing a component whose geometry was modified"""
+        for registry in self._part_registry.values():
+            for key in [key for key, value in registry.items() if value.id == component.id]:
+                del registry[key]
+    
+    def _resolve_owner(self, entity):
+        """Return the component owning a selected face or body and the entity in that component's space"""
+        native = entity.nativeObject if entity.assemblyContext else entity
+        body = native if isinstance(native, adsk.fusion.BRepBody) else native.body
+        return body.parentComponent, native
+    
+    def _create_box(self, params: Dict[str, Any], comp) -> Dict[str, Any]:
+        """Create a box/cube in comp"""
         try:
-            design = app.activeProduct
-            rootComp = design.rootComponent
-            
             # Get parameters with defaults
             length = params.get('length', 20) / 10  # Convert mm to cm
             width = params.get('width', 20) / 10
             height = params.get('height', 20) / 10
             
             # Create sketch
-            sketches = rootComp.sketches
-            xyPlane = rootComp.xYConstructionPlane
+            sketches = comp.sketches
+            xyPlane = comp.xYConstructionPlane
             sketch = sketches.add(xyPlane)
-            
-            # Draw rectangle
-            lines = sketch.sketchCurves.sketchLines
-            rect = lines.addTwoPointRectangle(
-                adsk.core.Point3D.create(-length/2, -width/2, 0),
-                adsk.core.Point3D.create(length/2, width/2, 0)
-            )
+            with self._deferred_compute(sketch):
+                # Draw rectangle
+                lines = sketch.sketchCurves.sketchLines
+                rect = lines.addTwoPointRectangle(
+                    adsk.core.Point3D.create(-length/2, -width/2, 0),
+                    adsk.core.Point3D.create(length/2, width/2, 0)
+                )
             
             # Create extrusion
             prof = sketch.profiles.item(0)
-            extrudes = rootComp.features.extrudeFeatures
+            extrudes = comp.features.extrudeFeatures
             extInput = extrudes.createInput(prof, adsk.fusion.FeatureOperations.NewBodyFeatureOperation)
             distance = adsk.core.ValueInput.createByReal(height)
             extInput.setDistanceExtent(False, distance)
-            extrude = extrudes.add(extInput)
+            extrude = self._add_feature(extrudes, extInput)
             
             return {
                 "success": True,
@@ -80,33 +346,30 @@ class AIModelingActions:
                 "message": f"Failed to create box: {str(e)}"
             }
     
-    def _create_cylinder(self, params: Dict[str, Any]) -> Dict[str, Any]:
-        """Create a cylinder"""
+    def _create_cylinder(self, params: Dict[str, Any], comp) -> Dict[str, Any]:
+        """Create a cylinder in comp"""
         try:
-            design = app.activeProduct
-            rootComp = design.rootComponent
-            
             # Get parameters with defaults
             radius = params.get('radius', 10) / 10  # Convert mm to cm
             height = params.get('height', 25) / 10
             
             # Create sketch
-            sketches = rootComp.sketches
-            xyPlane = rootComp.xYConstructionPlane
+            sketches = comp.sketches
+            xyPlane = comp.xYConstructionPlane
             sketch = sketches.add(xyPlane)
-            
-            # Draw circle
-            circles = sketch.sketchCurves.sketchCircles
-            centerPoint = adsk.core.Point3D.create(0, 0, 0)
-            circle = circles.addByCenterRadius(centerPoint, radius)
+            with self._deferred_compute(sketch):
+                # Draw circle
+                circles = sketch.sketchCurves.sketchCircles
+                centerPoint = adsk.core.Point3D.create(0, 0, 0)
+                circle = circles.addByCenterRadius(centerPoint, radius)
             
             # Create extrusion
             prof = sketch.profiles.item(0)
-            extrudes = rootComp.features.extrudeFeatures
+            extrudes = comp.features.extrudeFeatures
             extInput = extrudes.createInput(prof, adsk.fusion.FeatureOperations.NewBodyFeatureOperation)
             distance = adsk.core.ValueInput.createByReal(height)
             extInput.setDistanceExtent(False, distance)
-            extrude = extrudes.add(extInput)
+            extrude = self._add_feature(extrudes, extInput)
             
             return {
                 "success": True,
@@ -119,38 +382,35 @@ class AIModelingActions:
                 "message": f"Failed to create cylinder: {str(e)}"
             }
     
-    def _create_sphere(self, params: Dict[str, Any]) -> Dict[str, Any]:
-        """Create a sphere"""
+    def _create_sphere(self, params: Dict[str, Any], comp) -> Dict[str, Any]:
+        """Create a sphere in comp"""
         try:
-            design = app.activeProduct
-            rootComp = design.rootComponent
-            
             # Get parameters with defaults
             radius = params.get('radius', 15) / 10  # Convert mm to cm
             
             # Create sketch for revolve
-            sketches = rootComp.sketches
-            xzPlane = rootComp.xZConstructionPlane
+            sketches = comp.sketches
+            xzPlane = comp.xZConstructionPlane
             sketch = sketches.add(xzPlane)
+            with self._deferred_compute(sketch):
+                # Draw semicircle
+                arcs = sketch.sketchCurves.sketchArcs
+                centerPoint = adsk.core.Point3D.create(0, 0, 0)
+                startPoint = adsk.core.Point3D.create(0, 0, radius)
+                endPoint = adsk.core.Point3D.create(0, 0, -radius)
+                arc = arcs.addByCenterStartEnd(centerPoint, startPoint, endPoint)
             
-            # Draw semicircle
-            arcs = sketch.sketchCurves.sketchArcs
-            centerPoint = adsk.core.Point3D.create(0, 0, 0)
-            startPoint = adsk.core.Point3D.create(0, 0, radius)
-            endPoint = adsk.core.Point3D.create(0, 0, -radius)
-            arc = arcs.addByCenterStartEnd(centerPoint, startPoint, endPoint)
-            
-            # Add line to close profile
-            lines = sketch.sketchCurves.sketchLines
-            line = lines.addByTwoPoints(startPoint, endPoint)
+                # Add line to close profile
+                lines = sketch.sketchCurves.sketchLines
+                line = lines.addByTwoPoints(startPoint, endPoint)
             
             # Create revolve
             prof = sketch.profiles.item(0)
-            revolves = rootComp.features.revolveFeatures
+            revolves = comp.features.revolveFeatures
             revInput = revolves.createInput(prof, line, adsk.fusion.FeatureOperations.NewBodyFeatureOperation)
             angle = adsk.core.ValueInput.createByReal(math.pi * 2)
             revInput.setAngleExtent(False, angle)
-            revolve = revolves.add(revInput)
+            revolve = self._add_feature(revolves, revInput)
             
             return {
                 "success": True,
@@ -163,101 +423,84 @@ class AIModelingActions:
                 "message": f"Failed to create sphere: {str(e)}"
             }
     
-    def _create_gear(self, params: Dict[str, Any]) -> Dict[str, Any]:
-        """Create a spur gear with actual teeth"""
+    def _create_gear(self, params: Dict[str, Any], comp) -> Dict[str, Any]:
+        """Create a spur gear with involute teeth in comp"""
         try:
-            design = app.activeProduct
-            rootComp = design.rootComponent
-            
             # Get parameters with defaults
-            num_teeth = params.get('number_of_teeth', 20)
+            num_teeth = int(params.get('number_of_teeth', 20))
             module = params.get('module', 2.0) / 10  # Convert mm to cm
             bore_diameter = params.get('bore_diameter', 6.0) / 10
             thickness = params.get('thickness', 5.0) / 10
             
-            # Calculate gear dimensions
-            pitch_diameter = num_teeth * module
-            outer_diameter = pitch_diameter + (2 * module)
-            root_diameter = pitch_diameter - (2.5 * module)
+            # Gear geometry is computed outside Fusion
+            gear = InvoluteGear(num_teeth, module, params.get('pressure_angle', 20.0))
+            if bore_diameter / 2 >= gear.root_radius:
+                return {
+                    "success": False,
+                    "message": f"Bore diameter must be smaller than the root diameter ({gear.root_radius * 20:.2f}mm)"
+                }
             
             # Create sketch
-            sketches = rootComp.sketches
-            xyPlane = rootComp.xYConstructionPlane
+            sketches = comp.sketches
+            xyPlane = comp.xYConstructionPlane
             sketch = sketches.add(xyPlane)
-            
-            # Draw gear profile
-            lines = sketch.sketchCurves.sketchLines
-            arcs = sketch.sketchCurves.sketchArcs
-            
-            # Create simplified gear teeth using lines
-            angle_per_tooth = 2 * math.pi / num_teeth
-            tooth_width_angle = angle_per_tooth * 0.4  # 40% of tooth pitch for tooth width
-            
-            points = []
-            
-            for i in range(num_teeth):
-                base_angle = i * angle_per_tooth
-                
-                # Tooth tip points
-                tip_angle1 = base_angle - tooth_width_angle / 2
-                tip_angle2 = base_angle + tooth_width_angle / 2
-                
-                # Root points
-                root_angle1 = base_angle + tooth_width_angle / 2
-                root_angle2 = base_angle + angle_per_tooth - tooth_width_angle / 2
-                
-                # Add points for this tooth
-                points.extend([
-                    adsk.core.Point3D.create(
-                        (outer_diameter / 2) * math.cos(tip_angle1),
-                        (outer_diameter / 2) * math.sin(tip_angle1),
-                        0
-                    ),
-                    adsk.core.Point3D.create(
-                        (outer_diameter / 2) * math.cos(tip_angle2),
-                        (outer_diameter / 2) * math.sin(tip_angle2),
-                        0
-                    ),
-                    adsk.core.Point3D.create(
-                        (root_diameter / 2) * math.cos(root_angle1),
-                        (root_diameter / 2) * math.sin(root_angle1),
-                        0
-                    ),
-                    adsk.core.Point3D.create(
-                        (root_diameter / 2) * math.cos(root_angle2),
-                        (root_diameter / 2) * math.sin(root_angle2),
-                        0
-                    )
-                ])
-            
-            # Draw the gear outline
-            for i in range(len(points)):
-                next_i = (i + 1) % len(points)
-                lines.addByTwoPoints(points[i], points[next_i])
-            
-            # Add center bore hole
-            if bore_diameter > 0:
+            with self._deferred_compute(sketch):
+                # Root circle, bore and a single tooth; the other teeth are patterned
                 circles = sketch.sketchCurves.sketchCircles
                 centerPoint = adsk.core.Point3D.create(0, 0, 0)
-                bore_circle = circles.addByCenterRadius(centerPoint, bore_diameter / 2)
+                circles.addByCenterRadius(centerPoint, gear.root_radius)
+                if bore_diameter > 0:
+                    circles.addByCenterRadius(centerPoint, bore_diameter / 2)
+            
+                tooth = gear.tooth_profile()
+                splines = sketch.sketchCurves.sketchFittedSplines
+                lower_flank = splines.add(self._point_collection(tooth['lower']))
+                upper_flank = splines.add(self._point_collection(tooth['upper']))
+                sketch.sketchCurves.sketchArcs.addByThreePoints(
+                    lower_flank.endSketchPoint,
+                    adsk.core.Point3D.create(tooth['tip'][0], tooth['tip'][1], 0),
+                    upper_flank.endSketchPoint
+                )
+            
+            # Pick profiles by loop topology: the tooth is bounded by splines,
+            # the gear body is the root disk (an annulus with two loops when bored)
+            body_loops = 2 if bore_diameter > 0 else 1
+            body_profile = None
+            tooth_profile = None
+            for profile in sketch.profiles:
+                if self._profile_has_spline(profile):
+                    tooth_profile = profile
+                elif profile.profileLoops.count == body_loops:
+                    body_profile = profile
+            
+            if not body_profile or not tooth_profile:
+                return {
+                    "success": False,
+                    "message": "Failed to create gear: could not find the gear profiles"
+                }
             
-            # Create extrusion
-            profiles = sketch.profiles
-            gear_profile = None
-            
-            # Find the gear profile (largest area)
-            max_area = 0
-            for profile in profiles:
-                if profile.areaProperties().area > max_area:
-                    max_area = profile.areaProperties().area
-                    gear_profile = profile
-            
-            if gear_profile:
-                extrudes = rootComp.features.extrudeFeatures
-                extInput = extrudes.createInput(gear_profile, adsk.fusion.FeatureOperations.NewBodyFeatureOperation)
-                distance = adsk.core.ValueInput.createByReal(thickness)
-                extInput.setDistanceExtent(False, distance)
-                extrude = extrudes.add(extInput)
+            # Extrude the body and one tooth
+            extrudes = comp.features.extrudeFeatures
+            distance = adsk.core.ValueInput.createByReal(thickness)
+            extInput = extrudes.createInput(body_profile, adsk.fusion.FeatureOperations.NewBodyFeatureOperation)
+            extInput.setDistanceExtent(False, distance)
+            extrude = self._add_feature(extrudes, extInput)
+            
+            toothInput = extrudes.createInput(tooth_profile, adsk.fusion.FeatureOperations.JoinFeatureOperation)
+            toothInput.setDistanceExtent(False, distance)
+            toothInput.participantBodies = [extrude.bodies.item(0)]
+            tooth_extrude = self._add_feature(extrudes, toothInput)
+            
+            # Replicate the tooth around the gear axis
+            patterns = comp.features.circularPatternFeatures
+            entities = adsk.core.ObjectCollection.create()
+            entities.add(tooth_extrude)
+            patternInput = patterns.createInput(entities, comp.zConstructionAxis)
+            patternInput.quantity = adsk.core.ValueInput.createByReal(num_teeth)
+            patternInput.totalAngle = adsk.core.ValueInput.createByString('360 deg')
+            patternInput.isSymmetric = False
+            patternInput.patternComputeOption = adsk.fusion.PatternComputeOptions.IdenticalPatternCompute
+            self._add_feature(patterns, patternInput)
             
             return {
                 "success": True,
@@ -270,6 +513,20 @@ class AIModelingActions:
                 "message": f"Failed to create gear: {str(e)}"
             }
     
+    def _point_collection(self, points) -> adsk.core.ObjectCollection:
+        """Convert (x, y) tuples into an ObjectCollection of sketch points"""
+        collection = adsk.core.ObjectCollection.create()
+        for x, y in points:
+            collection.add(adsk.core.Point3D.create(x, y, 0))
+        return collection
+    
+    def _profile_has_spline(self, profile) -> bool:
+        for loop in profile.profileLoops:
+            for curve in loop.profileCurves:
+                if isinstance(curve.sketchEntity, adsk.fusion.SketchFittedSpline):
+                    return True
+        return False
+    
     def _create_hole(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """Create a hole in selected face"""
         try:
@@ -278,87 +535,404 @@ class AIModelingActions:
             depth = params.get('depth', 10) / 10
             
             # Check if a face is selected
-            selection = self.ui.activeSelections
-            if selection.count == 0:
+            selected = self._selected_entities(params.get('target'), face=True)
+            if not selected:
                 return {
                     "success": False,
                     "message": "Please select a face first before creating a hole"
                 }
             
-            selected_face = selection.item(0).entity
-            if not isinstance(selected_face, adsk.fusion.BRepFace):
+            faces = [entity for entity in selected if isinstance(entity, adsk.fusion.BRepFace)]
+            if not faces:
                 return {
                     "success": False,
                     "message": "Please select a face to create the hole"
                 }
             
-            design = app.activeProduct
-            rootComp = design.rootComponent
+            if len(faces) == 1:
+                comp, sketch, extrude, center = self._cut_hole(faces[0], diameter, depth)
+                return {
+                    "success": True,
+                    "message": f"Created hole: diameter {params.get('diameter', 5)}mm, depth {params.get('depth', 10)}mm"
+                }
             
-            # Create sketch on selected face
-            sketches = rootComp.sketches
-            sketch = sketches.add(selected_face)
+            cuts = self._cut_holes(faces, diameter, depth)
+            return {
+                "success": True,
+                "message": f"Created {len(faces)} holes: diameter {params.get('diameter', 5)}mm, "
+                           f"depth {params.get('depth', 10)}mm, in {cuts} cut{'s' if cuts != 1 else ''}"
+            }
             
+        except Exception as e:
+            return {
+                "success": False,
+                "message": f"Failed to create hole: {str(e)}"
+            }
+    
+    def _selected_entities(self, target: Optional[str] = None, face: bool = False) -> List[Any]:
+        """
+        Every entity in the active selection, in the order it was selected.
+        With nothing selected, the body the prompt named as target (or its
+        top planar face) is looked up in the design index instead.
+        """
+        selection = self.ui.activeSelections
+        selected = [selection.item(index).entity for index in range(selection.count)]
+        if selected or not target:
+            return selected
+        entity = self.index.find(target)
+        if isinstance(entity, adsk.fusion.Occurrence):
+            entity = entity.bRepBodies.item(0) if entity.bRepBodies.count else None
+        if entity is None:
+            return []
+        if not face:
+            return [entity]
+        top = self._top_face(entity)
+        return [top] if top is not None else []
+    
+    def _top_face(self, body):
+        """The highest face of a body that faces up along Z"""
+        best = None
+        best_z = None
+        for candidate in body.faces:
+            plane = candidate.geometry
+            if not isinstance(plane, adsk.core.Plane) or plane.normal.z < 0.99:
+                continue
+            z = candidate.pointOnFace.z
+            if best_z is None or z > best_z:
+                best, best_z = candidate, z
+        return best
+    
+    def _coplanar_groups(self, selected_faces) -> List[tuple]:
+        """
+        Group selected faces by owning component and plane, as
+        (component, [native faces]). Each group can be one sketch and one
+        feature; a face selected in several occurrences is kept once.
+        """
+        if len(selected_faces) == 1:
+            comp, face = self._resolve_owner(selected_faces[0])
+            return [(comp, [face])]
+        
+        groups = []
+        for selected_face in selected_faces:
+            comp, face = self._resolve_owner(selected_face)
+            plane = face.geometry
+            for group_comp, group_plane, group_faces in groups:
+                if group_comp == comp and group_plane.isCoPlanarTo(plane):
+                    if face not in group_faces:
+                        group_faces.append(face)
+                    break
+            else:
+                groups.append((comp, plane, [face]))
+        return [(comp, faces) for comp, _, faces in groups]
+    
+    def _cut_holes(self, selected_faces, diameter: float, depth: float) -> int:
+        """
+        Cut a hole at the center of every selected face. Coplanar faces of a
+        component share one sketch and one cut, so a selection costs a
+        feature per plane rather than per face. Returns the number of cuts.
+        """
+        groups = self._coplanar_groups(selected_faces)
+        for comp, faces in groups:
+            # Without the face edges the sketch's only profiles are the hole circles
+            sketch = comp.sketches.addWithoutEdges(faces[0])
+            with self._deferred_compute(sketch):
+                circles = sketch.sketchCurves.sketchCircles
+                for face in faces:
+                    center = sketch.modelToSketchSpace(face.pointOnFace)
+                    circles.addByCenterRadius(adsk.core.Point3D.create(center.x, center.y, 0), diameter / 2)
+            
+            profiles = adsk.core.ObjectCollection.create()
+            for profile in sketch.profiles:
+                profiles.add(profile)
+            extrudes = comp.features.extrudeFeatures
+            extInput = extrudes.createInput(profiles, adsk.fusion.FeatureOperations.CutFeatureOperation)
+            extInput.setDistanceExtent(False, adsk.core.ValueInput.createByReal(depth))
+            self._add_feature(extrudes, extInput)
+            self._forget_part(comp)
+        return len(groups)
+    
+    def _body_seeds(self, selected) -> List[Any]:
+        """Pattern seeds for the selected bodies: their occurrence for part bodies, each occurrence once"""
+        seeds = []
+        for body in selected:
+            if isinstance(body, adsk.fusion.BRepBody):
+                seed = body.assemblyContext or body
+                if seed not in seeds:
+                    seeds.append(seed)
+        return seeds
+    
+    def _cut_hole(self, selected_face, diameter: float, depth: float, offset_x: float = 0, offset_y: float = 0,
+                  guides: bool = False):
+        """
+        Cut one hole into a face, offset from the face's center point in sketch
+        space (cm). With guides, construction lines along the sketch X and Y
+        axes and a center point are added for patterning.
+        Returns (component, sketch, cut feature, center sketch point or None).
+        """
+        # Work in the component that owns the face (parts live in their own components)
+        comp, face = self._resolve_owner(selected_face)
+        
+        # Create sketch on selected face
+        sketches = comp.sketches
+        sketch = sketches.add(face)
+        with self._deferred_compute(sketch):
             # Get face center point (simplified)
-            centerPoint = selected_face.pointOnFace
+            centerPoint = face.pointOnFace
             sketch_point = sketch.modelToSketchSpace(centerPoint)
-            
+            hole_point = adsk.core.Point3D.create(sketch_point.x + offset_x, sketch_point.y + offset_y, 0)
+        
             # Draw circle
             circles = sketch.sketchCurves.sketchCircles
-            circle = circles.addByCenterRadius(sketch_point, diameter / 2)
+            circle = circles.addByCenterRadius(hole_point, diameter / 2)
+        
+            center = None
+            if guides:
+                lines = sketch.sketchCurves.sketchLines
+                for dx, dy in ((1, 0), (0, 1)):
+                    guide = lines.addByTwoPoints(hole_point, adsk.core.Point3D.create(hole_point.x + dx, hole_point.y + dy, 0))
+                    guide.isConstruction = True
+                center = sketch.sketchPoints.add(sketch_point)
+        
+        # Create cut extrusion
+        prof = sketch.profiles.item(0)
+        extrudes = comp.features.extrudeFeatures
+        extInput = extrudes.createInput(prof, adsk.fusion.FeatureOperations.CutFeatureOperation)
+        distance = adsk.core.ValueInput.createByReal(depth)
+        extInput.setDistanceExtent(False, distance)
+        extrude = self._add_feature(extrudes, extInput)
+        self._forget_part(comp)
+        return comp, sketch, extrude, center
+    
+    def _rectangular_pattern(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Create a grid of holes in the selected face, or of copies of the selected body, as one pattern"""
+        try:
+            rows = int(params.get('rows', 2))
+            columns = int(params.get('columns', 2))
+            row_spacing = params.get('row_spacing', 10) / 10  # Convert mm to cm
+            column_spacing = params.get('column_spacing', 10) / 10
             
-            # Create cut extrusion
-            prof = sketch.profiles.item(0)
-            extrudes = rootComp.features.extrudeFeatures
-            extInput = extrudes.createInput(prof, adsk.fusion.FeatureOperations.CutFeatureOperation)
-            distance = adsk.core.ValueInput.createByReal(depth)
-            extInput.setDistanceExtent(False, distance)
-            extrude = extrudes.add(extInput)
+            selected = self._selected_entities(params.get('target'))
+            if not selected:
+                return {
+                    "success": False,
+                    "message": "Please select a face (for holes) or a body to pattern first"
+                }
+            
+            # (component, seeds, first direction, second direction) of each pattern feature
+            jobs = []
+            entity = selected[0]
+            if isinstance(entity, adsk.fusion.BRepFace):
+                diameter = params.get('hole_diameter', 5) / 10
+                depth = params.get('hole_depth', 10) / 10
+                
+                # A seed hole and pattern per face; the grid is centered on each face
+                faces = [face for face in selected if isinstance(face, adsk.fusion.BRepFace)]
+                for face in faces:
+                    comp, sketch, seed, center = self._cut_hole(
+                        face, diameter, depth,
+                        -(columns - 1) * column_spacing / 2, -(rows - 1) * row_spacing / 2,
+                        guides=True
+                    )
+                    lines = sketch.sketchCurves.sketchLines
+                    jobs.append((comp, [seed], lines.item(lines.count - 2), lines.item(lines.count - 1)))
+                description = f"{rows}×{columns} grid of {params.get('hole_diameter', 5)}mm holes"
+                if len(faces) > 1:
+                    description += f" on {len(faces)} faces"
+            elif isinstance(entity, adsk.fusion.BRepBody):
+                # Every selected body is a seed of the same pattern feature
+                comp = app.activeProduct.rootComponent
+                seeds = self._body_seeds(selected)
+                jobs.append((comp, seeds, comp.xConstructionAxis, comp.yConstructionAxis))
+                description = f"{rows}×{columns} grid of {'bodies' if len(seeds) == 1 else f'{len(seeds)} bodies'}"
+            else:
+                return {
+                    "success": False,
+                    "message": "Please select a face (for holes) or a body to pattern"
+                }
+            
+            for comp, seeds, direction_one, direction_two in jobs:
+                patterns = comp.features.rectangularPatternFeatures
+                entities = adsk.core.ObjectCollection.create()
+                for seed in seeds:
+                    entities.add(seed)
+                patternInput = patterns.createInput(
+                    entities,
+                    direction_one,
+                    adsk.core.ValueInput.createByReal(columns),
+                    adsk.core.ValueInput.createByReal(column_spacing),
+                    adsk.fusion.PatternDistanceType.SpacingPatternDistanceType
+                )
+                patternInput.setDirectionTwo(
+                    direction_two,
+                    adsk.core.ValueInput.createByReal(rows),
+                    adsk.core.ValueInput.createByReal(row_spacing)
+                )
+                patternInput.patternComputeOption = adsk.fusion.PatternComputeOptions.IdenticalPatternCompute
+                self._add_feature(patterns, patternInput)
             
             return {
                 "success": True,
-                "message": f"Created hole: diameter {params.get('diameter', 5)}mm, depth {params.get('depth', 10)}mm"
+                "message": f"Created {description}, spacing {params.get('row_spacing', 10)}×{params.get('column_spacing', 10)}mm"
             }
             
         except Exception as e:
             return {
                 "success": False,
-                "message": f"Failed to create hole: {str(e)}"
+                "message": f"Failed to create rectangular pattern: {str(e)}"
             }
     
+    def _circular_pattern(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Create a ring of holes in the selected face, or copies of the selected body around Z, as one pattern"""
+        try:
+            count = int(params.get('count', 6))
+            radius = params.get('radius', 20) / 10  # Convert mm to cm
+            angle = params.get('angle', 360)
+            
+            selected = self._selected_entities(params.get('target'))
+            if not selected:
+                return {
+                    "success": False,
+                    "message": "Please select a face (for holes) or a body to pattern first"
+                }
+            
+            # (component, seeds, axis) of each pattern feature
+            jobs = []
+            entity = selected[0]
+            if isinstance(entity, adsk.fusion.BRepFace):
+                diameter = params.get('hole_diameter', 5) / 10
+                depth = params.get('hole_depth', 10) / 10
+                
+                # Seed hole on the circle, patterned around the face normal through its center, per face
+                faces = [face for face in selected if isinstance(face, adsk.fusion.BRepFace)]
+                for face in faces:
+                    comp, sketch, seed, center = self._cut_hole(face, diameter, depth, radius, 0, guides=True)
+                    axes = comp.constructionAxes
+                    axisInput = axes.createInput()
+                    axisInput.setByNormalToFaceAtPoint(self._resolve_owner(face)[1], center)
+                    jobs.append((comp, [seed], axes.add(axisInput)))
+                description = f"{count} holes of {params.get('hole_diameter', 5)}mm on a {params.get('radius', 20)}mm radius"
+                if len(faces) > 1:
+                    description += f" on {len(faces)} faces"
+            elif isinstance(entity, adsk.fusion.BRepBody):
+                # Every selected body is a seed of the same pattern feature
+                comp = app.activeProduct.rootComponent
+                seeds = self._body_seeds(selected)
+                jobs.append((comp, seeds, comp.zConstructionAxis))
+                description = f"{count} {'bodies' if len(seeds) == 1 else f'copies of {len(seeds)} bodies'} around the Z axis"
+            else:
+                return {
+                    "success": False,
+                    "message": "Please select a face (for holes) or a body to pattern"
+                }
+            
+            for comp, seeds, axis in jobs:
+                patterns = comp.features.circularPatternFeatures
+                entities = adsk.core.ObjectCollection.create()
+                for seed in seeds:
+                    entities.add(seed)
+                patternInput = patterns.createInput(entities, axis)
+                patternInput.quantity = adsk.core.ValueInput.createByReal(count)
+                patternInput.totalAngle = adsk.core.ValueInput.createByString(f'{angle} deg')
+                patternInput.isSymmetric = False
+                patternInput.patternComputeOption = adsk.fusion.PatternComputeOptions.IdenticalPatternCompute
+                self._add_feature(patterns, patternInput)
+            
+            return {
+                "success": True,
+                "message": f"Created circular pattern: {description}"
+            }
+            
+        except Exception as e:
+            return {
+                "success": False,
+                "message": f"Failed to create circular pattern: {str(e)}"
+            }
+    
+    def _export_bodies(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Queue the selected bodies or components, or else every body the copilot created, for export"""
+        design = adsk.fusion.Design.cast(app.activeProduct)
+        if not design:
+            return {
+                "success": False,
+                "message": "Open a design to export from"
+            }
+        root = design.rootComponent
+        
+        targets = {}
+        selection = self.ui.activeSelections
+        for index in range(selection.count):
+            entity = selection.item(index).entity
+            if isinstance(entity, adsk.fusion.Occurrence):
+                entity = entity.component
+            elif isinstance(entity, adsk.fusion.BRepFace):
+                entity = entity.body
+            if isinstance(entity, adsk.fusion.BRepBody) and entity.assemblyContext:
+                entity = entity.nativeObject
+            if isinstance(entity, (adsk.fusion.BRepBody, adsk.fusion.Component)):
+                targets.setdefault(entity.entityToken, entity)
+        
+        if not targets:
+            self.index.sync(design)
+            for entry in self.index.created():
+                entity = entry.entity
+                if not entity.isValid:
+                    continue
+                if isinstance(entity, adsk.fusion.Occurrence):
+                    entity = entity.component
+                targets.setdefault(entity.entityToken, entity)
+        
+        if not targets:
+            return {
+                "success": False,
+                "message": "Nothing to export: select bodies or create some with the copilot first"
+            }
+        return self.exports.add(list(targets.values()), params.get('format'), params.get('refinement'),
+                                design.parentDocument.name, root)
+    
     def _extrude_face(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """Extrude selected face"""
         try:
             distance = params.get('distance', 10) / 10  # Convert mm to cm
             
             # Check if a face is selected
-            selection = self.ui.activeSelections
-            if selection.count == 0:
+            selected = self._selected_entities(params.get('target'), face=True)
+            if not selected:
                 return {
                     "success": False,
                     "message": "Please select a face first before extruding"
                 }
             
-            selected_face = selection.item(0).entity
-            if not isinstance(selected_face, adsk.fusion.BRepFace):
+            faces = [entity for entity in selected if isinstance(entity, adsk.fusion.BRepFace)]
+            if not faces:
                 return {
                     "success": False,
                     "message": "Please select a face to extrude"
                 }
             
-            design = app.activeProduct
-            rootComp = design.rootComponent
-            
-            # Create extrusion from face
-            extrudes = rootComp.features.extrudeFeatures
-            extInput = extrudes.createInput(selected_face, adsk.fusion.FeatureOperations.JoinFeatureOperation)
-            distance_input = adsk.core.ValueInput.createByReal(distance)
-            extInput.setDistanceExtent(False, distance_input)
-            extrude = extrudes.add(extInput)
-            
+            # One extrusion per component and plane, taking all of its faces
+            groups = self._coplanar_groups(faces)
+            for comp, group_faces in groups:
+                profile = group_faces[0]
+                if len(group_faces) > 1:
+                    profile = adsk.core.ObjectCollection.create()
+                    for face in group_faces:
+                        profile.add(face)
+                
+                extrudes = comp.features.extrudeFeatures
+                extInput = extrudes.createInput(profile, adsk.fusion.FeatureOperations.JoinFeatureOperation)
+                distance_input = adsk.core.ValueInput.createByReal(distance)
+                extInput.setDistanceExtent(False, distance_input)
+                extrude = self._add_feature(extrudes, extInput)
+                self._forget_part(comp)
+            
+            if len(faces) == 1:
+                message = f"Extruded face by {params.get('distance', 10)}mm"
+            else:
+                message = (f"Extruded {len(faces)} faces by {params.get('distance', 10)}mm "
+                           f"in {len(groups)} feature{'s' if len(groups) != 1 else ''}")
             return {
                 "success": True,
-                "message": f"Extruded face by {params.get('distance', 10)}mm"
+                "message": message
             }
             
         except Exception as e:
@@ -375,15 +949,15 @@ class AIModelingActions:
             z = params.get('z', 0) / 10
             
             # Check if a body is selected
-            selection = self.ui.activeSelections
-            if selection.count == 0:
+            selected = self._selected_entities(params.get('target'))
+            if not selected:
                 return {
                     "success": False,
                     "message": "Please select a body first before moving"
                 }
             
-            selected_body = selection.item(0).entity
-            if not isinstance(selected_body, adsk.fusion.BRepBody):
+            bodies = [entity for entity in selected if isinstance(entity, adsk.fusion.BRepBody)]
+            if not bodies:
                 return {
                     "success": False,
                     "message": "Please select a body to move"
@@ -391,23 +965,48 @@ class AIModelingActions:
             
             design = app.activeProduct
             rootComp = design.rootComponent
-            
-            # Create move feature
-            moveFeats = rootComp.features.moveFeatures
-            moveInput = moveFeats.createInput(adsk.core.ObjectCollection.create())
-            moveInput.inputEntities.add(selected_body)
-            
-            # Create transform
             vector = adsk.core.Vector3D.create(x, y, z)
-            transform = adsk.core.Matrix3D.create()
-            transform.translation = vector
-            moveInput.transform = transform
             
-            moveFeature = moveFeats.add(moveInput)
+            # Bodies of part components are moved by moving their occurrence,
+            # which leaves other instances of the same part in place
+            occurrences = []
+            root_bodies = []
+            for body in bodies:
+                occurrence = body.assemblyContext
+                if not occurrence:
+                    root_bodies.append(body)
+                elif occurrence not in occurrences:
+                    occurrences.append(occurrence)
+            
+            for occurrence in occurrences:
+                transform = occurrence.transform2
+                translation = transform.translation
+                translation.add(vector)
+                transform.translation = translation
+                occurrence.transform2 = transform
+                self.index.track(occurrence, "move_body", params)
+            if occurrences and design.snapshots.hasPendingSnapshot:
+                design.snapshots.add()
+            
+            if root_bodies:
+                # One move feature for every selected body of the root component
+                moveFeats = rootComp.features.moveFeatures
+                entities = adsk.core.ObjectCollection.create()
+                for body in root_bodies:
+                    entities.add(body)
+                moveInput = moveFeats.createInput(entities)
+                
+                # Create transform
+                transform = adsk.core.Matrix3D.create()
+                transform.translation = vector
+                moveInput.transform = transform
+                
+                moveFeature = self._add_feature(moveFeats, moveInput)
             
+            moved = "body" if len(bodies) == 1 else f"{len(bodies)} bodies"
             return {
                 "success": True,
-                "message": f"Moved body by X:{params.get('x', 0)}mm, Y:{params.get('y', 0)}mm, Z:{params.get('z', 0)}mm"
+                "message": f"Moved {moved} by X:{params.get('x', 0)}mm, Y:{params.get('y', 0)}mm, Z:{params.get('z', 0)}mm"
             }
             
         except Exception as e:
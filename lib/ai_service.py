@@ -1,30 +1,132 @@
 import json
 import math
-import re
-from typing import Dict, Any, Optional
-from ..config import AI_API_KEY, AI_MODEL, AI_MAX_TOKENS, SUPPORTED_AI_COMMANDS
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Dict, Any, List, Optional, Callable
+from ..config import AI_MODEL, AI_MAX_TOKENS, SUPPORTED_AI_COMMANDS
+from .. import config
+from .ai_cache import CommandCache
+from .similarity_cache import SimilarityCache
+from .intent_parser import IntentParser, PARAMETER_DEFAULTS
+from .tool_catalog import ToolCatalog, SYSTEM_PROMPT
+from .metrics import metrics
+from .model_router import ModelRouter
+from .resilience import CircuitBreaker, backoff_delay
+from . import openai_client
+
+def normalize_actions(response: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Make sure a structured response carries an ordered "actions" list.
+    Single-action responses ({action, parameters}) become a one-step list, and
+    "action"/"parameters" always mirror the first step.
+    """
+    actions = response.get('actions')
+    if not isinstance(actions, list):
+        actions = []
+        if response.get('action'):
+            actions.append({
+                "action": response['action'],
+                "parameters": response.get('parameters') or {}
+            })
+
+    response['actions'] = [
+        {"action": step.get('action'), "parameters": step.get('parameters') or {}}
+        for step in actions
+        if isinstance(step, dict) and step.get('action')
+    ]
+    if response['actions']:
+        response['action'] = response['actions'][0]['action']
+        response['parameters'] = response['actions'][0]['parameters']
+    elif response.get('success', False):
+        response['success'] = False
+        response['error'] = response.get('error') or "AI response contained no actions"
+    return response
+
+
+def describe_step(action: str, parameters: Dict[str, Any]) -> str:
+    """Short human readable summary of one step, e.g. 'create_gear, 24 teeth'"""
+    details = []
+    for name, value in parameters.items():
+        if name == "number_of_teeth":
+            details.append(f"{value} teeth")
+        else:
+            details.append(f"{name.replace('_', ' ')} {value}")
+    return ", ".join([action] + details)
 
-try:
-    from openai import OpenAI
-    OPENAI_AVAILABLE = True
-except ImportError:
-    OPENAI_AVAILABLE = False
 
 class AIService:
     def __init__(self):
-        self.client = None
-        if OPENAI_AVAILABLE and AI_API_KEY:
-            self.client = OpenAI(api_key=AI_API_KEY)
+        self.cache = None
+        self.intent_parser = IntentParser(SUPPORTED_AI_COMMANDS)
+        self.tools = ToolCatalog(SUPPORTED_AI_COMMANDS)
+        tiers = config.AI_MODEL_TIERS if config.AI_ROUTING_ENABLED else [
+            {"name": "default", "model": AI_MODEL, "max_complexity": None}
+        ]
+        self.router = ModelRouter(tiers, self.intent_parser.candidate_actions)
+        self.similarity = None
+        # DesignIndex of the active design, set by the palette; None leaves prompts without design context
+        self.design_index = None
+        self.breaker = CircuitBreaker(config.AI_BREAKER_FAILURES, config.AI_BREAKER_COOLDOWN, name="OpenAI")
+        self.fallbacks = 0
+        self._requests: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        if config.AI_SIMILARITY_CACHE_ENABLED:
+            self.similarity = SimilarityCache(
+                model=self.router.signature,
+                schema_version=config.AI_RESPONSE_SCHEMA_VERSION,
+                threshold=config.AI_SIMILARITY_THRESHOLD,
+                max_entries=config.AI_SIMILARITY_MAX_ENTRIES,
+                keywords=self.intent_parser.candidate_actions,
+                defaults=PARAMETER_DEFAULTS
+            )
+        if config.AI_CACHE_ENABLED:
+            self.cache = CommandCache(
+                model=self.router.signature,
+                schema_version=config.AI_RESPONSE_SCHEMA_VERSION,
+                ttl_seconds=config.AI_CACHE_TTL_SECONDS,
+                memory_entries=config.AI_CACHE_MEMORY_ENTRIES,
+                disk_entries=config.AI_CACHE_DISK_ENTRIES
+            )
+    
+    @property
+    def client(self):
+        """The process-wide OpenAI client, or None when running without one"""
+        return openai_client.get_client()
     
-    def process_natural_language_command(self, user_input: str) -> Dict[str, Any]:
+    def process_natural_language_command(self, user_input: str,
+                                         on_progress: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
         """
-        Process natural language input and return structured command
+        Process natural language input and return structured command.
+        on_progress receives short status strings while a streamed response arrives.
         """
         try:
-            if self.client:
-                return self._process_with_openai(user_input)
+            # Fast path: simple commands are handled by the local parser
+            with metrics.span("local_parse"):
+                local_response = normalize_actions(self.intent_parser.parse(user_input))
+            if not self.client:
+                return local_response
+            # Prompts about existing geometry ("a hole in the gear") need the LLM and the design
+            # summary, unless the local parser already placed the part ("next to the cube"). A
+            # confident local answer is kept unless the prompt names a part it cannot resolve:
+            # "move it 10mm" acts on the selection.
+            confident = local_response.get('confidence', 0) >= config.LOCAL_PARSER_MIN_CONFIDENCE
+            context = ""
+            if (self.design_index is not None and config.AI_DESIGN_CONTEXT_ENABLED
+                    and not local_response.get('parameters', {}).get('near')):
+                context = self.design_index.context_for(user_input, named_only=confident)
+            if not context and confident:
+                return local_response
+
+            models = self.router.route(user_input, local_response.get('confidence', 0))
+            if config.AI_LATENCY_BUDGET <= 0:
+                response = self._lookup_or_interpret(user_input, models, on_progress, context=context)
             else:
-                return self._create_mock_response(user_input)
+                response = self._within_budget(user_input, models, local_response, on_progress, context)
+            if not response.get('success', False) and local_response.get('success', False):
+                # Anything the local parser understood beats an error
+                return self._fallback(local_response, response.get('error', "OpenAI request failed"))
+            return response
         except Exception as e:
             return {
                 "success": False,
@@ -33,151 +135,278 @@ class AIService:
                 "parameters": {}
             }
     
-    def _process_with_openai(self, user_input: str) -> Dict[str, Any]:
-        """Process command using OpenAI API"""
-        system_prompt = f"""
-        You are an AI assistant for Fusion 360 CAD software. Convert natural language commands into structured JSON responses.
-        
-        Available commands: {list(SUPPORTED_AI_COMMANDS.keys())}
-        
-        Command details:
-        {json.dumps(SUPPORTED_AI_COMMANDS, indent=2)}
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters of the prompt and similarity caches, model routing and the OpenAI circuit state"""
+        stats = dict(self.cache.stats(), enabled=True) if self.cache else {"enabled": False}
+        if self.similarity:
+            stats['similarity'] = self.similarity.stats()
+        stats['routing'] = self.router.stats()
+        stats['circuit'] = dict(self.breaker.stats(), fallbacks=self.fallbacks)
+        return stats
+    
+    def close(self) -> None:
+        """Abandon background requests"""
+        with self._lock:
+            if self._requests is not None:
+                self._requests.shutdown(wait=False, cancel_futures=True)
+                self._requests = None
+    
+    def _within_budget(self, user_input: str, models: List[str], local_response: Dict[str, Any],
+                       on_progress: Optional[Callable[[str], None]], context: str = "") -> Dict[str, Any]:
+        """
+        Ask OpenAI on a background thread and wait at most AI_LATENCY_BUDGET.
+        When the deadline passes, the local parser's answer is returned; the request
+        keeps running and its answer goes into the caches for next time.
+        """
+        deadline = time.monotonic() + config.AI_LATENCY_BUDGET
+        abandoned = threading.Event()
+        progress = None
+        if on_progress:
+            progress = lambda status: None if abandoned.is_set() else on_progress(status)
+        request_id = metrics.current_request()
+
+        def run():
+            with metrics.request(request_id):
+                return self._lookup_or_interpret(user_input, models, progress, deadline, context)
+
+        future = self._executor().submit(run)
+        try:
+            return future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            abandoned.set()
+            return self._fallback(local_response, f"OpenAI did not answer within {config.AI_LATENCY_BUDGET:g}s")
+    
+    def _lookup_or_interpret(self, user_input: str, models: List[str],
+                             on_progress: Optional[Callable[[str], None]] = None,
+                             deadline: Optional[float] = None, context: str = "") -> Dict[str, Any]:
+        if context:
+            # The answer depends on the design, so it is neither looked up nor cached
+            return self._process_with_openai(user_input, models, on_progress, deadline, context)
+        if self.cache:
+            return self.cache.get_or_compute(
+                user_input, lambda: self._interpret(user_input, models, on_progress, deadline)
+            )
+        return self._interpret(user_input, models, on_progress, deadline)
+    
+    def _fallback(self, local_response: Dict[str, Any], reason: str) -> Dict[str, Any]:
+        """The local parser's answer in place of OpenAI's, or an error saying why there is none"""
+        with self._lock:
+            self.fallbacks += 1
+        if local_response.get('success', False):
+            return dict(local_response, source="local_fallback", fallback_reason=reason)
+        return {
+            "success": False,
+            "error": f"{reason}; the command was not understood locally either. Try again in a moment.",
+            "action": None,
+            "parameters": {}
+        }
+    
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._requests is None:
+                self._requests = ThreadPoolExecutor(
+                    max_workers=config.AI_MAX_CONNECTIONS,
+                    thread_name_prefix="FusionGPT-OpenAI"
+                )
+            return self._requests
+    
+    def _interpret(self, user_input: str, models: List[str], on_progress: Optional[Callable[[str], None]] = None,
+                   deadline: Optional[float] = None) -> Dict[str, Any]:
+        """Answer from a similar earlier prompt, or ask OpenAI and remember the answer"""
+        if self.similarity:
+            with metrics.span("similarity_lookup"):
+                similar = self.similarity.lookup(user_input)
+            if similar is not None:
+                return similar
         
-        Rules:
-        1. Extract dimensions and convert to millimeters
-        2. Use default values if parameters are missing
-        3. Return JSON with: action, parameters, success, message
-        4. For create_hole, user must select a face first
-        5. For extrude_face and move_body, user must select geometry first
+        response = self._process_with_openai(user_input, models, on_progress, deadline)
+        if self.similarity and response.get('success', False):
+            self.similarity.add(user_input, response)
+        return response
+    
+    def _process_with_openai(self, user_input: str, models: List[str],
+                             on_progress: Optional[Callable[[str], None]] = None,
+                             deadline: Optional[float] = None, context: str = "") -> Dict[str, Any]:
+        """
+        Process command using OpenAI tool calls, one call per step.
+        The first of ``models`` is asked first; when its answer is unusable or
+        the request is rejected, the next one is asked. ``context`` is a summary of the design, sent after
+        the fixed system prompt so that prefix stays cacheable.
+        """
+        if not self.breaker.allow():
+            return {
+                "success": False,
+                "error": f"OpenAI is unavailable, next attempt in {self.breaker.retry_in():.0f}s",
+                "action": None,
+                "parameters": {}
+            }
+
+        candidates = self.intent_parser.candidate_actions(user_input) if config.AI_TOOL_SELECTION else None
+        messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+        if context:
+            messages.append({"role": "system", "content": context})
+        messages.append({"role": "user", "content": user_input})
+        request = {
+            "model": models[0],
+            "messages": messages,
+            "tools": self.tools.select(candidates),
+            "tool_choice": "required",
+            "max_tokens": AI_MAX_TOKENS,
+            "temperature": 0.1
+        }
         
-        Example response:
-        {{
-            "success": true,
-            "action": "create_box",
-            "parameters": {{"length": 20, "width": 20, "height": 20}},
-            "message": "Creating a 20mm cube"
-        }}
+        for index, model in enumerate(models):
+            request["model"] = model
+            try:
+                response = self._complete_with_retries(request, on_progress, deadline)
+            except Exception as e:
+                response = {
+                    "success": False,
+                    "error": f"OpenAI API error: {str(e)}",
+                    "action": None,
+                    "parameters": {}
+                }
+                # An outage that outlasted the retries hits the next model too; a model that is
+                # unavailable or rejects the request (400, 404) may have a successor that does not
+                if openai_client.is_transient(e):
+                    return response
+            if response.get('success', False) or index == len(models) - 1:
+                return response
+            self.router.escalated(model, models[index + 1], response.get('error'))
+    
+    def _complete_with_retries(self, request: Dict[str, Any], on_progress: Optional[Callable[[str], None]],
+                               deadline: Optional[float]) -> Dict[str, Any]:
+        """
+        Transient failures are retried with jittered exponential backoff as long as the
+        retry starts before the deadline; an attempt already running is not cut short.
+        Raises the last error when retrying does not help.
         """
+        attempt = 0
+        while True:
+            try:
+                response = self._complete(self.client, request, on_progress)
+                self.breaker.record_success()
+                return response
+            except Exception as e:
+                transient = openai_client.is_transient(e)
+                if transient and attempt < config.AI_MAX_RETRIES:
+                    delay = backoff_delay(attempt, config.AI_RETRY_BASE_DELAY, config.AI_RETRY_MAX_DELAY)
+                    delay = max(delay, openai_client.retry_after(e) or 0)
+                    if deadline is None or time.monotonic() + delay < deadline:
+                        attempt += 1
+                        time.sleep(delay)
+                        continue
+                # Errors like a rejected request show the service is up; only outages open the circuit
+                if transient:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                raise
+    
+    def _complete(self, client, request: Dict[str, Any], on_progress: Optional[Callable[[str], None]]) -> Dict[str, Any]:
+        """One completion request; raises on API errors"""
+        if config.AI_STREAMING:
+            return self._stream_completion(client, request, on_progress)
+
+        with metrics.span("llm_request", detail=request["model"]):
+            response = client.chat.completions.create(**request)
         
+        with metrics.span("response_parse"):
+            message = response.choices[0].message
+            calls = [(call.function.name, call.function.arguments) for call in message.tool_calls or []]
+            return self._response_from_tool_calls(calls, message.content)
+    
+    def _stream_completion(self, client, request: Dict[str, Any],
+                           on_progress: Optional[Callable[[str], None]]) -> Dict[str, Any]:
+        """
+        Stream the tool calls, reporting each step as soon as its arguments are
+        complete. No step is executed before the response has finished: a
+        stream that breaks off is retried, and an unusable answer is handed to
+        the next model, so early steps could be built twice or belong to an
+        answer that is thrown away. Streaming shortens the wait for feedback,
+        not for the first geometry.
+        """
+        started = time.perf_counter()
+        calls: Dict[int, list] = {}
+        content = []
+        finished = False
+        stream = client.chat.completions.create(stream=True, **request)
         try:
-            response = self.client.chat.completions.create(
-                model=AI_MODEL,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_input}
-                ],
-                max_tokens=AI_MAX_TOKENS,
-                temperature=0.1
-            )
-            
-            ai_response = response.choices[0].message.content.strip()
-            
-            # Try to extract JSON from response
-            json_match = re.search(r'\{.*\}', ai_response, re.DOTALL)
-            if json_match:
-                return json.loads(json_match.group())
-            else:
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                if delta.content:
+                    content.append(delta.content)
+                for call in delta.tool_calls or []:
+                    if call.index not in calls:
+                        # A new call starts, so the one before it is complete
+                        if on_progress and call.index - 1 in calls:
+                            self._report_step(calls[call.index - 1], on_progress)
+                        calls[call.index] = [None, ""]
+                    entry = calls[call.index]
+                    if call.function and call.function.name:
+                        entry[0] = call.function.name
+                        if on_progress:
+                            on_progress(f"Interpreting… {entry[0]}")
+                    if call.function and call.function.arguments:
+                        entry[1] += call.function.arguments
+                if chunk.choices[0].finish_reason:
+                    finished = True
+                    break
+        finally:
+            stream.close()
+            metrics.record("llm_request", (time.perf_counter() - started) * 1000, detail=request["model"], success=finished)
+        if not finished:
+            # Arguments cut off mid-call must not be executed; retried like a dropped connection
+            raise openai_client.StreamInterrupted(f"The response stream ended early ({len(calls)} tool calls begun)")
+
+        with metrics.span("response_parse"):
+            ordered = [tuple(calls[index]) for index in sorted(calls)]
+            return self._response_from_tool_calls(ordered, "".join(content))
+    
+    def _report_step(self, call: list, on_progress: Callable[[str], None]) -> None:
+        try:
+            parameters = json.loads(call[1] or "{}")
+        except ValueError:
+            return
+        on_progress(f"Interpreting… {describe_step(call[0], parameters)}")
+    
+    def _response_from_tool_calls(self, calls: List[tuple], content: Optional[str] = None) -> Dict[str, Any]:
+        """Build the structured {actions: [...]} response from (name, arguments JSON) pairs"""
+        actions = []
+        for name, arguments in calls:
+            if name not in SUPPORTED_AI_COMMANDS:
                 return {
                     "success": False,
-                    "error": "Could not parse AI response",
+                    "error": f"AI requested an unknown action: {name}",
                     "action": None,
                     "parameters": {}
                 }
-                
-        except Exception as e:
+            try:
+                given = json.loads(arguments or "{}")
+            except ValueError:
+                return {
+                    "success": False,
+                    "error": f"AI returned invalid arguments for {name}",
+                    "action": None,
+                    "parameters": {}
+                }
+            # Defaults are filled in here so every step carries its full parameter set
+            parameters = dict(PARAMETER_DEFAULTS.get(name, {}))
+            parameters.update({key: value for key, value in given.items()
+                               if key in SUPPORTED_AI_COMMANDS[name].get("parameters", [])})
+            actions.append({"action": name, "parameters": parameters})
+
+        if not actions:
             return {
                 "success": False,
-                "error": f"OpenAI API error: {str(e)}",
+                "error": (content or "").strip() or "AI response contained no actions",
                 "action": None,
                 "parameters": {}
             }
-    
-    def _create_mock_response(self, user_input: str) -> Dict[str, Any]:
-        """Create mock responses for testing without OpenAI API"""
-        user_input = user_input.lower()
-        
-        # Extract numbers from input
-        numbers = re.findall(r'\d+(?:\.\d+)?', user_input)
-        
-        if 'cube' in user_input or 'box' in user_input:
-            size = float(numbers[0]) if numbers else 20
-            return {
-                "success": True,
-                "action": "create_box",
-                "parameters": {"length": size, "width": size, "height": size},
-                "message": f"Creating a {size}mm cube"
-            }
-        
-        elif 'cylinder' in user_input:
-            radius = float(numbers[0]) if numbers else 10
-            height = float(numbers[1]) if len(numbers) > 1 else 25
-            return {
-                "success": True,
-                "action": "create_cylinder",
-                "parameters": {"radius": radius, "height": height},
-                "message": f"Creating cylinder: radius {radius}mm, height {height}mm"
-            }
-        
-        elif 'sphere' in user_input:
-            radius = float(numbers[0]) if numbers else 15
-            return {
-                "success": True,
-                "action": "create_sphere",
-                "parameters": {"radius": radius},
-                "message": f"Creating sphere with radius {radius}mm"
-            }
-        
-        elif 'gear' in user_input:
-            teeth = int(numbers[0]) if numbers else 20
-            module = float(numbers[1]) if len(numbers) > 1 else 2.0
-            bore = float(numbers[2]) if len(numbers) > 2 else 6.0
-            thickness = float(numbers[3]) if len(numbers) > 3 else 5.0
-            return {
-                "success": True,
-                "action": "create_gear",
-                "parameters": {
-                    "number_of_teeth": teeth,
-                    "module": module,
-                    "bore_diameter": bore,
-                    "thickness": thickness
-                },
-                "message": f"Creating gear: {teeth} teeth, module {module}mm, bore {bore}mm"
-            }
-        
-        elif 'hole' in user_input:
-            diameter = float(numbers[0]) if numbers else 5
-            depth = float(numbers[1]) if len(numbers) > 1 else 10
-            return {
-                "success": True,
-                "action": "create_hole",
-                "parameters": {"diameter": diameter, "depth": depth},
-                "message": f"Creating hole: diameter {diameter}mm, depth {depth}mm"
-            }
-        
-        elif 'extrude' in user_input:
-            distance = float(numbers[0]) if numbers else 10
-            return {
-                "success": True,
-                "action": "extrude_face",
-                "parameters": {"distance": distance},
-                "message": f"Extruding selected face by {distance}mm"
-            }
-        
-        elif 'move' in user_input:
-            x = float(numbers[0]) if numbers else 10
-            y = float(numbers[1]) if len(numbers) > 1 else 0
-            z = float(numbers[2]) if len(numbers) > 2 else 0
-            return {
-                "success": True,
-                "action": "move_body",
-                "parameters": {"x": x, "y": y, "z": z},
-                "message": f"Moving selected body by X:{x}mm, Y:{y}mm, Z:{z}mm"
-            }
-        
-        else:
-            return {
-                "success": False,
-                "error": "Command not recognized. Try: 'create a 20mm cube', 'make a cylinder', 'create gear with 24 teeth'",
-                "action": None,
-                "parameters": {}
-            }
\ No newline at end of file
+        return normalize_actions({
+            "success": True,
+            "actions": actions,
+            "message": "; ".join(describe_step(step['action'], step['parameters']) for step in actions)
+        })
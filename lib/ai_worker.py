@@ -0,0 +1,80 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, Callable, Optional, Set
+
+from .metrics import metrics
+
+
+class AIWorkerPool:
+    """Runs natural language interpretation off Fusion's main thread.
+
+    The Fusion API may only be used from the main thread, so the workers never
+    touch the design. Each finished interpretation is handed to ``on_complete``
+    which is responsible for marshalling it back (a Fusion CustomEvent).
+    Status updates produced while a response streams in go to ``on_progress``
+    the same way. A cancelled request never reaches ``on_complete``.
+    """
+
+    def __init__(self, ai_service, on_complete: Callable[[str, Dict[str, Any]], None], max_workers: int = 2,
+                 on_progress: Optional[Callable[[str, str], None]] = None):
+        self.ai_service = ai_service
+        self.on_complete = on_complete
+        self.on_progress = on_progress
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._futures: Dict[str, Future] = {}
+        self._cancelled: Set[str] = set()
+
+    def submit(self, request_id: str, command: str) -> None:
+        """Queue a command for interpretation"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="FusionGPT-AI"
+                )
+            self._futures[request_id] = self._executor.submit(self._run, request_id, command)
+
+    def cancel(self, request_id: str) -> bool:
+        """Drop a queued or running interpretation; False when it already finished"""
+        with self._lock:
+            future = self._futures.pop(request_id, None)
+            if future is None:
+                return False
+            # A running request cannot be interrupted; its result is discarded instead
+            if not future.cancel():
+                self._cancelled.add(request_id)
+            return True
+
+    def shutdown(self) -> None:
+        """Stop accepting work; pending interpretations are abandoned"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+            self._futures.clear()
+            self._cancelled.clear()
+
+    def _run(self, request_id: str, command: str) -> None:
+        try:
+            progress = None
+            if self.on_progress:
+                def progress(status: str) -> None:
+                    if request_id not in self._cancelled:
+                        self.on_progress(request_id, status)
+            with metrics.request(request_id):
+                ai_response = self.ai_service.process_natural_language_command(command, on_progress=progress)
+        except Exception as e:
+            ai_response = {
+                "success": False,
+                "error": f"AI processing failed: {str(e)}",
+                "action": None,
+                "parameters": {}
+            }
+        with self._lock:
+            self._futures.pop(request_id, None)
+            if request_id in self._cancelled:
+                self._cancelled.discard(request_id)
+                return
+        self.on_complete(request_id, ai_response)
@@ -0,0 +1,104 @@
+import json
+import time
+from typing import Dict, Any, List, Optional
+
+from .storage import Storage, storage as default_storage
+
+
+class CommandHistory:
+    """Interpreted commands and the macros saved from them, in fusionGPT.db.
+
+    Every command that reaches the palette is recorded with its prompt, the
+    structured steps it was interpreted as and whether they ran. A range of
+    history can be saved as a named macro: the successful steps in that range,
+    in order. Replaying a macro needs no interpretation at all; the stored
+    steps go straight to the modeling actions.
+    """
+
+    def __init__(self, store: Optional[Storage] = None, max_entries: int = 10000):
+        self.store = store or default_storage
+        self.max_entries = max_entries
+        self._recorded = 0
+
+    def record(self, prompt: str, actions: List[Dict[str, Any]], success: bool, message: str = "",
+               source: Optional[str] = None, request_id: Optional[str] = None) -> None:
+        """Queue one executed command; called on Fusion's main thread, so it never waits on the disk"""
+        self.store.write(
+            "INSERT INTO command_history (request_id, prompt, actions, source, success, message, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (request_id, prompt, json.dumps(actions), source, int(success), message, time.time())
+        )
+        self._recorded += 1
+        if self._recorded % 100 == 0:
+            self.store.write(
+                "DELETE FROM command_history WHERE id <= (SELECT MAX(id) FROM command_history) - ?",
+                (self.max_entries,)
+            )
+
+    def recent(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """The newest entries first, including those still queued"""
+        rows = self.store.query(
+            "SELECT id, prompt, actions, source, success, message, created_at FROM command_history "
+            "ORDER BY id DESC LIMIT ?",
+            (limit,), fresh=True
+        )
+        return [
+            {
+                "id": entry_id,
+                "prompt": prompt,
+                "actions": json.loads(actions),
+                "source": source,
+                "success": bool(success),
+                "message": message,
+                "createdAt": created_at
+            }
+            for entry_id, prompt, actions, source, success, message, created_at in rows
+        ]
+
+    def save_macro(self, name: str, first_id: int, last_id: int) -> Dict[str, Any]:
+        """Save the successful steps of history entries first_id..last_id as a macro"""
+        name = (name or "").strip()
+        if not name:
+            return {"success": False, "error": "A macro needs a name"}
+        first_id, last_id = sorted((int(first_id), int(last_id)))
+        rows = self.store.query(
+            "SELECT prompt, actions FROM command_history WHERE id BETWEEN ? AND ? AND success = 1 ORDER BY id",
+            (first_id, last_id), fresh=True
+        )
+        actions = [step for _, steps in rows for step in json.loads(steps)]
+        if not actions:
+            return {"success": False, "error": "No successful commands in the selected range"}
+
+        now = time.time()
+        self.store.execute(
+            "INSERT INTO macros (name, actions, prompts, created_at, updated_at, runs) VALUES (?, ?, ?, ?, ?, 0) "
+            "ON CONFLICT(name) DO UPDATE SET actions = excluded.actions, prompts = excluded.prompts, "
+            "updated_at = excluded.updated_at",
+            (name, json.dumps(actions), json.dumps([prompt for prompt, _ in rows]), now, now)
+        )
+        return {
+            "success": True,
+            "message": f"Saved macro '{name}' with {len(actions)} steps",
+            "name": name,
+            "steps": len(actions)
+        }
+
+    def macros(self) -> List[Dict[str, Any]]:
+        rows = self.store.query("SELECT name, actions, prompts, updated_at, runs FROM macros ORDER BY name",
+                                fresh=True)
+        return [
+            {"name": name, "steps": len(json.loads(actions)), "prompts": json.loads(prompts),
+             "updatedAt": updated_at, "runs": runs}
+            for name, actions, prompts, updated_at, runs in rows
+        ]
+
+    def macro_actions(self, name: str) -> Optional[List[Dict[str, Any]]]:
+        """The stored steps of a macro, counting the lookup as a run"""
+        row = self.store.query_one("SELECT actions FROM macros WHERE name = ?", (name,))
+        if row is None:
+            return None
+        self.store.write("UPDATE macros SET runs = runs + 1 WHERE name = ?", (name,))
+        return json.loads(row[0])
+
+    def delete_macro(self, name: str) -> bool:
+        return self.store.execute("DELETE FROM macros WHERE name = ?", (name,)) > 0
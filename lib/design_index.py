@@ -0,0 +1,394 @@
+import adsk.core
+import adsk.fusion
+import re
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+from .intent_parser import ACTION_KEYWORDS, TEXT_PARAMETERS
+from .spatial_index import SpatialGrid, place, place_beside
+
+# Wording that refers to geometry already in the design ("make it bigger", "the same gear")
+_REFERENCE_RE = re.compile(
+    r'\b(?:this|that|these|those|it|its|existing|previous|last|same|'
+    r'bigger|smaller|larger|wider|narrower|taller|shorter|longer|thicker|thinner)\b'
+)
+
+# Commands that never change the design; everything else marks the index stale
+VIEW_COMMANDS = {"SelectCommand", "PanCommand", "FreeOrbitCommand", "ZoomCommand", "FitCommand"}
+
+# Rough characters per token of the summary, for staying within a token budget
+CHARS_PER_TOKEN = 4
+
+
+class IndexEntry:
+    """A body of the root component or an occurrence of a part, as the prompt sees it"""
+    __slots__ = ("token", "kind", "name", "component", "box", "history", "seq", "entity")
+
+    def __init__(self, token: str, kind: str, name: str, component: Optional[str], seq: int, entity):
+        self.token = token
+        self.kind = kind
+        self.name = name
+        self.component = component
+        self.box: Optional[Tuple[float, ...]] = None
+        # (action, parameters) the copilot applied, oldest first
+        self.history: List[Tuple[str, Dict[str, Any]]] = []
+        self.seq = seq
+        self.entity = entity
+
+    def describe(self) -> str:
+        text = f'- "{self.name}" ({"part" if self.kind == "occurrence" else "body"})'
+        if self.box:
+            x0, y0, z0, x1, y1, z1 = self.box
+            text += (f" {x1 - x0:.3g}×{y1 - y0:.3g}×{z1 - z0:.3g}mm"
+                     f" at ({(x0 + x1) / 2:.3g}, {(y0 + y1) / 2:.3g}, {(z0 + z1) / 2:.3g})")
+        if self.history:
+            text += " · " + "; ".join(
+                action + "".join(f" {name}={value:g}" if isinstance(value, (int, float)) else f" {name}={value}"
+                                 for name, value in parameters.items())
+                for action, parameters in self.history
+            )
+        return text
+
+
+class _DesignState:
+    def __init__(self):
+        self.entries: Dict[str, IndexEntry] = {}
+        self.by_name: Dict[str, str] = {}
+        # action -> token of the newest entry it created
+        self.by_action: Dict[str, str] = {}
+        # component id -> tokens of its occurrences
+        self.by_component: Dict[str, List[str]] = {}
+        self.seq = 0
+        self.timeline_seen = 0
+        self.stale = False
+        self.walked = False
+        # Footprints of the entries, and of parts placed since the last sync
+        self.grid = SpatialGrid()
+        # grid key -> action of each part placed since the last sync, newest last
+        self.reserved: Dict[Tuple[str, int], str] = {}
+
+
+class DesignIndex:
+    """Bodies and part occurrences of each open design, with what the copilot did to them.
+
+    The modeling actions hand every feature and occurrence they create to
+    ``track``, which only queues it. ``sync`` runs on the main thread before
+    a prompt is interpreted: it indexes the queued entities, picks up
+    features the user added from the timeline items appended since the last
+    sync, and re-reads names and bounding boxes only after a command that
+    may have changed the design (``mark_stale``). A design is walked in full
+    once, when it is first seen (and on every stale sync of a direct
+    modeling design, which has no timeline). Lookups by entity token, name
+    or action are dictionary reads, and ``summary`` turns the index into a
+    few lines of text for the prompt, within a token budget. Bounding boxes
+    also go into a spatial grid that ``place`` uses to find free room for a
+    new part; parts placed between two syncs are reserved there until the
+    next sync measures them. Reads are safe from any thread; ``sync`` and
+    ``find`` use the Fusion API.
+    """
+
+    def __init__(self, max_tokens: int = 400):
+        self.max_tokens = max_tokens
+        self._designs: Dict[str, _DesignState] = {}
+        self._pending: List[Tuple[Any, Optional[str], Dict[str, Any]]] = []
+        self._active: Optional[str] = None
+        self._lock = threading.RLock()
+
+    def track(self, entity, action: Optional[str], parameters: Optional[Dict[str, Any]] = None) -> None:
+        """Queue a feature or occurrence the copilot created or changed; no API calls"""
+        with self._lock:
+            self._pending.append((entity, action, {name: value for name, value in (parameters or {}).items()
+                                                   if name not in TEXT_PARAMETERS}))
+
+    def mark_stale(self) -> None:
+        """A command may have changed the active design; re-read it on the next sync"""
+        with self._lock:
+            state = self._designs.get(self._active)
+            if state is not None:
+                state.stale = True
+
+    def sync(self, design) -> None:
+        """Bring the index of a design up to date and make it the active one"""
+        root = design.rootComponent
+        design_id = root.id
+        with self._lock:
+            self._active = design_id
+            state = self._state(design_id)
+            if not state.walked:
+                self._walk(state, design, root)
+
+            pending, self._pending = self._pending, []
+            for entity, action, parameters in pending:
+                if not entity.isValid:
+                    continue
+                owner = entity.component if isinstance(entity, adsk.fusion.Occurrence) else entity.parentComponent
+                if owner.parentDesign != design:
+                    self._pending.append((entity, action, parameters))
+                    continue
+                self._apply(state, root, entity, action, parameters)
+            for key in state.reserved:
+                state.grid.remove(key)
+            state.reserved.clear()
+
+            parametric = design.designType == adsk.fusion.DesignTypes.ParametricDesignType
+            if parametric:
+                timeline = design.timeline
+                count = timeline.count
+                if count < state.timeline_seen:
+                    state.stale = True
+                for index in range(state.timeline_seen, count):
+                    try:
+                        entity = timeline.item(index).entity
+                    except Exception:
+                        continue
+                    if entity is not None:
+                        self._apply(state, root, entity, None, {})
+                state.timeline_seen = count
+
+            if state.stale:
+                state.stale = False
+                if parametric:
+                    self._refresh(state)
+                else:
+                    self._walk(state, design, root)
+
+    def forget(self, design_id: str) -> None:
+        with self._lock:
+            self._designs.pop(design_id, None)
+            if self._active == design_id:
+                self._active = None
+
+    def get(self, token: str) -> Optional[IndexEntry]:
+        with self._lock:
+            state = self._designs.get(self._active)
+            return state.entries.get(token) if state else None
+
+    def find(self, target: str) -> Optional[Any]:
+        """
+        The body or occurrence a prompt names: an entity token, an entry
+        name, or a part keyword ("gear", "box") for the newest such part.
+        """
+        with self._lock:
+            state = self._designs.get(self._active)
+            entry = self._lookup(state, target) if state else None
+        if entry is None or not entry.entity.isValid:
+            return None
+        return entry.entity
+
+    def place(self, design_id: str, footprint: Tuple[float, ...], layout: str = "row", gap: float = 10.0,
+              columns: int = 5, near: Optional[str] = None, side: Optional[str] = None) -> Tuple[float, float, float]:
+        """
+        Offset in mm that moves a new part's footprint (its box around its own
+        origin) to free room in the design: beside the part named by near,
+        or else wherever the layout puts it. No API calls.
+        """
+        with self._lock:
+            state = self._state(design_id)
+            anchor = self._anchor(state, near) if near else None
+            if anchor is not None:
+                return place_beside(state.grid, footprint, anchor, side or "right", gap)
+            return place(state.grid, footprint, layout, gap, columns)
+
+    def reserve(self, design_id: str, box: Tuple[float, ...], action: str) -> None:
+        """Hold the room of a part placed since the last sync, which has not been measured yet"""
+        with self._lock:
+            state = self._state(design_id)
+            state.seq += 1
+            key = ("reserved", state.seq)
+            state.grid.insert(key, box)
+            state.reserved[key] = action
+
+    def created(self) -> List[IndexEntry]:
+        """Entries of the active design the copilot created or changed, oldest first"""
+        with self._lock:
+            state = self._designs.get(self._active)
+            if state is None:
+                return []
+            return sorted((entry for entry in state.entries.values() if entry.history), key=lambda entry: entry.seq)
+
+    def refers_to_design(self, prompt: str) -> bool:
+        """Whether a prompt talks about geometry in the active design: reference words or a named part"""
+        with self._lock:
+            state = self._designs.get(self._active)
+            if state is None or not state.entries:
+                return False
+        return bool(_REFERENCE_RE.search(prompt.lower())) or self.names_entity(prompt)
+
+    def names_entity(self, prompt: str) -> bool:
+        """
+        Whether a prompt names a part of the active design: the whole name of
+        an entry, or "the gear" when the copilot built one. "it" and "this"
+        name nothing; they are about the selection.
+        """
+        text = prompt.lower()
+        with self._lock:
+            state = self._designs.get(self._active)
+            if state is None or not state.entries:
+                return False
+            if any(name in text and re.search(r'(?<!\w)' + re.escape(name) + r'(?!\w)', text)
+                   for name in state.by_name):
+                return True
+            return any(re.search(r'\bthe\s+' + re.escape(word) + r'\b', text)
+                       for action in state.by_action for word in ACTION_KEYWORDS.get(action, []))
+
+    def context_for(self, prompt: str, named_only: bool = False) -> str:
+        """
+        The design summary for a prompt that refers to existing geometry,
+        otherwise ''. With named_only, pronouns alone do not count.
+        """
+        refers = self.names_entity(prompt) if named_only else self.refers_to_design(prompt)
+        return self.summary() if refers else ""
+
+    def summary(self, max_tokens: Optional[int] = None) -> str:
+        """The active design's entries as prompt text, newest first, cut off at the token budget"""
+        budget = (max_tokens or self.max_tokens) * CHARS_PER_TOKEN
+        with self._lock:
+            state = self._designs.get(self._active)
+            entries = sorted(state.entries.values(), key=lambda entry: entry.seq, reverse=True) if state else []
+            if not entries:
+                return ""
+            lines = ["Design contents, newest first (sizes in mm; use the quoted name as target):"]
+            used = len(lines[0])
+            for listed, entry in enumerate(entries):
+                line = entry.describe()
+                if used + len(line) + 1 > budget:
+                    lines.append(f"... and {len(entries) - listed} older items")
+                    break
+                lines.append(line)
+                used += len(line) + 1
+            return "\n".join(lines)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            state = self._designs.get(self._active)
+            return {
+                "designs": len(self._designs),
+                "entries": len(state.entries) if state else 0,
+                "pending": len(self._pending)
+            }
+
+    # Main thread only
+
+    def _state(self, design_id: str) -> _DesignState:
+        state = self._designs.get(design_id)
+        if state is None:
+            state = self._designs[design_id] = _DesignState()
+        return state
+
+    def _lookup(self, state: _DesignState, target: str) -> Optional[IndexEntry]:
+        key = (target or "").strip()
+        if not key:
+            return None
+        token = key if key in state.entries else state.by_name.get(key.lower())
+        if token is None:
+            action = self._action_named(key, state.by_action)
+            token = state.by_action.get(action)
+        return state.entries.get(token) if token else None
+
+    def _anchor(self, state: _DesignState, near: str) -> Optional[Tuple[float, ...]]:
+        """Box of the part a spatial phrase names, including parts placed since the last sync"""
+        if near.strip().lower() in ("it", "that", "this", "that one", "this one"):
+            if state.reserved:
+                return state.grid.get(next(reversed(state.reserved)))
+            newest = max(state.entries.values(), key=lambda entry: entry.seq, default=None)
+            return newest.box if newest else None
+        for key in reversed(list(state.reserved)):
+            if self._action_named(near, [state.reserved[key]]):
+                return state.grid.get(key)
+        entry = self._lookup(state, near)
+        return entry.box if entry else None
+
+    def _action_named(self, text: str, actions) -> Optional[str]:
+        """The first of actions whose keywords occur in text ("gear", "the box")"""
+        text = text.lower()
+        for action in actions:
+            if any(re.search(r'\b' + re.escape(word) + r'\b', text) for word in ACTION_KEYWORDS.get(action, [])):
+                return action
+        return None
+
+    def _apply(self, state: _DesignState, root, entity, action: Optional[str], parameters: Dict[str, Any]) -> None:
+        """Index what a feature or occurrence produced; action is None for the user's own features"""
+        if isinstance(entity, adsk.fusion.Occurrence):
+            entry = self._entry(state, entity, "occurrence")
+            if action:
+                entry.history.append((action, parameters))
+                if action.startswith("create_"):
+                    state.by_action[action] = entry.token
+            self._measure(state, entry)
+            return
+
+        bodies = getattr(entity, 'bodies', None)
+        if bodies is None:
+            return
+        for body in bodies:
+            component = body.parentComponent
+            if component == root:
+                entries = [self._entry(state, body, "body")]
+            else:
+                # A part's own body; what happens to it shows on its occurrences
+                entries = [state.entries[token] for token in state.by_component.get(component.id, [])
+                           if token in state.entries]
+            for entry in entries:
+                if action and not (action.startswith("create_") and entry.history):
+                    entry.history.append((action, parameters))
+                    if action.startswith("create_"):
+                        state.by_action[action] = entry.token
+                self._measure(state, entry)
+
+    def _entry(self, state: _DesignState, entity, kind: str) -> IndexEntry:
+        token = entity.entityToken
+        entry = state.entries.get(token)
+        if entry is None:
+            state.seq += 1
+            component = entity.component if kind == "occurrence" else None
+            entry = IndexEntry(token, kind, entity.name, component.name if component else None, state.seq, entity)
+            state.entries[token] = entry
+            state.by_name[entry.name.lower()] = token
+            if component is not None:
+                state.by_component.setdefault(component.id, []).append(token)
+        return entry
+
+    def _measure(self, state: _DesignState, entry: IndexEntry) -> None:
+        box = entry.entity.boundingBox
+        low, high = box.minPoint, box.maxPoint
+        # Fusion works in cm, prompts in mm
+        entry.box = tuple(round(value * 10, 3) for value in (low.x, low.y, low.z, high.x, high.y, high.z))
+        state.grid.insert(entry.token, entry.box)
+
+    def _refresh(self, state: _DesignState) -> None:
+        for token, entry in list(state.entries.items()):
+            if not entry.entity.isValid:
+                self._remove(state, token)
+                continue
+            name = entry.entity.name
+            if name != entry.name:
+                state.by_name.pop(entry.name.lower(), None)
+                state.by_name[name.lower()] = token
+                entry.name = name
+            self._measure(state, entry)
+
+    def _remove(self, state: _DesignState, token: str) -> None:
+        entry = state.entries.pop(token)
+        state.grid.remove(token)
+        if state.by_name.get(entry.name.lower()) == token:
+            del state.by_name[entry.name.lower()]
+        for action in [action for action, latest in state.by_action.items() if latest == token]:
+            del state.by_action[action]
+        for tokens in state.by_component.values():
+            if token in tokens:
+                tokens.remove(token)
+
+    def _walk(self, state: _DesignState, design, root) -> None:
+        """Index every body and occurrence of a design; entries that are gone are dropped"""
+        seen = set()
+        for body in root.bRepBodies:
+            seen.add(self._entry(state, body, "body").token)
+        for occurrence in root.allOccurrences:
+            seen.add(self._entry(state, occurrence, "occurrence").token)
+        for token in [token for token in state.entries if token not in seen]:
+            self._remove(state, token)
+        for entry in state.entries.values():
+            self._measure(state, entry)
+        state.walked = True
+        if design.designType == adsk.fusion.DesignTypes.ParametricDesignType:
+            state.timeline_seen = design.timeline.count
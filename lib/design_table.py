@@ -0,0 +1,194 @@
+import csv
+import hashlib
+import io
+import json
+import re
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+from ..config import SUPPORTED_AI_COMMANDS
+from .intent_parser import (PARAMETER_ALIASES, DERIVED_PARAMETERS, PARAMETER_DEFAULTS, UNITLESS_PARAMETERS,
+                            INTEGER_PARAMETERS, TEXT_PARAMETERS, UNIT_TO_MM, find_quantities, to_mm)
+from .storage import Storage, storage as default_storage
+
+# Actions that build a standalone part; the others need a selection and cannot be batched
+BATCH_ACTIONS = ["create_box", "create_cylinder", "create_sphere", "create_gear"]
+
+# Columns that label a variant instead of setting a parameter
+NAME_COLUMNS = {"name", "label", "part", "part_name", "id"}
+
+
+class DesignTableError(ValueError):
+    """The table cannot be turned into variants"""
+
+
+class Variant:
+    __slots__ = ("index", "action", "parameters", "name", "key")
+
+    def __init__(self, index: int, action: str, parameters: Dict[str, Any], name: Optional[str]):
+        self.index = index
+        self.action = action
+        self.parameters = parameters
+        self.name = name
+        self.key = hashlib.sha1(
+            json.dumps([action, sorted(parameters.items())]).encode('utf-8')
+        ).hexdigest()[:16]
+
+
+def _normalize_header(header: str) -> str:
+    return re.sub(r'[\s\-]+', '_', header.strip().lower())
+
+
+def _column_target(action: str, header: str) -> Optional[Tuple[str, float, Optional[str]]]:
+    """(parameter, factor, unit) a column header maps to, or None"""
+    # "module (mm)", "radius_in", "Bore [inch]" carry their unit as the last word
+    column = re.sub(r'[()\[\]]', '', _normalize_header(header)).strip('_')
+    unit = None
+    name, _, suffix = column.rpartition('_')
+    if name and suffix in UNIT_TO_MM:
+        column, unit = name, suffix
+
+    parameters = [parameter for parameter in SUPPORTED_AI_COMMANDS[action].get("parameters", [])
+                  if parameter not in TEXT_PARAMETERS]
+    if column in parameters:
+        return column, 1.0, unit
+    spaced = column.replace('_', ' ')
+    for parameter in parameters:
+        if spaced in PARAMETER_ALIASES.get(parameter, []):
+            return parameter, 1.0, unit
+    derived = DERIVED_PARAMETERS.get(action, {}).get(spaced)
+    if derived and derived[0] in parameters:
+        return derived[0], derived[1], unit
+    return None
+
+
+def _cell_value(cell: Any, parameter: str, factor: float, unit: Optional[str]) -> float:
+    if isinstance(cell, (int, float)) and not isinstance(cell, bool):
+        value, cell_unit = float(cell), None
+    else:
+        text = str(cell).strip().lower()
+        quantities = find_quantities(text)
+        if len(quantities) != 1:
+            raise ValueError(f"'{cell}' is not a number")
+        _, _, value, cell_unit = quantities[0]
+    if parameter not in UNITLESS_PARAMETERS:
+        value = to_mm(value, cell_unit or unit)
+    value *= factor
+    return int(round(value)) if parameter in INTEGER_PARAMETERS else round(value, 6)
+
+
+def parse_design_table(text: str, action: Optional[str] = None, columns: Optional[Dict[str, str]] = None,
+                       fmt: Optional[str] = None) -> List[Variant]:
+    """
+    Turn a CSV or JSON design table into variants.
+
+    CSV: a header row, then one variant per row. JSON: a list of row objects,
+    or ``{"action": ..., "columns": {...}, "rows": [...]}``. Columns are
+    matched to the action's parameters by name or alias ("teeth" for
+    number_of_teeth, "diameter" for a cylinder's radius) and may carry a unit
+    ("module (mm)", "radius_in"); ``columns`` maps headers explicitly. An
+    ``action`` column lets rows build different parts. Missing parameters
+    take their defaults.
+    """
+    text = text.lstrip('\ufeff')
+    fmt = fmt or ("json" if text.lstrip().startswith(('[', '{')) else "csv")
+    if fmt == "json":
+        try:
+            data = json.loads(text)
+        except ValueError as e:
+            raise DesignTableError(f"Invalid JSON design table: {e}")
+        if isinstance(data, dict):
+            action = data.get("action", action)
+            columns = dict(data.get("columns") or {}, **(columns or {}))
+            data = data.get("rows", [])
+        if not isinstance(data, list) or not all(isinstance(row, dict) for row in data):
+            raise DesignTableError("A JSON design table is a list of row objects")
+        rows = data
+    else:
+        rows = list(csv.DictReader(io.StringIO(text)))
+
+    if not rows:
+        raise DesignTableError("The design table has no rows")
+    explicit = {_normalize_header(header): parameter for header, parameter in (columns or {}).items()}
+
+    variants = []
+    for index, row in enumerate(rows):
+        cells = {_normalize_header(str(header)): cell for header, cell in row.items()
+                 if header is not None and cell not in (None, "")}
+        row_action = str(cells.pop("action", None) or action or "").strip()
+        if row_action not in BATCH_ACTIONS:
+            raise DesignTableError(
+                f"Row {index + 1}: action must be one of {', '.join(BATCH_ACTIONS)}, not '{row_action or '(none)'}'"
+            )
+
+        name = None
+        parameters = dict(PARAMETER_DEFAULTS.get(row_action, {}))
+        for column, cell in cells.items():
+            if column in NAME_COLUMNS:
+                name = str(cell).strip()
+                continue
+            if column in explicit:
+                target = (explicit[column], 1.0, None)
+            else:
+                target = _column_target(row_action, column)
+            if target is None:
+                raise DesignTableError(f"Column '{column}' does not match a parameter of {row_action}")
+            parameter, factor, unit = target
+            try:
+                parameters[parameter] = _cell_value(cell, parameter, factor, unit)
+            except ValueError as e:
+                raise DesignTableError(f"Row {index + 1}, column '{column}': {e}")
+        variants.append(Variant(index, row_action, parameters, name))
+    return variants
+
+
+def load_design_table(path: str, action: Optional[str] = None,
+                      columns: Optional[Dict[str, str]] = None) -> List[Variant]:
+    """Read and parse a .csv or .json design table file"""
+    try:
+        with open(path, encoding='utf-8-sig', newline='') as table_file:
+            text = table_file.read()
+    except OSError as e:
+        raise DesignTableError(f"Cannot read {path}: {e}")
+    fmt = "json" if path.lower().endswith('.json') else "csv" if path.lower().endswith('.csv') else None
+    return parse_design_table(text, action, columns, fmt)
+
+
+class DesignTableRuns:
+    """Which rows of a design table were generated in which design.
+
+    A run is identified by the design and the table's variants, so running
+    the same table again in the same design skips the rows already built
+    and retries the ones that failed or were never reached.
+    """
+
+    def __init__(self, store: Optional[Storage] = None):
+        self.store = store or default_storage
+
+    @staticmethod
+    def run_id(design_id: str, variants: List[Variant]) -> str:
+        digest = hashlib.sha1(design_id.encode('utf-8'))
+        for variant in variants:
+            digest.update(variant.key.encode('utf-8'))
+        return digest.hexdigest()[:20]
+
+    def done_rows(self, run_id: str) -> Dict[int, str]:
+        """Row index -> variant key of the rows already generated"""
+        rows = self.store.query(
+            "SELECT row_index, row_key FROM design_table_rows WHERE run_id = ? AND status = 'done'",
+            (run_id,)
+        )
+        return dict(rows)
+
+    def record(self, run_id: str, variant: Variant, success: bool, duration_ms: float,
+               message: str = "", component: Optional[str] = None) -> None:
+        self.store.write(
+            "INSERT OR REPLACE INTO design_table_rows "
+            "(run_id, row_index, row_key, status, component, duration_ms, message, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (run_id, variant.index, variant.key, "done" if success else "failed", component,
+             round(duration_ms, 3), message, time.time())
+        )
+
+    def reset(self, run_id: str) -> None:
+        self.store.execute("DELETE FROM design_table_rows WHERE run_id = ?", (run_id,))
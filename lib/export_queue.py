@@ -0,0 +1,208 @@
+import adsk.core
+import adsk.fusion
+import hashlib
+import os
+import re
+import time
+from collections import deque
+from typing import Dict, Any, Callable, List, Optional
+
+from .. import config
+from .metrics import metrics
+from .storage import Storage, storage as default_storage
+
+# File extension of each export format
+EXPORT_FORMATS = {"stl": ".stl", "step": ".step", "f3d": ".f3d"}
+
+# STL mesh refinement presets -> adsk.fusion.MeshRefinementSettings members
+STL_REFINEMENT = {
+    "low": "MeshRefinementLow",
+    "medium": "MeshRefinementMedium",
+    "high": "MeshRefinementHigh"
+}
+
+_UNSAFE_RE = re.compile(r'[<>:"/\\|?*\x00-\x1f]+')
+
+
+def safe_file_name(name: str) -> str:
+    return _UNSAFE_RE.sub('_', name).strip(' .') or "Unnamed"
+
+
+def geometry_hash(entity) -> str:
+    """
+    Fingerprint of the shape of a body, or of a component's own bodies:
+    volume, area, bounding box and topology counts. Moving an occurrence
+    does not change it; editing the geometry does.
+    """
+    bodies = [entity] if isinstance(entity, adsk.fusion.BRepBody) else list(entity.bRepBodies)
+    parts = []
+    for body in bodies:
+        box = body.boundingBox
+        low, high = box.minPoint, box.maxPoint
+        values = (body.volume, body.area, low.x, low.y, low.z, high.x, high.y, high.z)
+        counts = (body.faces.count, body.edges.count, body.vertices.count)
+        parts.append(" ".join(f"{value:.6g}" for value in values) + " " + " ".join(str(count) for count in counts))
+    return hashlib.sha1("\n".join(sorted(parts)).encode('utf-8')).hexdigest()[:20]
+
+
+class ExportJob:
+    __slots__ = ("entity", "name", "path", "format", "refinement")
+
+    def __init__(self, entity, name: str, path: str, fmt: str, refinement: str):
+        self.entity = entity
+        self.name = name
+        self.path = path
+        self.format = fmt
+        self.refinement = refinement
+
+
+class ExportQueue:
+    """Exports of bodies and components, run one at a time on Fusion's main thread.
+
+    Fusion's exportManager blocks the UI while it writes a file, so ``add``
+    only queues the files and asks ``schedule`` to call ``run_next`` later;
+    the palette sets it to fire a custom event, which lets Fusion handle the
+    user's input between two exports. Without a scheduler the queue runs
+    immediately. Every export is recorded in the ``exports`` table with a
+    hash of the geometry, format and refinement, and a file whose entry
+    still matches is not written again.
+    """
+
+    def __init__(self, store: Optional[Storage] = None, folder: Optional[str] = None):
+        self.store = store or default_storage
+        self.folder = folder or config.EXPORT_FOLDER
+        self.schedule: Optional[Callable[[], None]] = None
+        self._pending = deque()
+        self._queued_paths = set()
+
+        self.exported = 0
+        self.unchanged = 0
+        self.failed = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def add(self, entities: List[Any], fmt: str, refinement: str, design_name: str, root=None) -> Dict[str, Any]:
+        """
+        Queue bodies or components for export into the design's folder.
+        STEP and F3D files hold components, so bodies are exported through
+        the component that owns them.
+        """
+        fmt = (fmt or config.EXPORT_DEFAULT_FORMAT).lower()
+        refinement = (refinement or config.EXPORT_DEFAULT_REFINEMENT).lower()
+        if fmt not in EXPORT_FORMATS:
+            return {"success": False, "message": f"Unsupported export format '{fmt}', use {', '.join(EXPORT_FORMATS)}"}
+        if refinement not in STL_REFINEMENT:
+            return {"success": False, "message": f"Unknown mesh refinement '{refinement}', use {', '.join(STL_REFINEMENT)}"}
+
+        folder = os.path.join(self.folder, safe_file_name(design_name))
+        was_idle = not self._pending
+        queued = 0
+        for entity in entities:
+            if fmt != "stl" and isinstance(entity, adsk.fusion.BRepBody):
+                entity = entity.parentComponent
+            name = safe_file_name(self._label(entity, root))
+            path = os.path.join(folder, name + EXPORT_FORMATS[fmt])
+            if path in self._queued_paths:
+                continue
+            self._queued_paths.add(path)
+            self._pending.append(ExportJob(entity, name, path, fmt, refinement))
+            queued += 1
+
+        if not queued:
+            return {"success": True, "queued": 0, "message": "Those files are already queued for export"}
+        if self.schedule is None:
+            while self._pending:
+                self.run_next()
+        elif was_idle:
+            self.schedule()
+        return {
+            "success": True,
+            "queued": queued,
+            "message": f"Queued {queued} {fmt.upper()} export{'s' if queued != 1 else ''} to {folder}"
+        }
+
+    def run_next(self) -> Optional[Dict[str, Any]]:
+        """Export the next queued file; returns its progress report, or None when the queue is empty"""
+        if not self._pending:
+            return None
+        job = self._pending.popleft()
+        self._queued_paths.discard(job.path)
+        started = time.perf_counter()
+        status, message = self._export(job)
+        duration_ms = (time.perf_counter() - started) * 1000
+        metrics.record("export", duration_ms, action=job.format, detail=status, success=status != "failed")
+        return {
+            "name": job.name,
+            "path": job.path,
+            "format": job.format,
+            "status": status,
+            "message": message,
+            "durationMs": round(duration_ms, 1),
+            "remaining": len(self._pending)
+        }
+
+    def clear(self) -> int:
+        """Drop the exports that have not run yet"""
+        dropped = len(self._pending)
+        self._pending.clear()
+        self._queued_paths.clear()
+        return dropped
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._pending),
+            "exported": self.exported,
+            "unchanged": self.unchanged,
+            "failed": self.failed
+        }
+
+    def _export(self, job: ExportJob):
+        try:
+            if not job.entity.isValid:
+                self.failed += 1
+                return "failed", f"{job.name} no longer exists"
+            fingerprint = f"{geometry_hash(job.entity)}:{job.format}:{job.refinement if job.format == 'stl' else ''}"
+            row = self.store.query_one("SELECT geometry_hash FROM exports WHERE path = ?", (job.path,))
+            if row is not None and row[0] == fingerprint and os.path.exists(job.path):
+                self.unchanged += 1
+                return "unchanged", f"{job.name} is unchanged since its last export"
+
+            os.makedirs(os.path.dirname(job.path), exist_ok=True)
+            design = job.entity.parentComponent.parentDesign if isinstance(job.entity, adsk.fusion.BRepBody) \
+                else job.entity.parentDesign
+            manager = design.exportManager
+            if not manager.execute(self._options(manager, job)):
+                self.failed += 1
+                return "failed", f"Fusion could not export {job.name}"
+            size = os.path.getsize(job.path)
+        except Exception as e:
+            self.failed += 1
+            return "failed", f"Failed to export {job.name}: {str(e)}"
+
+        self.store.write(
+            "INSERT OR REPLACE INTO exports (path, geometry_hash, format, refinement, size_bytes, exported_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (job.path, fingerprint, job.format, job.refinement, size, time.time())
+        )
+        self.exported += 1
+        return "exported", f"Exported {os.path.basename(job.path)}"
+
+    def _options(self, manager, job: ExportJob):
+        if job.format == "stl":
+            options = manager.createSTLExportOptions(job.entity, job.path)
+            options.isBinaryFormat = True
+            options.meshRefinement = getattr(adsk.fusion.MeshRefinementSettings, STL_REFINEMENT[job.refinement])
+            return options
+        if job.format == "step":
+            return manager.createSTEPExportOptions(job.path, job.entity)
+        return manager.createFusionArchiveExportOptions(job.path, job.entity)
+
+    def _label(self, entity, root) -> str:
+        if isinstance(entity, adsk.fusion.BRepBody):
+            component = entity.parentComponent
+            if root is not None and component == root:
+                return entity.name
+            return f"{component.name} {entity.name}"
+        return entity.name
@@ -0,0 +1,166 @@
+import math
+from typing import Dict, List, Tuple
+
+# NumPy is not bundled with Fusion's Python; when it is installed the profile
+# is computed with vectorized array math, otherwise with plain Python.
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+Point = Tuple[float, float]
+
+
+def involute(angle: float) -> float:
+    """Involute function inv(a) = tan(a) - a"""
+    return math.tan(angle) - angle
+
+
+class InvoluteGear:
+    """
+    Geometry of an external involute spur gear, independent of Fusion.
+
+    All lengths are in the unit of ``module``. The reference tooth is centered
+    on the +X axis; ``tooth_profile`` gives its two flanks (root fillet, optional
+    radial segment below the base circle, involute) and ``outline`` the closed
+    outline of every tooth.
+    """
+
+    def __init__(self, num_teeth: int, module: float, pressure_angle: float = 20.0,
+                 addendum: float = 1.0, dedendum: float = 1.25, fillet: float = 0.38, samples: int = 12):
+        if num_teeth < 6:
+            raise ValueError("A gear needs at least 6 teeth")
+        if module <= 0:
+            raise ValueError("Module must be positive")
+
+        self.num_teeth = int(num_teeth)
+        self.module = module
+        self.pressure_angle = math.radians(pressure_angle)
+        self.samples = max(3, int(samples))
+
+        self.pitch_radius = module * self.num_teeth / 2
+        self.base_radius = self.pitch_radius * math.cos(self.pressure_angle)
+        self.outer_radius = self.pitch_radius + addendum * module
+        self.root_radius = self.pitch_radius - dedendum * module
+        self.pitch_angle = 2 * math.pi / self.num_teeth
+
+        if self._half_angle(self.outer_radius) <= 0:
+            raise ValueError("Tooth tip is pointed; reduce the addendum or add teeth")
+
+        self._solve_fillet(fillet * module)
+
+    def _half_angle(self, radius: float) -> float:
+        """Half of the angular tooth thickness at a radius on the involute"""
+        radius = max(radius, self.base_radius)
+        pressure = math.acos(self.base_radius / radius)
+        return math.pi / (2 * self.num_teeth) + involute(self.pressure_angle) - involute(pressure)
+
+    def _solve_fillet(self, radius: float) -> None:
+        # The fillet is tangent to the radial line under the flank and to the
+        # root circle. Shrink it until it fits inside half of the tooth gap.
+        gap_center = self.pitch_angle / 2
+        for _ in range(20):
+            center_radius = self.root_radius + radius
+            self.fillet_top_radius = math.sqrt(center_radius ** 2 - radius ** 2)
+            self.flank_start_radius = max(self.fillet_top_radius, self.base_radius)
+            self.flank_start_angle = self._half_angle(self.flank_start_radius)
+            self.fillet_sweep = math.asin(radius / center_radius)
+            if self.flank_start_angle + self.fillet_sweep < gap_center:
+                break
+            radius *= 0.7
+        self.fillet_radius = radius
+        self.fillet_center = (center_radius, self.flank_start_angle + self.fillet_sweep)
+
+    def tooth_profile(self) -> Dict[str, List[Point]]:
+        """
+        Points of the reference tooth:
+        ``upper`` runs from the root circle to the tip on the +Y side,
+        ``lower`` is its mirror image and ``tip`` the middle of the tip arc.
+        """
+        upper = self._upper_flank()
+        return {
+            "upper": upper,
+            "lower": [(x, -y) for x, y in upper],
+            "tip": (self.outer_radius, 0.0)
+        }
+
+    def _upper_flank(self) -> List[Point]:
+        n = self.samples
+        center_r, center_a = self.fillet_center
+        cx, cy = center_r * math.cos(center_a), center_r * math.sin(center_a)
+        beta = self.flank_start_angle
+
+        # Fillet: from the root circle up to the radial line at angle beta
+        root_x = self.root_radius * math.cos(center_a)
+        root_y = self.root_radius * math.sin(center_a)
+        top_x = self.fillet_top_radius * math.cos(beta)
+        top_y = self.fillet_top_radius * math.sin(beta)
+        start = math.atan2(root_y - cy, root_x - cx)
+        end = math.atan2(top_y - cy, top_x - cx)
+        if end - start > math.pi:
+            end -= 2 * math.pi
+        elif start - end > math.pi:
+            end += 2 * math.pi
+
+        if NUMPY_AVAILABLE:
+            sweep = np.linspace(start, end, n)
+            fillet = np.column_stack((cx + self.fillet_radius * np.cos(sweep), cy + self.fillet_radius * np.sin(sweep)))
+
+            radii = np.linspace(self.flank_start_radius, self.outer_radius, 2 * n)
+            pressure = np.arccos(np.minimum(self.base_radius / radii, 1.0))
+            angles = math.pi / (2 * self.num_teeth) + involute(self.pressure_angle) - (np.tan(pressure) - pressure)
+            flank = np.column_stack((radii * np.cos(angles), radii * np.sin(angles)))
+
+            points = np.vstack((fillet, flank))
+            return [(float(x), float(y)) for x, y in points]
+
+        points = []
+        for i in range(n):
+            a = start + (end - start) * i / (n - 1)
+            points.append((cx + self.fillet_radius * math.cos(a), cy + self.fillet_radius * math.sin(a)))
+        for i in range(2 * n):
+            r = self.flank_start_radius + (self.outer_radius - self.flank_start_radius) * i / (2 * n - 1)
+            a = self._half_angle(r)
+            points.append((r * math.cos(a), r * math.sin(a)))
+        return points
+
+    def pitch_outline(self, arc_samples: int = 4) -> List[Point]:
+        """One closed pitch of the outline, from -pitch/2 to +pitch/2 on the root circle"""
+        upper = self._upper_flank()
+        lower = [(x, -y) for x, y in upper]
+
+        root_end = self.fillet_center[1]
+        tip_half = self._half_angle(self.outer_radius)
+
+        def arc(radius, a0, a1):
+            return [(radius * math.cos(a0 + (a1 - a0) * i / arc_samples),
+                     radius * math.sin(a0 + (a1 - a0) * i / arc_samples)) for i in range(1, arc_samples)]
+
+        # Counter-clockwise: root arc, lower flank up, tip arc, upper flank down, root arc
+        points = [(self.root_radius * math.cos(-self.pitch_angle / 2), self.root_radius * math.sin(-self.pitch_angle / 2))]
+        points += arc(self.root_radius, -self.pitch_angle / 2, -root_end)
+        points += lower
+        points += arc(self.outer_radius, -tip_half, tip_half)
+        points += list(reversed(upper))
+        points += arc(self.root_radius, root_end, self.pitch_angle / 2)
+        return points
+
+    def outline(self, arc_samples: int = 4) -> List[Point]:
+        """Closed outline of all teeth, computed by rotating one pitch in a single pass"""
+        pitch = self.pitch_outline(arc_samples)
+        angles = [k * self.pitch_angle for k in range(self.num_teeth)]
+
+        if NUMPY_AVAILABLE:
+            base = np.asarray(pitch)
+            theta = np.asarray(angles)
+            cos, sin = np.cos(theta)[:, None], np.sin(theta)[:, None]
+            x = cos * base[:, 0] - sin * base[:, 1]
+            y = sin * base[:, 0] + cos * base[:, 1]
+            return [(float(px), float(py)) for px, py in zip(x.ravel(), y.ravel())]
+
+        points = []
+        for theta in angles:
+            c, s = math.cos(theta), math.sin(theta)
+            points.extend((c * px - s * py, s * px + c * py) for px, py in pitch)
+        return points
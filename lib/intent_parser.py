@@ -0,0 +1,443 @@
+import re
+from typing import Dict, Any, List, Optional, Tuple
+
+from ..config import EXPORT_DEFAULT_FORMAT, EXPORT_DEFAULT_REFINEMENT
+
+# Words that select an action. Actions missing here fall back to their own name.
+ACTION_KEYWORDS = {
+    "create_box": ["cube", "box", "block", "cuboid", "rectangular prism"],
+    "create_cylinder": ["cylinder", "rod", "disc", "disk", "puck"],
+    "create_sphere": ["sphere", "ball"],
+    "create_gear": ["gear", "spur gear", "cog"],
+    "create_hole": ["hole", "drill"],
+    "extrude_face": ["extrude", "extend", "pull"],
+    "move_body": ["move", "translate", "shift"],
+    "rectangular_pattern": ["grid", "rectangular pattern", "rectangular array", "linear pattern", "array of holes"],
+    "circular_pattern": ["circular pattern", "circular array", "polar array", "polar pattern", "bolt circle", "pcd"],
+    "export_bodies": ["export", "stl", "step file", "f3d"]
+}
+
+# Actions a pattern is made of; "a grid of holes" is one pattern, not a hole
+SUBSUMED_ACTIONS = {
+    "rectangular_pattern": {"create_hole"},
+    "circular_pattern": {"create_hole"}
+}
+
+# Extra names a parameter may be referred to by. The parameter name itself
+# (with underscores read as spaces) is always accepted.
+PARAMETER_ALIASES = {
+    "length": ["long", "len"],
+    "width": ["wide"],
+    "height": ["tall", "high"],
+    "radius": ["rad"],
+    "number_of_teeth": ["teeth", "tooth", "tooth count"],
+    "module": ["mod"],
+    "bore_diameter": ["bore", "shaft hole", "bore hole"],
+    "thickness": ["thick", "face width"],
+    "diameter": ["dia"],
+    "depth": ["deep"],
+    "distance": ["by"],
+    "x": ["x direction", "x axis"],
+    "y": ["y direction", "y axis"],
+    "z": ["z direction", "z axis"],
+    "rows": ["row"],
+    "columns": ["column", "cols", "col"],
+    "row_spacing": ["row pitch"],
+    "column_spacing": ["spacing", "spaced", "pitch", "apart", "column pitch"],
+    "count": ["holes", "copies", "instances", "times"],
+    "angle": ["degrees", "degree", "deg"],
+    "hole_diameter": ["hole size", "holes", "hole"],
+    "hole_depth": ["depth", "deep"]
+}
+
+# Parameters that take one of a few words instead of a number:
+# parameter -> {value: words that select it}
+PARAMETER_CHOICES = {
+    "format": {"stl": ["stl", "mesh"], "step": ["step", "stp"], "f3d": ["f3d", "fusion archive"]},
+    "refinement": {"low": ["low", "coarse", "draft"], "medium": ["medium", "normal"], "high": ["high", "fine"]}
+}
+
+# Free-text parameters the number grammar leaves alone: the body an action applies to,
+# and the part a new one is placed next to
+TEXT_PARAMETERS = {"target", "near", "side"}
+
+# Where a new part goes relative to another one: side -> words that say so
+SPATIAL_SIDES = {
+    "right": ["next to", "beside", "alongside", "near", "to the right of", "right of"],
+    "left": ["to the left of", "left of"],
+    "behind": ["behind"],
+    "front": ["in front of"],
+    "top": ["on top of", "above"]
+}
+
+# Parameters that can be given through a related quantity, e.g. a cylinder's
+# diameter instead of its radius: action -> {alias: (parameter, factor)}
+DERIVED_PARAMETERS = {
+    "create_cylinder": {"diameter": ("radius", 0.5), "dia": ("radius", 0.5)},
+    "create_sphere": {"diameter": ("radius", 0.5), "dia": ("radius", 0.5)},
+    "create_hole": {"radius": ("diameter", 2.0)},
+    "rectangular_pattern": {"diameter": ("hole_diameter", 1.0), "dia": ("hole_diameter", 1.0)},
+    "circular_pattern": {"diameter": ("hole_diameter", 1.0), "dia": ("hole_diameter", 1.0),
+                         "bolt circle": ("radius", 0.5), "pcd": ("radius", 0.5)}
+}
+
+PARAMETER_DEFAULTS = {
+    "create_box": {"length": 20, "width": 20, "height": 20},
+    "create_cylinder": {"radius": 10, "height": 25},
+    "create_sphere": {"radius": 15},
+    "create_gear": {"number_of_teeth": 20, "module": 2.0, "bore_diameter": 6.0, "thickness": 5.0},
+    "create_hole": {"diameter": 5, "depth": 10},
+    "extrude_face": {"distance": 10},
+    "move_body": {"x": 10, "y": 0, "z": 0},
+    "rectangular_pattern": {"rows": 2, "columns": 2, "row_spacing": 10, "column_spacing": 10,
+                            "hole_diameter": 5, "hole_depth": 10},
+    "circular_pattern": {"count": 6, "radius": 20, "angle": 360, "hole_diameter": 5, "hole_depth": 10},
+    "export_bodies": {"format": EXPORT_DEFAULT_FORMAT, "refinement": EXPORT_DEFAULT_REFINEMENT}
+}
+
+# Omitted parameters that take another parameter's value before the default
+# ("spaced 10mm" sets both grid directions): action -> {parameter: source}
+PARAMETER_FALLBACKS = {
+    "rectangular_pattern": {"row_spacing": "column_spacing"}
+}
+
+# Parameters read from an "AxBxC" dimension group, in order
+DIMENSION_PARAMETERS = {
+    "create_box": ("length", "width", "height"),
+    "rectangular_pattern": ("rows", "columns")
+}
+
+# Actions whose omitted parameters mean "no change" once any of them is given
+# ("move 15mm in x" leaves y and z at 0)
+ZERO_WHEN_OMITTED = {"move_body"}
+
+# Parameters that are counts rather than lengths
+UNITLESS_PARAMETERS = {"number_of_teeth", "rows", "columns", "count", "angle"}
+INTEGER_PARAMETERS = {"number_of_teeth", "rows", "columns", "count"}
+
+# Offsets, the only numbers that may be zero or negative
+SIGNED_PARAMETERS = {"x", "y", "z"}
+# Smallest values the builders accept beyond being positive (InvoluteGear needs 6 teeth)
+PARAMETER_MINIMUMS = {"number_of_teeth": 6}
+
+MESSAGE_TEMPLATES = {
+    "create_box": "Creating box: {length:g}×{width:g}×{height:g}mm",
+    "create_cylinder": "Creating cylinder: radius {radius:g}mm, height {height:g}mm",
+    "create_sphere": "Creating sphere with radius {radius:g}mm",
+    "create_gear": "Creating gear: {number_of_teeth} teeth, module {module:g}mm, bore {bore_diameter:g}mm",
+    "create_hole": "Creating hole: diameter {diameter:g}mm, depth {depth:g}mm",
+    "extrude_face": "Extruding selected face by {distance:g}mm",
+    "move_body": "Moving selected body by X:{x:g}mm, Y:{y:g}mm, Z:{z:g}mm",
+    "rectangular_pattern": "Creating {rows}×{columns} grid, spacing {row_spacing:g}×{column_spacing:g}mm",
+    "circular_pattern": "Creating circular pattern: {count} on a {radius:g}mm radius over {angle:g}°",
+    "export_bodies": "Exporting bodies to {format} files"
+}
+
+UNIT_TO_MM = {
+    "mm": 1.0, "millimeter": 1.0, "millimeters": 1.0, "millimetre": 1.0, "millimetres": 1.0,
+    "cm": 10.0, "centimeter": 10.0, "centimeters": 10.0, "centimetre": 10.0, "centimetres": 10.0,
+    "m": 1000.0, "meter": 1000.0, "meters": 1000.0, "metre": 1000.0, "metres": 1000.0,
+    "in": 25.4, "inch": 25.4, "inches": 25.4, '"': 25.4,
+    "ft": 304.8, "foot": 304.8, "feet": 304.8
+}
+
+# "1e3" is one number, not 1 followed by stray letters
+_NUMBER = r'([-+]?(?:\d+(?:\.\d+)?|\.\d+)(?:e[-+]?\d+)?)'
+# "in" is only a unit when it is not the preposition ("15 in the x direction")
+_UNIT_PATTERNS = {'"': '"', "in": r'in\b(?!\s+(?:the|a|an|[xyz])\b)'}
+_UNIT = r'(?:\s*(' + '|'.join(
+    _UNIT_PATTERNS.get(unit, re.escape(unit) + r'\b')
+    for unit in sorted(UNIT_TO_MM, key=len, reverse=True)
+) + r'))?'
+_QUANTITY = _NUMBER + _UNIT
+
+_NUMBER_RE = re.compile(_QUANTITY)
+_DIMENSIONS_RE = re.compile(_QUANTITY + r'\s*(?:x|×|\*|by)\s*' + _QUANTITY + r'(?:\s*(?:x|×|\*|by)\s*' + _QUANTITY + r')?')
+
+# "next to the cube", "on top of the gear": a side and the part it refers to
+_SPATIAL_RE = re.compile(
+    r'\b(' + '|'.join(
+        r'\s+'.join(re.escape(part) for part in words.split())
+        for words in sorted((words for sides in SPATIAL_SIDES.values() for words in sides), key=len, reverse=True)
+    ) + r')\s+(?:the\s+|that\s+|this\s+|my\s+)?([a-z0-9][^,;]*?)\s*(?=,|;|\band\b|\bwith\b|$)'
+)
+_SIDE_OF = {' '.join(words.split()): side for side, sides in SPATIAL_SIDES.items() for words in sides}
+
+# Wording that usually means more than one operation; left to the LLM
+_COMPOUND_RE = re.compile(r'\b(?:and then|then|next to|followed by|as well as|through it|on top of)\b')
+
+
+def find_quantities(text: str) -> List[Tuple[int, int, float, Optional[str]]]:
+    """Numbers in lower-cased text with their unit, as (start, end, value, unit)"""
+    found = []
+    for m in _NUMBER_RE.finditer(text):
+        before = text[max(0, m.start(1) - 1):m.start(1)]
+        # Part of a word ("m8"), but not of a dimension group ("30x20")
+        if before.isalpha() and before != 'x':
+            continue
+        found.append((m.start(), m.end(), float(m.group(1)), m.group(2)))
+    return found
+
+
+def to_mm(value: float, unit: Optional[str]) -> float:
+    return value * UNIT_TO_MM[unit or "mm"]
+
+
+def _keyword_pattern(words: List[str]) -> str:
+    return r'(?:' + '|'.join(
+        r'\s+'.join(re.escape(part) for part in word.split())
+        for word in sorted(words, key=len, reverse=True)
+    ) + r')'
+
+
+class _ParameterRule:
+    """Compiled patterns binding a number to one parameter of one action"""
+
+    def __init__(self, parameter: str, aliases: List[str], factor: float = 1.0):
+        keyword = _keyword_pattern(aliases)
+        self.parameter = parameter
+        self.factor = factor
+        # "radius 10mm", "radius of 10", "radius: 10", "10mm in the x direction"
+        self.after = re.compile(r'\b' + keyword + r'\b\s*(?:of|=|:|is|to|by)?\s*' + _QUANTITY)
+        # "10mm radius", "24 teeth", "15mm in the x direction", "10mm along y"
+        self.before = re.compile(_QUANTITY + r'\s*(?:(?:in|along)\s+(?:the\s+)?)?' + keyword + r'\b')
+
+
+class _ActionGrammar:
+    def __init__(self, action: str, parameters: List[str]):
+        self.action = action
+        self.parameters = [parameter for parameter in parameters if parameter not in TEXT_PARAMETERS]
+        self.text_parameters = [parameter for parameter in parameters if parameter in TEXT_PARAMETERS]
+        self.keyword_re = re.compile(r'\b' + _keyword_pattern(ACTION_KEYWORDS.get(action, [action.replace('_', ' ')])) + r'\b')
+        self.rules: List[_ParameterRule] = []
+        # parameter -> [(value, pattern of the words selecting it)]
+        self.choices: Dict[str, List[Tuple[str, re.Pattern]]] = {}
+        for parameter in self.parameters:
+            if parameter in PARAMETER_CHOICES:
+                self.choices[parameter] = [
+                    (value, re.compile(r'\b' + _keyword_pattern(words) + r'\b'))
+                    for value, words in PARAMETER_CHOICES[parameter].items()
+                ]
+                continue
+            aliases = [parameter.replace('_', ' ')] + PARAMETER_ALIASES.get(parameter, [])
+            self.rules.append(_ParameterRule(parameter, aliases))
+        for alias, (parameter, factor) in DERIVED_PARAMETERS.get(action, {}).items():
+            if parameter in self.parameters:
+                self.rules.append(_ParameterRule(parameter, [alias], factor))
+
+
+class IntentParser:
+    """Local keyword/regex parser for the commands in SUPPORTED_AI_COMMANDS.
+
+    The grammar is compiled once from the command catalogue. Parameters are
+    bound to the keyword next to them, in either order ("radius 10" or
+    "10mm radius"), and lengths are converted to millimeters. Every result
+    carries a ``confidence`` between 0 and 1 so callers can decide whether
+    the LLM is needed.
+    """
+
+    def __init__(self, commands: Dict[str, Dict[str, Any]]):
+        self.grammars = [_ActionGrammar(action, spec.get("parameters", [])) for action, spec in commands.items()]
+
+    def candidate_actions(self, user_input: str) -> List[str]:
+        """Actions whose keywords occur in the input, in catalogue order"""
+        return [grammar.action for _, grammar in self._keyword_matches(user_input.lower())]
+
+    def _keyword_matches(self, text: str) -> List[Tuple[int, _ActionGrammar]]:
+        matches = []
+        for grammar in self.grammars:
+            found = grammar.keyword_re.search(text)
+            if found:
+                matches.append((found.start(), grammar))
+        return matches
+
+    def _ranked_matches(self, text: str) -> List[Tuple[int, _ActionGrammar]]:
+        matches = self._keyword_matches(text)
+
+        # A pattern keyword absorbs the keywords of what it is made of
+        subsumed = set()
+        for _, match in matches:
+            subsumed |= SUBSUMED_ACTIONS.get(match.action, set())
+        matches = [match for match in matches if match[1].action not in subsumed]
+
+        # The earliest keyword names the main object ("hole in the gear" vs "gear with a bore hole")
+        matches.sort(key=lambda match: match[0])
+        return matches
+
+    def parse(self, user_input: str) -> Dict[str, Any]:
+        text = user_input.lower().strip()
+
+        # "a cylinder next to the cube" is one cylinder placed by the cube, not two parts
+        spatial = _SPATIAL_RE.search(text)
+        if spatial:
+            rest = (text[:spatial.start()] + " " + text[spatial.end():]).strip()
+            matches = self._ranked_matches(rest)
+            if matches and "near" in matches[0][1].text_parameters:
+                text = rest
+            else:
+                spatial = None
+        if not spatial:
+            matches = self._ranked_matches(text)
+
+        if not matches:
+            return {
+                "success": False,
+                "error": "Command not recognized. Try: 'create a 20mm cube', 'make a cylinder', 'create gear with 24 teeth'",
+                "action": None,
+                "parameters": {},
+                "confidence": 0.0,
+                "source": "local"
+            }
+
+        grammar = matches[0][1]
+
+        parameters, explicit, positional, leftover = self._bind_parameters(grammar, text)
+        for parameter, options in grammar.choices.items():
+            found = [(m.start(), value) for value, pattern in options for m in [pattern.search(text)] if m]
+            if found:
+                parameters[parameter] = min(found)[1]
+                explicit += 1
+
+        if grammar.action in ZERO_WHEN_OMITTED and explicit:
+            for parameter in grammar.parameters:
+                if parameter not in parameters:
+                    parameters[parameter] = 0
+                    explicit += 1
+
+        confidence = 0.6 if len(matches) == 1 else 0.35
+        if grammar.parameters:
+            confidence += 0.4 * explicit / len(grammar.parameters)
+            confidence += 0.15 * positional / len(grammar.parameters)
+        else:
+            confidence += 0.4
+        confidence -= 0.2 * leftover
+        if _COMPOUND_RE.search(text):
+            confidence -= 0.3
+
+        for parameter, source in PARAMETER_FALLBACKS.get(grammar.action, {}).items():
+            if parameter not in parameters and source in parameters:
+                parameters[parameter] = parameters[source]
+
+        defaults = PARAMETER_DEFAULTS.get(grammar.action, {})
+        ordered = {}
+        for parameter in grammar.parameters:
+            value = parameters.get(parameter, defaults.get(parameter, 0))
+            if parameter in grammar.choices:
+                ordered[parameter] = value
+                continue
+            ordered[parameter] = int(round(value)) if parameter in INTEGER_PARAMETERS else round(value, 6)
+        parameters = ordered
+
+        invalid = self._invalid(parameters, grammar.choices)
+        if invalid:
+            return {
+                "success": False,
+                "error": f"Cannot {grammar.action.replace('_', ' ')}: {invalid}",
+                "action": None,
+                "parameters": {},
+                "confidence": 0.0,
+                "source": "local"
+            }
+
+        template = MESSAGE_TEMPLATES.get(grammar.action)
+        message = template.format(**parameters) if template else f"Running {grammar.action}"
+        if spatial:
+            parameters["near"] = spatial.group(2)
+            parameters["side"] = _SIDE_OF[' '.join(spatial.group(1).split())]
+            message += f", {spatial.group(0).strip()}"
+
+        return {
+            "success": True,
+            "action": grammar.action,
+            "parameters": parameters,
+            "message": message,
+            "confidence": round(max(0.0, min(1.0, confidence)), 2),
+            "source": "local"
+        }
+
+    def _bind_parameters(self, grammar: _ActionGrammar, text: str) -> Tuple[Dict[str, float], int, int, int]:
+        numbers = [(m.start(1), m) for m in _NUMBER_RE.finditer(text)]
+        # Numbers that are part of a keyword ("x axis") are not values
+        numbers = [(start, m) for start, m in numbers if not text[max(0, start - 1):start].isalpha()]
+
+        # Keyword-first and number-first bindings can disagree ("8mm diameter 15mm depth");
+        # keep whichever order explains more parameters, preferring keyword-first.
+        best = None
+        for order in (("after", "before"), ("before", "after")):
+            bound: Dict[str, float] = {}
+            used = set()
+            if grammar.action in DIMENSION_PARAMETERS:
+                self._bind_dimensions(grammar.action, text, bound, used)
+            for direction in order:
+                for rule in grammar.rules:
+                    if rule.parameter in bound:
+                        continue
+                    for m in getattr(rule, direction).finditer(text):
+                        if m.start(1) in used:
+                            continue
+                        if rule.parameter in UNITLESS_PARAMETERS and m.group(2):
+                            continue
+                        bound[rule.parameter] = self._to_mm(m, rule.parameter) * rule.factor
+                        used.add(m.start(1))
+                        break
+            if best is None or len(bound) > len(best[0]):
+                best = (bound, used)
+
+        bound, used = best
+        explicit = len(bound)
+
+        # Remaining numbers fill the remaining parameters in declaration order
+        free = [m for start, m in numbers if start not in used]
+        positional = 0
+        for parameter in grammar.parameters:
+            if parameter in bound or parameter in grammar.choices or not free:
+                continue
+            m = free.pop(0)
+            bound[parameter] = self._to_mm(m, parameter)
+            positional += 1
+
+        return bound, explicit, positional, len(free)
+
+    def _bind_dimensions(self, action: str, text: str, bound: Dict[str, float], used: set) -> None:
+        dims = _DIMENSIONS_RE.search(text)
+        if dims:
+            values = [(dims.group(i), dims.group(i + 1), dims.start(i)) for i in (1, 3, 5) if dims.group(i)]
+            # A unit written once applies to every dimension ("30x20x10mm")
+            last_unit = next((unit for _, unit, _ in reversed(values) if unit), None)
+            for parameter, (value, unit, start) in zip(DIMENSION_PARAMETERS[action], values):
+                if parameter in UNITLESS_PARAMETERS:
+                    bound[parameter] = float(value)
+                else:
+                    bound[parameter] = float(value) * UNIT_TO_MM[unit or last_unit or "mm"]
+                used.add(start)
+            return
+
+        if action != "create_box":
+            return
+
+        # "20mm cube" or "cube 20mm": a single size applies to every side
+        cube = (re.search(_QUANTITY + r'\s*(?:cube|box)\b', text)
+                or re.search(r'\bcube\s*(?:of|=|:|is|sized?)?\s*' + _QUANTITY, text))
+        if cube and re.search(r'\bcube\b', text):
+            size = self._to_mm(cube, "length")
+            bound.update(length=size, width=size, height=size)
+            used.add(cube.start(1))
+
+    def _invalid(self, parameters: Dict[str, Any], choices: Dict[str, Any]) -> Optional[str]:
+        """Why the values cannot be built, or None"""
+        for parameter, value in parameters.items():
+            if parameter in choices or parameter in SIGNED_PARAMETERS:
+                continue
+            name = parameter.replace('_', ' ')
+            minimum = PARAMETER_MINIMUMS.get(parameter)
+            if minimum is not None and value < minimum:
+                return f"{name} must be at least {minimum:g} (got {value:g})"
+            if value <= 0:
+                return f"{name} must be positive (got {value:g})"
+        return None
+
+    def _to_mm(self, match: re.Match, parameter: str) -> float:
+        value = float(match.group(1))
+        if parameter in UNITLESS_PARAMETERS:
+            return value
+        return value * UNIT_TO_MM[match.group(2) or "mm"]
@@ -0,0 +1,147 @@
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Tuple
+
+from .. import config
+from .storage import Storage, storage as default_storage
+
+# Stages recorded for every command, in pipeline order
+STAGES = [
+    "design_index", "local_parse", "cache_lookup", "similarity_lookup", "model_route", "llm_request", "response_parse",
+    "fusion_action", "fusion_feature", "export", "command_total", "palette_round_trip"
+]
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(-(-pct * len(sorted_values) // 100)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class MetricsStore:
+    """Latency spans for each stage of a command, kept in fusionGPT.db.
+
+    Recording a span only queues an insert on the storage layer, whose
+    background flusher commits it with other writes, so neither the worker
+    threads nor Fusion's main thread wait on SQLite. Spans pick up the
+    request id of the surrounding ``request()`` block on the same thread.
+    """
+
+    # Rows recorded between two trims of the table to max_rows
+    TRIM_EVERY = 1000
+
+    def __init__(self, store: Optional[Storage] = None, max_rows: int = 50000, enabled: bool = True):
+        self.store = store or default_storage
+        self.max_rows = max_rows
+        self.enabled = enabled
+
+        self._recorded = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def request(self, request_id: Optional[str]):
+        """Attribute spans recorded on this thread to a request"""
+        previous = getattr(self._local, 'request_id', None)
+        self._local.request_id = request_id
+        try:
+            yield
+        finally:
+            self._local.request_id = previous
+
+    def current_request(self) -> Optional[str]:
+        """Request id of the enclosing ``request()`` block on this thread"""
+        return getattr(self._local, 'request_id', None)
+
+    @contextmanager
+    def span(self, stage: str, action: Optional[str] = None, detail: Optional[str] = None):
+        """Time the enclosed block; a raised exception marks the span as failed"""
+        started = time.perf_counter()
+        success = True
+        try:
+            yield
+        except BaseException:
+            success = False
+            raise
+        finally:
+            self.record(stage, (time.perf_counter() - started) * 1000, action, detail, success)
+
+    def record(self, stage: str, duration_ms: float, action: Optional[str] = None, detail: Optional[str] = None,
+               success: bool = True, request_id: Optional[str] = None) -> None:
+        """Buffer one measurement"""
+        if not self.enabled:
+            return
+        self.store.write(
+            "INSERT INTO metrics (request_id, stage, action, detail, duration_ms, success, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (request_id or getattr(self._local, 'request_id', None),
+             stage, action, detail, round(duration_ms, 3), int(success), time.time())
+        )
+        with self._lock:
+            self._recorded += 1
+            trim = self._recorded % self.TRIM_EVERY == 0
+        if trim:
+            self.store.write("DELETE FROM metrics WHERE id <= (SELECT MAX(id) FROM metrics) - ?", (self.max_rows,))
+
+    def flush(self) -> None:
+        """Write queued measurements to SQLite"""
+        self.store.flush()
+
+    def summary(self, since_seconds: Optional[float] = None) -> Dict[str, Any]:
+        """
+        p50/p95/p99 latency (ms) per stage and per stage and action, optionally
+        limited to the last ``since_seconds``.
+        """
+        since = time.time() - since_seconds if since_seconds else 0
+        try:
+            rows = self.store.query(
+                "SELECT stage, action, duration_ms FROM metrics WHERE created_at >= ? "
+                "ORDER BY stage, action, duration_ms",
+                (since,), fresh=True
+            )
+        except sqlite3.Error as e:
+            return {"success": False, "error": f"Could not read metrics: {e}"}
+
+        # Rows come sorted per action; a stage's list interleaves its actions
+        by_stage: Dict[str, List[float]] = {}
+        by_action: Dict[Tuple[str, str], List[float]] = {}
+        for stage, action, duration in rows:
+            by_stage.setdefault(stage, []).append(duration)
+            if action:
+                by_action.setdefault((stage, action), []).append(duration)
+
+        order = {stage: index for index, stage in enumerate(STAGES)}
+        stage_rows = [
+            self._describe(sorted(values), stage=stage)
+            for stage, values in sorted(by_stage.items(), key=lambda item: (order.get(item[0], len(order)), item[0]))
+        ]
+        action_rows = [
+            self._describe(values, stage=stage, action=action)
+            for (stage, action), values in sorted(
+                by_action.items(), key=lambda item: (order.get(item[0][0], len(order)), item[0])
+            )
+        ]
+        return {"success": True, "samples": len(rows), "stages": stage_rows, "actions": action_rows}
+
+    def clear(self) -> None:
+        self.store.execute("DELETE FROM metrics")
+
+    def _describe(self, values: List[float], **labels) -> Dict[str, Any]:
+        # values must be sorted
+        described = dict(labels, count=len(values))
+        for pct in PERCENTILES:
+            described[f"p{pct}"] = round(percentile(values, pct), 2)
+        return described
+
+
+# Process-wide store shared by the AI service, the modeling actions and the palette
+metrics = MetricsStore(
+    max_rows=config.METRICS_MAX_ROWS,
+    enabled=config.METRICS_ENABLED
+)
@@ -0,0 +1,100 @@
+import re
+import threading
+import time
+from typing import Dict, Any, Callable, List, Optional
+
+from .intent_parser import find_quantities
+from .metrics import metrics
+
+# Wording that introduces another step or repeats an operation
+_STEP_RE = re.compile(r'\b(then|after(?:wards| that)?|next|followed by|finally|also|each|every|both|on top)\b')
+
+# Contribution of each prompt feature to the complexity score
+WORD_WEIGHT = 0.1
+EXTRA_ACTION_WEIGHT = 2.0
+STEP_WEIGHT = 2.0
+QUANTITY_WEIGHT = 0.2
+UNCERTAINTY_WEIGHT = 2.0
+
+
+class ModelRouter:
+    """Chooses the OpenAI model for a prompt from a cheapest-first list of tiers.
+
+    Each tier is ``{"name", "model", "max_complexity"}``. A prompt goes to
+    the first tier whose ``max_complexity`` is at least its complexity
+    score (``None`` means no limit); the tiers after it are the escalation
+    path when that model's answer is unusable. The score grows with the
+    prompt's length, the number of actions and quantities it names, step
+    wording like "then", and the local parser's uncertainty. Every decision
+    is recorded as a ``model_route`` metric.
+    """
+
+    def __init__(self, tiers: List[Dict[str, Any]], actions: Callable[[str], List[str]]):
+        if not tiers:
+            raise ValueError("At least one model tier is required")
+        self.tiers = tiers
+        self.actions = actions
+        self.routed: Dict[str, int] = {tier['name']: 0 for tier in tiers}
+        self.escalations = 0
+        self._lock = threading.Lock()
+
+    @property
+    def signature(self) -> str:
+        """The tier models, for keying cached interpretations"""
+        return "+".join(tier['model'] for tier in self.tiers)
+
+    def complexity(self, prompt: str, confidence: float = 0.0) -> Dict[str, Any]:
+        """The features of a prompt and the score computed from them"""
+        text = prompt.lower()
+        features = {
+            "words": len(text.split()),
+            "actions": len(self.actions(text)),
+            "steps": len(_STEP_RE.findall(text)),
+            "quantities": len(find_quantities(text)),
+            "confidence": confidence
+        }
+        score = (
+            WORD_WEIGHT * features["words"]
+            + EXTRA_ACTION_WEIGHT * max(0, features["actions"] - 1)
+            + STEP_WEIGHT * features["steps"]
+            + QUANTITY_WEIGHT * features["quantities"]
+            + UNCERTAINTY_WEIGHT * (1 - confidence)
+        )
+        features["score"] = round(score, 2)
+        return features
+
+    def route(self, prompt: str, confidence: float = 0.0) -> List[str]:
+        """Models to try for a prompt: the chosen tier first, then the larger ones"""
+        started = time.perf_counter()
+        features = self.complexity(prompt, confidence)
+        index = len(self.tiers) - 1
+        for position, tier in enumerate(self.tiers):
+            limit = tier.get('max_complexity')
+            if limit is None or features["score"] <= limit:
+                index = position
+                break
+        tier = self.tiers[index]
+        with self._lock:
+            self.routed[tier['name']] += 1
+        metrics.record(
+            "model_route", (time.perf_counter() - started) * 1000, action=tier['name'],
+            detail=" ".join(f"{key}={value}" for key, value in features.items())
+        )
+        return [entry['model'] for entry in self.tiers[index:]]
+
+    def escalated(self, model: str, to_model: str, reason: Optional[str] = None) -> None:
+        """Record that a model's answer was unusable or its request failed, and the next tier is asked"""
+        with self._lock:
+            self.escalations += 1
+        metrics.record("model_route", 0.0, action=self._name(to_model),
+                       detail=f"escalated from {model}: {reason or 'no usable answer'}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"routed": dict(self.routed), "escalations": self.escalations}
+
+    def _name(self, model: str) -> str:
+        for tier in self.tiers:
+            if tier['model'] == model:
+                return tier['name']
+        return model
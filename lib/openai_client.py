@@ -0,0 +1,128 @@
+import threading
+from typing import Optional
+
+from .. import config
+
+# openai (and httpx) are imported on first use; importing them costs about a
+# second, which must not be paid on Fusion's main thread at add-in start
+_httpx = None
+_OpenAI = None
+_import_failed = False
+
+# Process-wide client shared by AIService and FusionGPT
+_client = None
+_http_client = None
+_client_key: Optional[str] = None
+_registered_key: Optional[str] = None
+_lock = threading.Lock()
+
+
+class StreamInterrupted(ConnectionError):
+    """A streamed completion ended before the model finished its answer"""
+
+
+def is_available() -> bool:
+    """Import the openai library if needed and report whether it is installed"""
+    global _httpx, _OpenAI, _import_failed
+    with _lock:
+        if _OpenAI is None and not _import_failed:
+            try:
+                import httpx
+                from openai import OpenAI
+                _httpx, _OpenAI = httpx, OpenAI
+            except ImportError:
+                _import_failed = True
+        return _OpenAI is not None
+
+
+def register_api_key(api_key: str) -> None:
+    """Remember a key found outside config.py (e.g. the SQLite keys table)"""
+    global _registered_key
+    with _lock:
+        _registered_key = api_key or None
+
+
+def get_client(api_key: Optional[str] = None):
+    """
+    Return the shared OpenAI client, creating it on first use.
+    The key is taken from the argument, config.AI_API_KEY or a registered key,
+    in that order. Returns None when no key or no openai library is available.
+    """
+    global _client, _http_client, _client_key
+    if not is_available():
+        return None
+
+    with _lock:
+        key = api_key or config.AI_API_KEY or _registered_key
+        if not key:
+            return None
+        if _client is None or key != _client_key:
+            if _client is not None:
+                _client.close()
+            _client, _http_client = _create_client(key)
+            _client_key = key
+        return _client
+
+
+def warm_up() -> bool:
+    """Make a lightweight request so a keep-alive connection is ready for the first command"""
+    client = get_client()
+    if client is None:
+        return False
+    try:
+        # Any response, even 401/404, leaves an established connection in the pool
+        _http_client.head(str(client.base_url))
+        return True
+    except Exception as e:
+        print(f"OpenAI warm-up failed: {e}")
+        return False
+
+
+def is_transient(error: Exception) -> bool:
+    """Whether a failed request is worth retrying: timeouts, dropped connections, 429 and 5xx"""
+    if _httpx is not None and isinstance(error, (_httpx.TimeoutException, _httpx.TransportError)):
+        return True
+    if isinstance(error, ConnectionError) or type(error).__name__ in ("APITimeoutError", "APIConnectionError"):
+        return True
+    status = getattr(error, 'status_code', None)
+    return status in (408, 409, 429) or (status is not None and status >= 500)
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Delay the server asked for in a Retry-After header, if any"""
+    response = getattr(error, 'response', None)
+    try:
+        return float(response.headers.get('retry-after'))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def close_client() -> None:
+    global _client, _http_client, _client_key
+    with _lock:
+        if _client is not None:
+            _client.close()
+        _client = None
+        _http_client = None
+        _client_key = None
+
+
+def _create_client(api_key: str):
+    timeout = _httpx.Timeout(config.AI_REQUEST_TIMEOUT, connect=config.AI_CONNECT_TIMEOUT)
+    http_client = _httpx.Client(
+        timeout=timeout,
+        limits=_httpx.Limits(
+            max_connections=config.AI_MAX_CONNECTIONS,
+            max_keepalive_connections=config.AI_MAX_CONNECTIONS,
+            keepalive_expiry=config.AI_KEEPALIVE_EXPIRY
+        )
+    )
+    client = _OpenAI(
+        api_key=api_key,
+        base_url=config.AI_BASE_URL or None,
+        timeout=timeout,
+        # Retries are made by AIService within the request's latency budget
+        max_retries=0,
+        http_client=http_client
+    )
+    return client, http_client
@@ -0,0 +1,196 @@
+import json
+import time
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+# Version of the envelope both sides speak; bump it when a field changes meaning
+PROTOCOL_VERSION = 1
+
+# Kinds of message. The palette sends requests, and cancels carrying the id of
+# the request to stop. Fusion answers each with a response (its returnData) and
+# may follow a request up with progress messages and one result under the same
+# id. Events belong to no request.
+REQUEST = "request"
+RESPONSE = "response"
+PROGRESS = "progress"
+RESULT = "result"
+CANCEL = "cancel"
+EVENT = "event"
+
+# action of the palette messages carrying envelopes, in both directions
+BUS_ACTION = "bus"
+FRAME_ACTION = "busFrame"
+
+Handler = Callable[[Dict[str, Any], Optional[str]], Any]
+
+
+class PaletteBus:
+    """Request/response protocol between palette.js and the add-in.
+
+    Each message is an envelope ``{"v", "id", "kind", "type", "data"}``. The
+    id correlates a request with its response, progress and result, so the
+    palette can have several requests in flight. Requests are routed by type
+    to the handlers registered with ``handler``; a cancel goes to the one
+    registered with ``on_cancel`` for the type of the request it names.
+
+    Outbound messages are queued and sent together as one frame by
+    ``flush``, which the palette's event handlers call when they are done.
+    Progress for the same request and type is coalesced so only the latest
+    one is sent. Frames without a result are sent at most every
+    ``frame_interval`` seconds; ``schedule`` is asked to call ``flush`` again
+    once that time has passed. Messages from palettes that still call
+    actions directly by name are routed the same way and answered without
+    an envelope.
+
+    ``log`` gets one line per incoming message, and the payload only when
+    its handler raised.
+    """
+
+    def __init__(self, send: Callable[[str, str], bool], frame_interval: float = 0.05,
+                 schedule: Optional[Callable[[float], None]] = None,
+                 log: Optional[Callable[[str, bool], None]] = None):
+        self.send = send
+        self.frame_interval = frame_interval
+        self.schedule = schedule
+        self.log = log
+        self._handlers: Dict[str, Handler] = {}
+        self._cancel_handlers: Dict[str, Callable[[str], Any]] = {}
+        self._outbox: List[Dict[str, Any]] = []
+        # (id, type) -> index in the outbox of its pending progress message
+        self._progress_at: Dict[Tuple[Optional[str], str], int] = {}
+        # request id -> type, for routing cancels
+        self._open: Dict[str, str] = {}
+        self._last_frame = 0.0
+        self._flush_scheduled = False
+        self._has_result = False
+
+        self.frames = 0
+        self.messages = 0
+        self.coalesced = 0
+
+    def handler(self, message_type: str):
+        """Decorator registering the handler of a request type; it gets (data, request_id)"""
+        def register(function: Handler) -> Handler:
+            self._handlers[message_type] = function
+            return function
+        return register
+
+    def on_cancel(self, message_type: str):
+        """Decorator registering what cancels a request of this type; it gets the request id"""
+        def register(function: Callable[[str], Any]) -> Callable[[str], Any]:
+            self._cancel_handlers[message_type] = function
+            return function
+        return register
+
+    def dispatch(self, action: str, raw: str) -> str:
+        """Handle one message from the palette and return its returnData"""
+        if action != BUS_ACTION:
+            # Palette code from before the bus calls actions directly
+            data = json.loads(raw) if raw else {}
+            self._trace(f"{action} (unversioned)")
+            reply = self._call(action, data, data.get('requestId'))
+            return reply if isinstance(reply, str) else json.dumps(reply)
+
+        envelope = json.loads(raw)
+        request_id = envelope.get('id')
+        message_type = envelope.get('type', '')
+        kind = envelope.get('kind', REQUEST)
+        self._trace(f"{kind} {message_type} [{request_id}]")
+        if envelope.get('v') != PROTOCOL_VERSION:
+            return self._response(request_id, message_type, {
+                "success": False,
+                "error": f"Palette protocol v{envelope.get('v')} is not supported (expected v{PROTOCOL_VERSION}); "
+                         f"reopen the palette"
+            })
+        if kind == CANCEL:
+            return self._response(request_id, message_type, self._cancel(request_id))
+        return self._response(request_id, message_type,
+                              self._call(message_type, envelope.get('data') or {}, request_id))
+
+    def open(self, request_id: str, message_type: str) -> None:
+        """Note a request that will send progress or a result later"""
+        self._open[request_id] = message_type
+
+    def progress(self, request_id: Optional[str], message_type: str, data: Dict[str, Any],
+                 coalesce: bool = True) -> None:
+        """Queue a progress update. A newer one for the same request replaces it,
+        unless either was queued with coalesce=False (each is a line of a log)."""
+        message = self._envelope(request_id, PROGRESS, message_type, data)
+        if not coalesce:
+            self._outbox.append(message)
+            return
+        key = (request_id, message_type)
+        index = self._progress_at.get(key)
+        if index is not None:
+            self._outbox[index] = message
+            self.coalesced += 1
+            return
+        self._progress_at[key] = len(self._outbox)
+        self._outbox.append(message)
+
+    def result(self, request_id: str, message_type: str, data: Dict[str, Any]) -> None:
+        """Queue the final message of a request"""
+        self._open.pop(request_id, None)
+        self._has_result = True
+        self._outbox.append(self._envelope(request_id, RESULT, message_type, data))
+
+    def event(self, message_type: str, data: Dict[str, Any]) -> None:
+        self._outbox.append(self._envelope(None, EVENT, message_type, data))
+
+    def flush(self, force: bool = False) -> int:
+        """Send the queued messages as one frame; returns how many were sent"""
+        if not self._outbox:
+            return 0
+        now = time.monotonic()
+        wait = self.frame_interval - (now - self._last_frame)
+        if not force and not self._has_result and wait > 0:
+            if self.schedule is not None and not self._flush_scheduled:
+                self._flush_scheduled = True
+                self.schedule(wait)
+            return 0
+
+        messages, self._outbox = self._outbox, []
+        self._progress_at.clear()
+        self._flush_scheduled = False
+        self._has_result = False
+        self._last_frame = now
+        frame = json.dumps({"v": PROTOCOL_VERSION, "messages": messages})
+        if self.send(FRAME_ACTION, frame):
+            self.frames += 1
+            self.messages += len(messages)
+        return len(messages)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "frames": self.frames,
+            "messages": self.messages,
+            "coalesced": self.coalesced,
+            "queued": len(self._outbox),
+            "open": len(self._open)
+        }
+
+    def _call(self, message_type: str, data: Dict[str, Any], request_id: Optional[str]) -> Any:
+        handler = self._handlers.get(message_type)
+        if handler is None:
+            return {"success": False, "error": f"Unknown palette request '{message_type}'"}
+        try:
+            return handler(data, request_id)
+        except Exception as e:
+            error = f"Error processing palette message: {str(e)}"
+            self._trace(f"{error}\n{message_type} [{request_id}]: {json.dumps(data)}", error=True)
+            return {"success": False, "error": error}
+
+    def _cancel(self, request_id: Optional[str]) -> Dict[str, Any]:
+        cancel = self._cancel_handlers.get(self._open.get(request_id))
+        if cancel is None:
+            return {"success": False, "error": "That request has finished or cannot be cancelled"}
+        return cancel(request_id)
+
+    def _trace(self, message: str, error: bool = False) -> None:
+        if self.log is not None:
+            self.log(message, error)
+
+    def _response(self, request_id: Optional[str], message_type: str, data: Any) -> str:
+        return json.dumps(self._envelope(request_id, RESPONSE, message_type, data))
+
+    def _envelope(self, request_id: Optional[str], kind: str, message_type: str, data: Any) -> Dict[str, Any]:
+        return {"v": PROTOCOL_VERSION, "id": request_id, "kind": kind, "type": message_type, "data": data}
@@ -0,0 +1,98 @@
+import random
+import threading
+import time
+from typing import Dict, Any
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Exponential backoff with full jitter: a random delay up to base * 2^attempt, at most cap"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """Stops calling a failing service for a while.
+
+    After ``failure_threshold`` consecutive failures the breaker opens and
+    ``allow()`` returns False for ``cooldown`` seconds. Then a single trial
+    call is let through (half-open): its success closes the breaker, its
+    failure opens it for another cool-down.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 3, cooldown: float = 30.0, name: str = "service"):
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self.name = name
+
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_started = False
+        self._lock = threading.Lock()
+
+        self.trips = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._advance()
+            return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go out now"""
+        with self._lock:
+            self._advance()
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and not self._trial_started:
+                self._trial_started = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != self.CLOSED:
+                print(f"{self.name} recovered, circuit closed")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_started = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.trips += 1
+                    print(f"{self.name} failed {self._failures} times, circuit open for {self.cooldown:g}s")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._trial_started = False
+
+    def retry_in(self) -> float:
+        """Seconds until the next trial call is allowed (0 when calls go through)"""
+        with self._lock:
+            self._advance()
+            if self._state != self.OPEN:
+                return 0.0
+            return max(0.0, self._opened_at + self.cooldown - time.monotonic())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._advance()
+            return {
+                "state": self._state,
+                "consecutive_failures": self._failures,
+                "trips": self.trips,
+                "rejected": self.rejected
+            }
+
+    def _advance(self) -> None:
+        # Caller holds self._lock
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+            self._state = self.HALF_OPEN
+            self._trial_started = False
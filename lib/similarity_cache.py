@@ -0,0 +1,433 @@
+import copy
+import difflib
+import json
+import math
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import Counter
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+from .intent_parser import UNITLESS_PARAMETERS, INTEGER_PARAMETERS, find_quantities, to_mm
+from .storage import Storage, storage as default_storage
+
+# NumPy is not bundled with Fusion's Python. With it, the candidates of a
+# lookup are scored in one matrix-vector product; without it, one dot product
+# of sparse vectors each.
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+SLOT = "#"
+
+# Words that do not change what a command means
+_FILLER = {
+    "a", "an", "the", "please", "make", "create", "build", "add", "draw", "generate", "new",
+    "me", "can", "you", "i", "want", "need", "would", "like", "to", "some",
+    "of", "with", "and", "that", "is", "has", "having"
+}
+_WORD_RE = re.compile(r'\w+|' + SLOT)
+
+# Ratios between a parameter and the number it was read from (radius from a diameter, ...)
+_FACTORS = (1.0, 0.5, 2.0)
+
+
+def make_template(prompt: str) -> Tuple[str, List[Tuple[float, Optional[str]]]]:
+    """
+    Replace every quantity in a prompt with a slot marker and drop filler words.
+    Returns the template and the (value, unit) of each slot in order.
+    """
+    text = prompt.lower().strip()
+    slots = []
+    parts = []
+    last = 0
+    for start, end, value, unit in find_quantities(text):
+        parts.append(text[last:start])
+        parts.append(f" {SLOT} ")
+        slots.append((value, unit))
+        last = end
+    parts.append(text[last:])
+    words = [word for word in _WORD_RE.findall("".join(parts)) if word not in _FILLER]
+    return " ".join(words), slots
+
+
+def canonical(template: str) -> str:
+    """Template words in sorted order, so "# cube" and "cube #" compare equal"""
+    return " ".join(sorted(template.split()))
+
+
+def slot_contexts(template: str) -> List[List[str]]:
+    """The words next to each slot; they tell "radius # height #" from "height # radius #" """
+    words = template.split()
+    contexts = []
+    for index, word in enumerate(words):
+        if word == SLOT:
+            neighbours = [words[i] for i in (index - 1, index + 1) if 0 <= i < len(words) and words[i] != SLOT]
+            contexts.append(sorted(set(neighbours)))
+    return contexts
+
+
+def signature(key: str, keywords: List[str], slot_count: int) -> tuple:
+    """
+    What a template must share with another to be compatible: the keywords,
+    the number of slots and the first two letters of each word. Spellings of
+    one word (see ``same_words``) start with the same two letters.
+    """
+    return tuple(keywords), slot_count, tuple(sorted({word[:2] for word in key.split()}))
+
+
+def _variant(a: str, b: str) -> bool:
+    """Whether two words are spellings of one word ("cube"/"cubes", "diam"/"diameter")"""
+    short, long = sorted((a, b), key=len)
+    if len(short) < 3 or short == SLOT or long == SLOT:
+        return False
+    return long.startswith(short) or len(short) >= 4 and difflib.SequenceMatcher(None, a, b).ratio() >= 0.8
+
+
+def same_words(a: str, b: str) -> bool:
+    """
+    Whether two templates differ only in the spelling of their words. A word
+    swapped for another ("x axis" for "y axis", "depth" for "diameter") looks
+    close in trigram space but changes the meaning.
+    """
+    left, right = set(a.split()), set(b.split())
+    return (all(any(_variant(word, other) for other in right) for word in left - right)
+            and all(any(_variant(word, other) for other in left) for word in right - left))
+
+
+class _Entry:
+    __slots__ = ("template", "key", "keywords", "contexts", "signature", "bindings", "response", "row", "hits")
+
+    def __init__(self, template, keywords, contexts, bindings, response, hits=0):
+        self.template = template
+        self.key = canonical(template)
+        self.keywords = keywords
+        self.contexts = contexts
+        self.signature = signature(self.key, keywords, len(contexts))
+        self.bindings = bindings
+        self.response = response
+        self.row = -1
+        self.hits = hits
+
+
+class SimilarityCache:
+    """Reuses interpretations of prompts that differ only in wording or numbers.
+
+    Prompts are reduced to templates: quantities become slots and filler
+    words are dropped, so "make a 25 mm cube" gives "# cube" and "create
+    cube 1in" gives "cube #". Each stored interpretation records which
+    parameter was read from which slot, so a similar prompt is answered by
+    refilling the slots with its own numbers. Templates with the same words
+    in any order are found through a dictionary. Otherwise only templates
+    with the same ``signature`` can match; at most ``candidates`` of them are
+    compared by cosine similarity of TF-IDF weighted character trigrams of
+    their sorted words, hashed into ``dimensions`` buckets, so a lookup costs
+    the same however many templates are stored. Such a neighbour may only
+    spell the same words differently, and the words next to each slot must
+    still agree, so swapped parameters or axes do not match.
+    Interpretations whose parameters cannot be traced back to the prompt
+    unambiguously are not stored.
+    """
+
+    def __init__(self, model: str, schema_version: int, threshold: float = 0.9, max_entries: int = 50000,
+                 dimensions: int = 512, candidates: int = 32, keywords: Optional[Callable[[str], List[str]]] = None,
+                 defaults: Optional[Dict[str, Dict[str, Any]]] = None, store: Optional[Storage] = None):
+        self.model = model
+        self.schema_version = schema_version
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.dimensions = dimensions
+        self.candidates = candidates
+        self.keywords = keywords or (lambda text: [])
+        self.defaults = defaults or {}
+        self.store = store or default_storage
+
+        self._entries: List[_Entry] = []
+        self._by_key: Dict[str, _Entry] = {}
+        self._df = Counter()
+        self._idf: Dict[int, float] = {}
+        self._indexed_at = 0
+        self._matrix = None
+        # signature -> rows, oldest first
+        self._by_signature: Dict[tuple, List[int]] = {}
+        self._vectors: List[Dict[int, float]] = []
+        self._lock = threading.RLock()
+        self._loaded = False
+
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, prompt: str) -> Optional[Dict[str, Any]]:
+        """Return an interpretation for the prompt built from a similar stored one, or None"""
+        template, slots = make_template(prompt)
+        with self._lock:
+            self._load()
+            if not self._entries or not slots:
+                self.misses += 1
+                return None
+
+            keywords = self.keywords(template)
+            contexts = slot_contexts(template)
+            key = canonical(template)
+            entry = self._by_key.get(key)
+            score = 1.0
+            if entry is None or not self._compatible(entry, key, keywords, contexts, len(slots)):
+                entry, score = self._nearest(key, keywords, contexts, len(slots))
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry.hits += 1
+            self.store.write(
+                "UPDATE similarity_cache SET last_used = ?, hits = ? WHERE template = ? AND model = ? AND schema_version = ?",
+                (time.time(), entry.hits, entry.template, self.model, self.schema_version)
+            )
+
+        response = self._refill(entry, slots)
+        response['similarity'] = round(score, 3)
+        return response
+
+    def add(self, prompt: str, response: Dict[str, Any]) -> bool:
+        """Learn a successful interpretation; returns False when it cannot be generalized"""
+        if not response.get('success') or not response.get('actions'):
+            return False
+        template, slots = make_template(prompt)
+        if not slots:
+            return False
+        bindings = self._bind(response['actions'], slots)
+        if bindings is None:
+            return False
+
+        stored = {
+            "success": True,
+            "actions": copy.deepcopy(response['actions']),
+            "message": response.get('message', '')
+        }
+        entry = _Entry(template, self.keywords(template), slot_contexts(template), bindings, stored)
+        with self._lock:
+            self._load()
+            self._insert(entry)
+            self._persist(entry)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "numpy": NUMPY_AVAILABLE
+            }
+
+    # Binding numbers to parameters
+
+    def _bind(self, actions: List[Dict[str, Any]], slots: List[Tuple[float, Optional[str]]]) -> Optional[list]:
+        bindings = []
+        used = set()
+        for step_index, step in enumerate(actions):
+            defaults = self.defaults.get(step.get('action'), {})
+            for parameter, value in (step.get('parameters') or {}).items():
+                if isinstance(value, str):
+                    # Only numbers are slots; "stl" must not be reused for "step"
+                    return None
+                if not isinstance(value, (int, float)):
+                    continue
+                matches = []
+                for slot_index, (raw, unit) in enumerate(slots):
+                    number = raw if parameter in UNITLESS_PARAMETERS else to_mm(raw, unit)
+                    for factor in _FACTORS:
+                        if math.isclose(value, number * factor, rel_tol=1e-6, abs_tol=1e-9):
+                            matches.append((slot_index, factor))
+                            break
+                if not matches:
+                    continue
+                # A number that fits several slots, or a default that might not come from the prompt,
+                # cannot be traced back reliably
+                if len({slot for slot, _ in matches}) > 1 or parameter in defaults and math.isclose(value, defaults[parameter]):
+                    return None
+                slot_index, factor = matches[0]
+                bindings.append([step_index, parameter, slot_index, factor])
+                used.add(slot_index)
+        # Every number in the prompt must have gone somewhere
+        if len(used) != len(slots):
+            return None
+        return bindings
+
+    def _refill(self, entry: _Entry, slots: List[Tuple[float, Optional[str]]]) -> Dict[str, Any]:
+        response = copy.deepcopy(entry.response)
+        for step_index, parameter, slot_index, factor in entry.bindings:
+            raw, unit = slots[slot_index]
+            value = (raw if parameter in UNITLESS_PARAMETERS else to_mm(raw, unit)) * factor
+            value = int(round(value)) if parameter in INTEGER_PARAMETERS else round(value, 6)
+            response['actions'][step_index]['parameters'][parameter] = value
+        response['source'] = "similar"
+        return response
+
+    def _compatible(self, entry: _Entry, key: str, keywords: List[str], contexts: List[List[str]],
+                    slot_count: int) -> bool:
+        if len(entry.contexts) != slot_count or entry.keywords != keywords:
+            return False
+        if entry.key != key and not same_words(entry.key, key):
+            return False
+        # Each slot must sit next to a word it sat next to before
+        return all(
+            not stored or not new or set(stored) & set(new)
+            for stored, new in zip(entry.contexts, contexts)
+        )
+
+    # Vector index
+
+    def _nearest(self, key: str, keywords: List[str], contexts: List[List[str]],
+                 slot_count: int) -> Tuple[Optional[_Entry], float]:
+        # The newest templates of a crowded signature are the likeliest to be asked for again
+        rows = self._by_signature.get(signature(key, keywords, slot_count), [])[-self.candidates:]
+        query = self._vector(key)
+        if not rows or not query:
+            return None, 0.0
+
+        if NUMPY_AVAILABLE:
+            dense = np.zeros(self.dimensions, dtype=np.float32)
+            for bucket, weight in query.items():
+                dense[bucket] = weight
+            scores = self._matrix[rows] @ dense
+            ranked = sorted(zip(scores.tolist(), rows), reverse=True)
+        else:
+            ranked = sorted((
+                (sum(weight * self._vectors[row].get(bucket, 0.0) for bucket, weight in query.items()), row)
+                for row in rows
+            ), reverse=True)
+
+        for score, row in ranked:
+            if score < self.threshold:
+                break
+            entry = self._entries[row]
+            if self._compatible(entry, key, keywords, contexts, slot_count):
+                return entry, score
+        return None, 0.0
+
+    def _grams(self, key: str) -> Counter:
+        text = f" {key} "
+        return Counter(zlib.crc32(text[i:i + 3].encode('utf-8')) % self.dimensions for i in range(len(text) - 2))
+
+    def _vector(self, key: str) -> Dict[int, float]:
+        grams = self._grams(key)
+        default_idf = math.log(1 + len(self._entries)) + 1
+        vector = {bucket: (1 + math.log(count)) * self._idf.get(bucket, default_idf) for bucket, count in grams.items()}
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        return {bucket: weight / norm for bucket, weight in vector.items()} if norm else {}
+
+    def _insert(self, entry: _Entry) -> None:
+        # Caller holds self._lock
+        previous = self._by_key.get(entry.key)
+        if previous is not None:
+            # Newer interpretation of the same words replaces the old one in place
+            entry.row = previous.row
+            entry.hits = previous.hits
+            self._entries[entry.row] = entry
+            self._by_key[entry.key] = entry
+            if entry.signature != previous.signature:
+                self._by_signature[previous.signature].remove(entry.row)
+                self._by_signature.setdefault(entry.signature, []).append(entry.row)
+            return
+
+        if len(self._entries) >= self.max_entries:
+            self._evict()
+        entry.row = len(self._entries)
+        self._entries.append(entry)
+        self._by_key[entry.key] = entry
+        self._df.update(self._grams(entry.key).keys())
+
+        # IDF weights drift as templates are added; re-weight everything once the index grew by a quarter
+        if len(self._entries) > max(16, self._indexed_at * 1.25):
+            self._reindex()
+        else:
+            self._index_row(entry.row)
+
+    def _evict(self) -> None:
+        # Drop the least used tenth of the templates
+        keep = sorted(self._entries, key=lambda entry: entry.hits, reverse=True)[:int(self.max_entries * 0.9)]
+        kept = set(keep)
+        evicted = [entry.template for entry in self._entries if entry not in kept]
+        self._entries = keep
+        self._by_key = {entry.key: entry for entry in keep}
+        self._df = Counter()
+        for row, entry in enumerate(keep):
+            entry.row = row
+            self._df.update(self._grams(entry.key).keys())
+        self._reindex()
+        self.store.write_many(
+            "DELETE FROM similarity_cache WHERE template = ? AND model = ? AND schema_version = ?",
+            [(template, self.model, self.schema_version) for template in evicted]
+        )
+
+    def _reindex(self) -> None:
+        count = len(self._entries)
+        self._idf = {bucket: math.log((1 + count) / (1 + df)) + 1 for bucket, df in self._df.items()}
+        self._indexed_at = count
+        self._by_signature = {}
+        self._vectors = []
+        if NUMPY_AVAILABLE:
+            self._matrix = np.zeros((max(64, count * 2), self.dimensions), dtype=np.float32)
+        for row in range(count):
+            self._index_row(row)
+
+    def _index_row(self, row: int) -> None:
+        # Rows are indexed once each, in order, after _reindex or when appended
+        entry = self._entries[row]
+        self._by_signature.setdefault(entry.signature, []).append(row)
+        vector = self._vector(entry.key)
+        if NUMPY_AVAILABLE:
+            if self._matrix is None or row >= self._matrix.shape[0]:
+                grown = np.zeros((max(64, (row + 1) * 2), self.dimensions), dtype=np.float32)
+                if self._matrix is not None:
+                    grown[:self._matrix.shape[0]] = self._matrix
+                self._matrix = grown
+            self._matrix[row] = 0
+            for bucket, weight in vector.items():
+                self._matrix[row, bucket] = weight
+            return
+        self._vectors.append(vector)
+
+    # Persistence
+
+    def _load(self) -> None:
+        # Caller holds self._lock
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            rows = self.store.query(
+                "SELECT template, keywords, contexts, bindings, response, hits FROM similarity_cache "
+                "WHERE model = ? AND schema_version = ? ORDER BY last_used DESC LIMIT ?",
+                (self.model, self.schema_version, self.max_entries)
+            )
+        except sqlite3.Error as e:
+            print(f"Similarity cache load failed: {e}")
+            return
+        for template, keywords, contexts, bindings, response, hits in rows:
+            entry = _Entry(template, json.loads(keywords), json.loads(contexts), json.loads(bindings),
+                           json.loads(response), hits)
+            if entry.key in self._by_key:
+                # An older wording of a template already loaded
+                continue
+            entry.row = len(self._entries)
+            self._entries.append(entry)
+            self._by_key[entry.key] = entry
+            self._df.update(self._grams(entry.key).keys())
+        self._reindex()
+
+    def _persist(self, entry: _Entry) -> None:
+        now = time.time()
+        self.store.write(
+            "INSERT OR REPLACE INTO similarity_cache "
+            "(template, model, schema_version, keywords, contexts, bindings, response, created_at, last_used, hits) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (entry.template, self.model, self.schema_version, json.dumps(entry.keywords), json.dumps(entry.contexts),
+             json.dumps(entry.bindings), json.dumps(entry.response), now, now, entry.hits)
+        )
@@ -0,0 +1,205 @@
+import math
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+# (x0, y0, z0, x1, y1, z1) in millimeters
+Box = Tuple[float, float, float, float, float, float]
+
+# Boxes closer than this are treated as touching
+_EPSILON = 1e-6
+
+
+def shift(box: Box, dx: float, dy: float, dz: float = 0.0) -> Box:
+    x0, y0, z0, x1, y1, z1 = box
+    return (x0 + dx, y0 + dy, z0 + dz, x1 + dx, y1 + dy, z1 + dz)
+
+
+def overlaps(a: Box, b: Box, gap: float = 0.0) -> bool:
+    """Whether the footprints of two boxes on the XY plane come closer than gap"""
+    margin = gap - _EPSILON
+    return a[0] < b[3] + margin and b[0] < a[3] + margin and a[1] < b[4] + margin and b[1] < a[4] + margin
+
+
+class SpatialGrid:
+    """Footprints of boxes on the XY plane, bucketed in a uniform grid.
+
+    ``query`` only tests the boxes sharing a cell with the area asked about,
+    so checking a candidate position costs about the same with ten or ten
+    thousand parts in the design. Boxes larger than ``max_cells`` cells are
+    kept in a short list that every query checks.
+    """
+
+    def __init__(self, cell: float = 50.0, max_cells: int = 256):
+        self.cell = cell
+        self.max_cells = max_cells
+        self._boxes: Dict[Hashable, Box] = {}
+        self._cells: Dict[Tuple[int, int], Set[Hashable]] = {}
+        self._large: Set[Hashable] = set()
+
+    def __len__(self) -> int:
+        return len(self._boxes)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._boxes
+
+    def get(self, key: Hashable) -> Optional[Box]:
+        return self._boxes.get(key)
+
+    def boxes(self) -> Iterable[Box]:
+        return self._boxes.values()
+
+    def insert(self, key: Hashable, box: Box) -> None:
+        if key in self._boxes:
+            self.remove(key)
+        self._boxes[key] = box
+        cells = self._cells_of(box)
+        if cells is None:
+            self._large.add(key)
+            return
+        for cell in cells:
+            self._cells.setdefault(cell, set()).add(key)
+
+    def remove(self, key: Hashable) -> None:
+        box = self._boxes.pop(key, None)
+        if box is None:
+            return
+        if key in self._large:
+            self._large.discard(key)
+            return
+        for cell in self._cells_of(box):
+            keys = self._cells.get(cell)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._cells[cell]
+
+    def clear(self) -> None:
+        self._boxes.clear()
+        self._cells.clear()
+        self._large.clear()
+
+    def query(self, box: Box, gap: float = 0.0) -> List[Hashable]:
+        """Keys of the boxes whose footprint comes closer than gap to box"""
+        area = (box[0] - gap, box[1] - gap, box[2], box[3] + gap, box[4] + gap, box[5])
+        candidates = set(self._large)
+        cells = self._cells_of(area)
+        if cells is None:
+            candidates.update(self._boxes)
+        else:
+            for cell in cells:
+                candidates.update(self._cells.get(cell, ()))
+        return [key for key in candidates if overlaps(self._boxes[key], box, gap)]
+
+    def is_free(self, box: Box, gap: float = 0.0) -> bool:
+        return not self.query(box, gap)
+
+    def _cells_of(self, box: Box) -> Optional[List[Tuple[int, int]]]:
+        i0, j0 = math.floor(box[0] / self.cell), math.floor(box[1] / self.cell)
+        i1, j1 = math.floor(box[3] / self.cell), math.floor(box[4] / self.cell)
+        if (i1 - i0 + 1) * (j1 - j0 + 1) > self.max_cells:
+            return None
+        return [(i, j) for i in range(i0, i1 + 1) for j in range(j0, j1 + 1)]
+
+
+def place(grid: SpatialGrid, footprint: Box, layout: str = "row", gap: float = 10.0,
+          columns: int = 5) -> Tuple[float, float, float]:
+    """
+    Offset (dx, dy, dz) in mm that moves a part's footprint, given around
+    its own origin, to the nearest free spot of the layout:
+
+    - ``row``: along +X, in the first gap wide enough
+    - ``grid``: in rows of ``columns`` cells sized to the largest part
+    - ``pack``: against an existing part, as close to the origin as possible
+    - ``origin``: where it was built, overlapping or not
+    """
+    if layout == "origin" or not len(grid):
+        return (0.0, 0.0, 0.0)
+    if layout == "grid":
+        return _place_grid(grid, footprint, gap, columns)
+    if layout == "pack":
+        return _place_pack(grid, footprint, gap)
+    return _place_row(grid, footprint, gap)
+
+
+def place_beside(grid: SpatialGrid, footprint: Box, anchor: Box, side: str = "right",
+                 gap: float = 10.0) -> Tuple[float, float, float]:
+    """Offset that puts a footprint on one side of the anchor box, pushed further out past any part in the way"""
+    fx = (footprint[0] + footprint[3]) / 2
+    fy = (footprint[1] + footprint[4]) / 2
+    ax = (anchor[0] + anchor[3]) / 2
+    ay = (anchor[1] + anchor[4]) / 2
+    if side == "top":
+        return (ax - fx, ay - fy, anchor[5] - footprint[2])
+
+    if side == "left":
+        dx, dy = anchor[0] - gap - footprint[3], ay - fy
+    elif side == "behind":
+        dx, dy = ax - fx, anchor[4] + gap - footprint[1]
+    elif side == "front":
+        dx, dy = ax - fx, anchor[1] - gap - footprint[4]
+    else:
+        dx, dy = anchor[3] + gap - footprint[0], ay - fy
+
+    # Every step clears at least one more part, so this ends
+    for _ in range(len(grid) + 1):
+        blocking = grid.query(shift(footprint, dx, dy), gap)
+        if not blocking:
+            break
+        boxes = [grid.get(key) for key in blocking]
+        if side == "left":
+            dx = min(box[0] for box in boxes) - gap - footprint[3]
+        elif side == "behind":
+            dy = max(box[4] for box in boxes) + gap - footprint[1]
+        elif side == "front":
+            dy = min(box[1] for box in boxes) - gap - footprint[4]
+        else:
+            dx = max(box[3] for box in boxes) + gap - footprint[0]
+    return (dx, dy, 0.0)
+
+
+def _place_row(grid: SpatialGrid, footprint: Box, gap: float) -> Tuple[float, float, float]:
+    # Sweep the parts in the footprint's band along +X, left to right, until
+    # one starts far enough past the footprint to leave room for it
+    margin = gap - _EPSILON
+    band = sorted((box[0], box[3]) for box in grid.boxes()
+                  if box[1] < footprint[4] + margin and footprint[1] < box[4] + margin)
+    dx = 0.0
+    for x0, x1 in band:
+        if footprint[3] + dx + margin <= x0:
+            break
+        dx = max(dx, x1 + gap - footprint[0])
+    return (dx, 0.0, 0.0)
+
+
+def _place_grid(grid: SpatialGrid, footprint: Box, gap: float, columns: int) -> Tuple[float, float, float]:
+    width = max([footprint[3] - footprint[0]] + [box[3] - box[0] for box in grid.boxes()])
+    depth = max([footprint[4] - footprint[1]] + [box[4] - box[1] for box in grid.boxes()])
+    pitch_x, pitch_y = width + gap, depth + gap
+    fx = (footprint[0] + footprint[3]) / 2
+    fy = (footprint[1] + footprint[4]) / 2
+    columns = max(1, columns)
+    # Each existing part blocks at most four cells
+    for index in range(4 * len(grid) + 1):
+        row, column = divmod(index, columns)
+        dx, dy = column * pitch_x - fx, row * pitch_y - fy
+        if grid.is_free(shift(footprint, dx, dy), gap):
+            return (dx, dy, 0.0)
+    return _place_row(grid, footprint, gap)
+
+
+def _place_pack(grid: SpatialGrid, footprint: Box, gap: float) -> Tuple[float, float, float]:
+    fx = (footprint[0] + footprint[3]) / 2
+    fy = (footprint[1] + footprint[4]) / 2
+    candidates = {(0.0, 0.0)}
+    for box in grid.boxes():
+        candidates.update([
+            (box[3] + gap - footprint[0], box[1] - footprint[1]),
+            (box[0] - footprint[0], box[4] + gap - footprint[1]),
+            (box[0] - gap - footprint[3], box[1] - footprint[1]),
+            (box[0] - footprint[0], box[1] - gap - footprint[4]),
+        ])
+    # Closest to the origin first, ties broken towards +X then +Y for a stable layout
+    for dx, dy in sorted(candidates, key=lambda offset: (math.hypot(offset[0] + fx, offset[1] + fy),
+                                                         -offset[0], -offset[1])):
+        if grid.is_free(shift(footprint, dx, dy), gap):
+            return (dx, dy, 0.0)
+    return _place_row(grid, footprint, gap)
@@ -0,0 +1,49 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Tuple
+
+
+class StartupTimer:
+    """Records how long each phase of add-in startup took.
+
+    Phases may be measured from several threads; each entry keeps the thread
+    it ran on so the report separates what blocked Fusion's main thread from
+    what finished in the background.
+    """
+
+    def __init__(self):
+        # Created while the add-in is imported, i.e. on Fusion's main thread
+        self._owner = threading.current_thread().name
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self.phases: List[Tuple[str, str, float, float]] = []
+
+    @contextmanager
+    def measure(self, phase: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            ended = time.perf_counter()
+            with self._lock:
+                self.phases.append((
+                    phase,
+                    threading.current_thread().name,
+                    (ended - started) * 1000,
+                    (ended - self._start) * 1000
+                ))
+
+    def blocking_ms(self) -> float:
+        """Total time spent in phases that ran on the thread that created the timer"""
+        with self._lock:
+            return sum(duration for _, thread, duration, _ in self.phases if thread == self._owner)
+
+    def report(self) -> str:
+        with self._lock:
+            phases = list(self.phases)
+        lines = ["Startup timing:"]
+        for phase, thread, duration, finished_at in phases:
+            lines.append(f"  {phase}: {duration:.1f} ms on {thread} (done at {finished_at:.1f} ms)")
+        lines.append(f"  Blocking time on main thread: {self.blocking_ms():.1f} ms")
+        return "\n".join(lines)
@@ -0,0 +1,332 @@
+import sqlite3
+import threading
+from typing import Any, Callable, Iterable, List, Optional, Sequence, Tuple
+
+from .. import config
+
+# Versioned schema of fusionGPT.db. Each migration runs once, in order, inside a
+# transaction that also bumps PRAGMA user_version. Never edit a released
+# migration; append a new one. The statements are idempotent so databases
+# created before migrations existed are adopted as they are.
+MIGRATIONS: List[Tuple[int, str, List[str]]] = [
+    (1, "API keys", [
+        '''CREATE TABLE IF NOT EXISTS keys (
+        id    INTEGER    PRIMARY KEY AUTOINCREMENT
+                        UNIQUE,
+        name  TEXT (255) UNIQUE,
+        value TEXT)''',
+        '''CREATE TABLE IF NOT EXISTS key_checks (
+        key_hash   TEXT PRIMARY KEY,
+        valid      INTEGER,
+        checked_at REAL)''',
+    ]),
+    (2, "prompt cache", [
+        '''CREATE TABLE IF NOT EXISTS command_cache (
+        key            TEXT    PRIMARY KEY,
+        prompt         TEXT,
+        model          TEXT,
+        schema_version INTEGER,
+        response       TEXT,
+        created_at     REAL,
+        last_used      REAL,
+        expires_at     REAL,
+        hits           INTEGER DEFAULT 0)''',
+        "CREATE INDEX IF NOT EXISTS command_cache_last_used ON command_cache (last_used)",
+    ]),
+    (3, "latency metrics", [
+        '''CREATE TABLE IF NOT EXISTS metrics (
+        id          INTEGER PRIMARY KEY AUTOINCREMENT,
+        request_id  TEXT,
+        stage       TEXT,
+        action      TEXT,
+        detail      TEXT,
+        duration_ms REAL,
+        success     INTEGER,
+        created_at  REAL)''',
+        "CREATE INDEX IF NOT EXISTS metrics_created_at ON metrics (created_at)",
+    ]),
+    (4, "similarity cache", [
+        '''CREATE TABLE IF NOT EXISTS similarity_cache (
+        template       TEXT,
+        model          TEXT,
+        schema_version INTEGER,
+        keywords       TEXT,
+        contexts       TEXT,
+        bindings       TEXT,
+        response       TEXT,
+        created_at     REAL,
+        last_used      REAL,
+        hits           INTEGER DEFAULT 0,
+        PRIMARY KEY (template, model, schema_version))''',
+    ]),
+    (5, "command history and macros", [
+        '''CREATE TABLE IF NOT EXISTS command_history (
+        id          INTEGER PRIMARY KEY AUTOINCREMENT,
+        request_id  TEXT,
+        prompt      TEXT,
+        actions     TEXT,
+        source      TEXT,
+        success     INTEGER,
+        message     TEXT,
+        created_at  REAL)''',
+        "CREATE INDEX IF NOT EXISTS command_history_created_at ON command_history (created_at)",
+        '''CREATE TABLE IF NOT EXISTS macros (
+        name        TEXT PRIMARY KEY,
+        actions     TEXT,
+        prompts     TEXT,
+        created_at  REAL,
+        updated_at  REAL,
+        runs        INTEGER DEFAULT 0)''',
+    ]),
+    (6, "design table runs", [
+        '''CREATE TABLE IF NOT EXISTS design_table_rows (
+        run_id      TEXT,
+        row_index   INTEGER,
+        row_key     TEXT,
+        status      TEXT,
+        component   TEXT,
+        duration_ms REAL,
+        message     TEXT,
+        updated_at  REAL,
+        PRIMARY KEY (run_id, row_index))''',
+    ]),
+    (7, "exports", [
+        '''CREATE TABLE IF NOT EXISTS exports (
+        path          TEXT PRIMARY KEY,
+        geometry_hash TEXT,
+        format        TEXT,
+        refinement    TEXT,
+        size_bytes    INTEGER,
+        exported_at   REAL)''',
+    ]),
+]
+
+# Applied to every new connection
+PRAGMAS = [
+    "PRAGMA journal_mode = WAL",        # readers never wait for the writer
+    "PRAGMA synchronous = NORMAL",      # safe with WAL, no fsync per commit
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -8000",        # 8 MB page cache
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA foreign_keys = ON",
+]
+
+# Applied on top of PRAGMAS to the read connection
+READ_PRAGMAS = [
+    "PRAGMA query_only = ON",
+]
+
+
+class Storage:
+    """The add-in's connections to fusionGPT.db.
+
+    The write connection is opened on first use, tuned with ``PRAGMAS`` and
+    brought up to date with ``MIGRATIONS``. Writes that nobody waits for go
+    through ``write()``: they are queued in memory and a daemon thread commits
+    the queue in a single transaction every ``flush_interval`` seconds, so the
+    thread that produced them (often Fusion's main thread) never touches the
+    disk. ``query()`` reads through a second, read-only connection that never
+    commits the queue and, under WAL, never waits for the writer; it sees
+    queued writes once they are flushed, or right away with ``fresh=True``.
+    ``execute()`` commits the queue before its own write. A batch that fails
+    is retried one statement at a time, so only the failing statements are
+    lost; each failure goes to ``log`` (the console when it is not set).
+    Statements are kept in sqlite3's prepared
+    statement cache, which is why callers should pass constant SQL with
+    parameters.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, flush_interval: float = 0.5):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.RLock()
+        self._reader: Optional[sqlite3.Connection] = None
+        self._read_lock = threading.Lock()
+        self._pending: List[Tuple[str, Any, bool]] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        self._closed = False
+
+        self.log: Optional[Callable[[str], None]] = None
+
+        self.batches = 0
+        self.statements = 0
+        self.failed = 0
+
+    @property
+    def schema_version(self) -> int:
+        with self._db_lock:
+            return self._connect().execute("PRAGMA user_version").fetchone()[0]
+
+    def query(self, sql: str, params: Sequence[Any] = (), fresh: bool = False) -> List[tuple]:
+        """Rows of a read of what is committed. With fresh, queued writes are
+        committed first, for reads that must see writes just made."""
+        if fresh:
+            self.flush()
+        with self._read_lock:
+            return self._read_connect().execute(sql, params).fetchall()
+
+    def query_one(self, sql: str, params: Sequence[Any] = (), fresh: bool = False) -> Optional[tuple]:
+        rows = self.query(sql, params, fresh)
+        return rows[0] if rows else None
+
+    def execute(self, sql: str, params: Sequence[Any] = ()) -> int:
+        """Run and commit a write now; returns the number of changed rows"""
+        with self._db_lock:
+            self._commit_pending()
+            db = self._connect()
+            try:
+                changed = db.execute(sql, params).rowcount
+                db.commit()
+            except sqlite3.Error:
+                db.rollback()
+                raise
+            return changed
+
+    def write(self, sql: str, params: Sequence[Any] = ()) -> None:
+        """Queue a write for the background flusher"""
+        self._enqueue(sql, params, False)
+
+    def write_many(self, sql: str, rows: Iterable[Sequence[Any]]) -> None:
+        """Queue one statement for several parameter rows"""
+        self._enqueue(sql, list(rows), True)
+
+    def flush(self) -> None:
+        """Commit queued writes now"""
+        with self._db_lock:
+            self._commit_pending()
+
+    def migrate(self) -> int:
+        """Apply missing migrations; returns the schema version"""
+        return self.schema_version
+
+    def close(self) -> None:
+        """Commit what is queued, stop the flusher and close the connection.
+        Using the store again reopens it."""
+        with self._lock:
+            flusher, self._flusher = self._flusher, None
+            self._closed = True
+        self._wake.set()
+        if flusher is not None:
+            flusher.join(timeout=1.0)
+        with self._db_lock:
+            self._commit_pending()
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+        with self._read_lock:
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
+        with self._lock:
+            self._closed = False
+            self._wake.clear()
+
+    def _enqueue(self, sql: str, params: Any, many: bool) -> None:
+        with self._lock:
+            self._pending.append((sql, params, many))
+            if self._flusher is None and not self._closed:
+                self._flusher = threading.Thread(target=self._flush_loop, name="FusionGPT-Storage", daemon=True)
+                self._flusher.start()
+
+    def _flush_loop(self) -> None:
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                self._report(f"Storage flush failed: {e}")
+
+    def _commit_pending(self) -> None:
+        # Caller holds self._db_lock
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+        db = self._connect()
+        dropped = 0
+        try:
+            for statement in pending:
+                self._run(db, statement)
+            db.commit()
+        except sqlite3.Error:
+            db.rollback()
+            # Find the statements at fault; the rest are committed one by one
+            for statement in pending:
+                try:
+                    self._run(db, statement)
+                    db.commit()
+                except sqlite3.Error as e:
+                    db.rollback()
+                    dropped += 1
+                    self._report(f"Storage write failed and was dropped: {e} ({statement[0]})")
+        self.batches += 1
+        self.statements += len(pending) - dropped
+        self.failed += dropped
+
+    @staticmethod
+    def _run(db: sqlite3.Connection, statement: Tuple[str, Any, bool]) -> None:
+        sql, params, many = statement
+        if many:
+            db.executemany(sql, params)
+        else:
+            db.execute(sql, params)
+
+    def _report(self, message: str) -> None:
+        if self.log is not None:
+            try:
+                self.log(message)
+                return
+            except Exception:
+                pass
+        print(message)
+
+    def _connect(self) -> sqlite3.Connection:
+        # Caller holds self._db_lock
+        if self._db is None:
+            if self.db_path is None:
+                from .FusionGPT.helper import getDbPath
+                self.db_path = getDbPath()
+            db = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=256)
+            for pragma in PRAGMAS:
+                db.execute(pragma)
+            self._db = db
+            self._migrate(db)
+        return self._db
+
+    def _read_connect(self) -> sqlite3.Connection:
+        # Caller holds self._read_lock
+        if self._reader is None:
+            if self._db is None:
+                # The write connection creates and migrates the file first
+                with self._db_lock:
+                    self._connect()
+            reader = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=256)
+            for pragma in PRAGMAS + READ_PRAGMAS:
+                reader.execute(pragma)
+            self._reader = reader
+        return self._reader
+
+    def _migrate(self, db: sqlite3.Connection) -> None:
+        current = db.execute("PRAGMA user_version").fetchone()[0]
+        for version, description, statements in MIGRATIONS:
+            if version <= current:
+                continue
+            try:
+                db.execute("BEGIN")
+                for statement in statements:
+                    db.execute(statement)
+                # PRAGMA does not accept parameters; version is an int from MIGRATIONS
+                db.execute(f"PRAGMA user_version = {int(version)}")
+                db.commit()
+            except sqlite3.Error as e:
+                db.rollback()
+                self._report(f"Migration {version} ({description}) failed: {e}")
+                return
+
+
+# Process-wide store for the caches, metrics and keys
+storage = Storage(flush_interval=config.STORAGE_FLUSH_INTERVAL)
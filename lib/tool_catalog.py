@@ -0,0 +1,102 @@
+import json
+from typing import Dict, Any, List, Optional
+
+from .intent_parser import INTEGER_PARAMETERS, PARAMETER_CHOICES, PARAMETER_DEFAULTS, SPATIAL_SIDES
+
+# Units of parameters that are not lengths in millimeters
+PARAMETER_UNITS = {
+    "number_of_teeth": "count",
+    "rows": "count",
+    "columns": "count",
+    "count": "count",
+    "angle": "degrees"
+}
+
+# Actions that work on the user's current selection
+SELECTION_ACTIONS = {"create_hole", "extrude_face", "move_body", "rectangular_pattern", "circular_pattern"}
+
+# Fixed, short system prompt. It never changes between requests so together
+# with the tool definitions it forms a stable prefix the API can cache.
+SYSTEM_PROMPT = (
+    "You turn Fusion 360 modeling requests into tool calls. "
+    "Call one tool per operation, in the order the operations must run. "
+    "All lengths are in millimeters; convert other units. "
+    "Omit parameters the user did not give; defaults are applied. "
+    "Tools marked 'needs selection' act on the geometry the user selected. "
+    "When the user names an existing body or part instead, pass its quoted name "
+    "from the design contents as target. New parts are placed clear of existing ones; "
+    "use near and side only when the user says where."
+)
+
+
+def _parameter_schema(action: str, parameter: str) -> Dict[str, Any]:
+    if parameter == "target":
+        return {"type": "string", "description": "existing body or part to use when nothing is selected"}
+    if parameter == "near":
+        return {"type": "string", "description": "existing part to place it next to"}
+    if parameter == "side":
+        return {"type": "string", "enum": list(SPATIAL_SIDES), "description": "side of near, default right"}
+    if parameter in PARAMETER_CHOICES:
+        return {
+            "type": "string",
+            "enum": list(PARAMETER_CHOICES[parameter]),
+            "description": f"{parameter.replace('_', ' ')}, default {PARAMETER_DEFAULTS[action][parameter]}"
+        }
+    unit = PARAMETER_UNITS.get(parameter, "mm")
+    schema: Dict[str, Any] = {"type": "integer" if parameter in INTEGER_PARAMETERS else "number"}
+    default = PARAMETER_DEFAULTS.get(action, {}).get(parameter)
+    description = parameter.replace('_', ' ') + ("" if unit == "count" else f" ({unit})")
+    if default is not None:
+        description += f", default {default:g}"
+    schema["description"] = description
+    return schema
+
+
+def build_tool(action: str, spec: Dict[str, Any]) -> Dict[str, Any]:
+    """OpenAI function tool for one entry of SUPPORTED_AI_COMMANDS"""
+    description = spec.get("description", action)
+    if action in SELECTION_ACTIONS:
+        description += " (needs selection)"
+    return {
+        "type": "function",
+        "function": {
+            "name": action,
+            "description": description,
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    parameter: _parameter_schema(action, parameter)
+                    for parameter in spec.get("parameters", [])
+                },
+                "additionalProperties": False
+            }
+        }
+    }
+
+
+class ToolCatalog:
+    """SUPPORTED_AI_COMMANDS compiled once into OpenAI tool definitions.
+
+    ``select`` returns the tools for a request in catalogue order, so the
+    same set of actions always produces byte-identical request prefixes.
+    """
+
+    def __init__(self, commands: Dict[str, Dict[str, Any]]):
+        self.actions = list(commands)
+        self.tools = {action: build_tool(action, spec) for action, spec in commands.items()}
+        self._subsets: Dict[frozenset, List[Dict[str, Any]]] = {}
+
+    def select(self, actions: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Tools for the given actions, or the whole catalogue when none are known"""
+        wanted = frozenset(action for action in (actions or []) if action in self.tools)
+        if not wanted:
+            wanted = frozenset(self.actions)
+        subset = self._subsets.get(wanted)
+        if subset is None:
+            subset = [self.tools[action] for action in self.actions if action in wanted]
+            self._subsets[wanted] = subset
+        return subset
+
+    def prompt_size(self, actions: Optional[List[str]] = None) -> int:
+        """Characters of system prompt and tool definitions sent for the given actions"""
+        return len(SYSTEM_PROMPT) + len(json.dumps(self.select(actions), separators=(',', ':')))
@@ -0,0 +1,38 @@
+"""
+Shared fixtures. The add-in folder is imported as a package the way Fusion
+loads it, on the recording adsk fake from benchmarks/, so the library
+modules run in a plain Python interpreter.
+"""
+import importlib
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+PACKAGE = "fusiongpt_addin"
+
+sys.path.insert(0, str(ROOT / "benchmarks"))
+import fake_adsk  # noqa: E402
+
+fake_adsk.install()
+if PACKAGE not in sys.modules:
+    package = types.ModuleType(PACKAGE)
+    package.__path__ = [str(ROOT)]
+    sys.modules[PACKAGE] = package
+
+
+config = importlib.import_module(f"{PACKAGE}.config")
+
+
+def load(name: str):
+    """Import lib.<name> from the add-in package"""
+    return importlib.import_module(f"{PACKAGE}.lib.{name}")
+
+
+@pytest.fixture
+def storage(tmp_path):
+    store = load("storage").Storage(str(tmp_path / "fusionGPT.db"), flush_interval=60)
+    yield store
+    store.close()
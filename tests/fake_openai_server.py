@@ -0,0 +1,98 @@
+"""
+A local stand-in for the streaming chat completions endpoint. Point
+config.AI_BASE_URL (or an OpenAI client's base_url) at ``server.url``.
+
+Each POST to /chat/completions answers with the chunks in ``server.chunks``
+as server-sent events over a chunked response. Every event is written in two
+halves, so the client sees events split across reads. ``end`` decides how
+the stream stops:
+
+- ``"done"``: ``data: [DONE]`` and a clean end of the body
+- ``"eof"``: a clean end of the body without [DONE]
+- ``"disconnect"``: the connection is dropped in the middle of an event
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+
+def tool_call_chunks(calls: List[tuple], pieces: int = 3, model: str = "fake-model") -> List[Dict[str, Any]]:
+    """Chunks streaming (name, arguments) tool calls, each call's arguments split into pieces"""
+    chunks = []
+    for index, (name, arguments) in enumerate(calls):
+        text = json.dumps(arguments)
+        size = max(1, -(-len(text) // pieces))
+        chunks.append(_chunk(model, {"tool_calls": [{
+            "index": index, "id": f"call_{index}", "type": "function",
+            "function": {"name": name, "arguments": ""}
+        }]}))
+        for start in range(0, len(text), size):
+            chunks.append(_chunk(model, {"tool_calls": [{
+                "index": index, "function": {"arguments": text[start:start + size]}
+            }]}))
+    chunks.append(_chunk(model, {}, finish_reason="tool_calls"))
+    return chunks
+
+
+def _chunk(model: str, delta: Dict[str, Any], finish_reason: Optional[str] = None) -> Dict[str, Any]:
+    return {
+        "id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": 0, "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+    }
+
+
+class FakeOpenAIServer:
+    def __init__(self):
+        self.chunks: List[Dict[str, Any]] = []
+        self.end = "done"
+        self.requests: List[Dict[str, Any]] = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                server.requests.append(json.loads(body or b"{}"))
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+                events = [f"data: {json.dumps(chunk)}\n\n".encode() for chunk in server.chunks]
+                if server.end == "done":
+                    events.append(b"data: [DONE]\n\n")
+                for number, event in enumerate(events):
+                    half = len(event) // 2
+                    self._write(event[:half])
+                    if server.end == "disconnect" and number == len(events) // 2:
+                        # Drop the connection with the body and the event unfinished
+                        self.close_connection = True
+                        self.connection.shutdown(2)
+                        return
+                    self._write(event[half:])
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+
+            def _write(self, data: bytes):
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self._httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}/v1"
+
+    def start(self) -> "FakeOpenAIServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
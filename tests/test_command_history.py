@@ -0,0 +1,27 @@
+from conftest import load
+
+history_module = load("command_history")
+
+BOX = [{"action": "create_box", "parameters": {"length": 10, "width": 10, "height": 10}}]
+
+
+def test_recorded_commands_are_listed_at_once(storage):
+    history = history_module.CommandHistory(storage)
+
+    history.record("box 10mm", BOX, True)
+    entries = history.recent()
+
+    assert [entry["prompt"] for entry in entries] == ["box 10mm"]
+
+
+def test_macros_can_be_saved_from_commands_just_run(storage):
+    history = history_module.CommandHistory(storage)
+    history.record("box 10mm", BOX, True)
+    history.record("box 10mm again", BOX, True)
+
+    # A new database numbers the entries from 1
+    result = history.save_macro("boxes", 1, 2)
+
+    assert result["success"], result
+    assert result["steps"] == 2
+    assert [macro["name"] for macro in history.macros()] == ["boxes"]
@@ -0,0 +1,68 @@
+from types import SimpleNamespace
+
+import adsk.fusion
+import pytest
+
+from conftest import config, load
+
+design_index = load("design_index")
+ai_service = load("ai_service")
+
+
+def _design():
+    corner = SimpleNamespace(x=0.0, y=0.0, z=0.0)
+    body = SimpleNamespace(entityToken="body-1", name="Bracket", isValid=True,
+                           boundingBox=SimpleNamespace(minPoint=corner, maxPoint=corner))
+    root = SimpleNamespace(id="root", bRepBodies=[body], allOccurrences=[])
+    return SimpleNamespace(rootComponent=root, designType=adsk.fusion.DesignTypes.DirectDesignType)
+
+
+@pytest.fixture
+def index():
+    index = design_index.DesignIndex()
+    index.sync(_design())
+    return index
+
+
+def test_pronouns_refer_to_the_design_but_name_nothing(index):
+    assert index.refers_to_design("move it 10mm in x")
+    assert not index.names_entity("move it 10mm in x")
+
+
+def test_names_match_whole_words_only(index):
+    assert index.names_entity("extrude the bracket face 5mm")
+    assert not index.names_entity("extrude the bracketing 5mm")
+
+
+@pytest.fixture
+def service(monkeypatch, index):
+    for setting in ("AI_CACHE_ENABLED", "AI_SIMILARITY_CACHE_ENABLED"):
+        monkeypatch.setattr(config, setting, False)
+    monkeypatch.setattr(ai_service.metrics, "enabled", False)
+    monkeypatch.setattr(ai_service.openai_client, "get_client", lambda: object())
+    service = ai_service.AIService()
+    service.design_index = index
+    contexts = []
+
+    def interpret(context):
+        contexts.append(context)
+        return {"success": True, "actions": [{"action": "move_body", "parameters": {}}], "source": "openai"}
+
+    monkeypatch.setattr(service, "_within_budget",
+                        lambda user_input, models, local_response, on_progress, context: interpret(context))
+    monkeypatch.setattr(service, "_lookup_or_interpret",
+                        lambda user_input, models, on_progress, context="": interpret(context))
+    service.contexts = contexts
+    return service
+
+
+def test_confident_selection_command_stays_local(service):
+    response = service.process_natural_language_command("move it 15mm in x")
+    assert response["source"] == "local"
+    assert service.contexts == []
+
+
+def test_named_part_gets_design_context(service):
+    response = service.process_natural_language_command("move the bracket 15mm in x")
+    assert response["source"] == "openai"
+    assert "Bracket" in service.contexts[0]
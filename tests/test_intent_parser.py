@@ -0,0 +1,41 @@
+import pytest
+
+from conftest import config, load
+
+intent_parser = load("intent_parser")
+
+
+@pytest.fixture(scope="module")
+def parser():
+    return intent_parser.IntentParser(config.SUPPORTED_AI_COMMANDS)
+
+
+@pytest.mark.parametrize("prompt", ["create a 25mm cube", "create cube 25mm", "make a cube of 25 mm"])
+def test_one_size_applies_to_every_side_of_a_cube(parser, prompt):
+    result = parser.parse(prompt)
+    assert result["parameters"] == {"length": 25, "width": 25, "height": 25}
+    assert result["confidence"] >= config.LOCAL_PARSER_MIN_CONFIDENCE
+
+
+@pytest.mark.parametrize("prompt, size", [("cube 1e3", 1000), ("create a 2.5e1mm cube", 25)])
+def test_exponent_notation_is_one_number(parser, prompt, size):
+    result = parser.parse(prompt)
+    assert result["parameters"] == {"length": size, "width": size, "height": size}
+
+
+@pytest.mark.parametrize("prompt, error", [
+    ("cube -5mm", "length must be positive"),
+    ("create a gear with 0 teeth", "number of teeth must be at least 6"),
+    ("cylinder radius 0 height 20", "radius must be positive"),
+])
+def test_values_that_cannot_be_built_are_rejected(parser, prompt, error):
+    result = parser.parse(prompt)
+    assert not result["success"]
+    assert result["confidence"] == 0.0
+    assert error in result["error"]
+
+
+def test_offsets_may_be_negative(parser):
+    result = parser.parse("move the body -15mm in x")
+    assert result["success"]
+    assert result["parameters"] == {"x": -15, "y": 0, "z": 0}
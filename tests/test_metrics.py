@@ -0,0 +1,19 @@
+from conftest import load
+
+metrics_module = load("metrics")
+
+
+def test_stage_percentiles_span_every_action(storage):
+    metrics = metrics_module.MetricsStore(storage)
+    for duration in (100, 200, 300):
+        metrics.record("fusion_action", duration, action="a")
+    for duration in (1, 2, 3):
+        metrics.record("fusion_action", duration, action="b")
+
+    summary = metrics.summary()
+
+    stage = summary["stages"][0]
+    assert (stage["count"], stage["p50"], stage["p95"]) == (6, 3.0, 300.0)
+    actions = {row["action"]: row for row in summary["actions"]}
+    assert actions["a"]["p50"] == 200.0
+    assert actions["b"]["p50"] == 2.0
@@ -0,0 +1,58 @@
+import pytest
+
+from conftest import config, load
+
+ai_service = load("ai_service")
+
+
+class BadRequest(Exception):
+    status_code = 404
+
+
+@pytest.fixture
+def service(monkeypatch):
+    for setting in ("AI_CACHE_ENABLED", "AI_SIMILARITY_CACHE_ENABLED"):
+        monkeypatch.setattr(config, setting, False)
+    monkeypatch.setattr(ai_service.metrics, "enabled", False)
+    return ai_service.AIService()
+
+
+def _answers(monkeypatch, service, errors):
+    asked = []
+
+    def complete(request, on_progress, deadline):
+        asked.append(request["model"])
+        if request["model"] in errors:
+            raise errors[request["model"]]
+        return {"success": True, "actions": [{"action": "create_box", "parameters": {}}]}
+
+    monkeypatch.setattr(service, "_complete_with_retries", complete)
+    return asked
+
+
+def test_rejected_request_is_escalated(monkeypatch, service):
+    asked = _answers(monkeypatch, service, {"fast": BadRequest("model not found")})
+
+    response = service._process_with_openai("make a box", ["fast", "large"])
+
+    assert response["success"]
+    assert asked == ["fast", "large"]
+    assert service.router.stats()["escalations"] == 1
+
+
+def test_last_tier_error_is_returned(monkeypatch, service):
+    _answers(monkeypatch, service, {"fast": BadRequest("no"), "large": BadRequest("model not found")})
+
+    response = service._process_with_openai("make a box", ["fast", "large"])
+
+    assert not response["success"]
+    assert "model not found" in response["error"]
+
+
+def test_outage_is_not_escalated(monkeypatch, service):
+    asked = _answers(monkeypatch, service, {"fast": ConnectionError("connection reset")})
+
+    response = service._process_with_openai("make a box", ["fast", "large"])
+
+    assert not response["success"]
+    assert asked == ["fast"]
@@ -0,0 +1,37 @@
+import fake_adsk
+import pytest
+
+from conftest import config, load
+
+modeling = load("ai_modeling_actions")
+modeling.metrics.enabled = False
+
+
+@pytest.fixture
+def design():
+    return fake_adsk.new_document()
+
+
+@pytest.mark.parametrize("instancing", [True, False])
+def test_new_parts_are_placed_whatever_the_instancing_setting(design, monkeypatch, instancing):
+    monkeypatch.setattr(config, "INSTANCE_REPEATED_PARTS", instancing)
+    actions = modeling.AIModelingActions()
+
+    for _ in range(2):
+        assert actions.execute_command("create_box", {"length": 20, "width": 20, "height": 20})["success"]
+
+    occurrences = design.rootComponent.occurrences
+    assert occurrences.count == 2
+    # Row layout: the second cube sits PLACEMENT_GAP to the right of the first
+    assert occurrences.item(1).transform2.translation.x == pytest.approx((20 + config.PLACEMENT_GAP) / 10)
+    components = {occurrences.item(index).component for index in range(2)}
+    assert len(components) == (1 if instancing else 2)
+
+
+def test_parts_need_an_active_design(monkeypatch):
+    # A drawing or CAM document is active
+    monkeypatch.setattr(fake_adsk.Application.get(), "_product", object())
+
+    result = modeling.AIModelingActions().execute_command("create_box", {"length": 20, "width": 20, "height": 20})
+
+    assert not result["success"]
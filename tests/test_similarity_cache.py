@@ -0,0 +1,81 @@
+import itertools
+import json
+import random
+import statistics
+import time
+
+import pytest
+
+from conftest import config, load
+
+similarity = load("similarity_cache")
+intent_parser = load("intent_parser")
+
+
+@pytest.fixture
+def cache(storage):
+    parser = intent_parser.IntentParser(config.SUPPORTED_AI_COMMANDS)
+    return similarity.SimilarityCache("model", 1, keywords=parser.candidate_actions,
+                                      defaults=intent_parser.PARAMETER_DEFAULTS, store=storage)
+
+
+def _move(x, y=0, z=0):
+    return {"success": True, "actions": [{"action": "move_body", "parameters": {"x": x, "y": y, "z": z}}]}
+
+
+def test_reuses_interpretation_with_new_number(cache):
+    assert cache.add("shift body 15mm along x axis", _move(15))
+    response = cache.lookup("shift body 30mm along x axis")
+    assert response["actions"][0]["parameters"] == {"x": 30, "y": 0, "z": 0}
+
+
+@pytest.mark.parametrize("axis", ["y", "z"])
+def test_other_axis_is_not_reused(cache, axis):
+    assert cache.add("shift body 15mm along x axis", _move(15))
+    assert cache.lookup(f"shift body 30mm along {axis} axis") is None
+
+
+def test_different_dimension_word_is_not_reused(cache):
+    response = {"success": True, "actions": [{"action": "create_hole", "parameters": {"diameter": 8, "depth": 12}}]}
+    assert cache.add("drill hole 8mm diameter 12mm deep", response)
+    assert cache.lookup("drill hole 8mm radius 12mm deep") is None
+
+
+def test_lookups_stay_under_a_millisecond_at_20k_templates_without_numpy(storage, monkeypatch):
+    # Fusion's Python has no NumPy
+    monkeypatch.setattr(similarity, "NUMPY_AVAILABLE", False)
+    parser = intent_parser.IntentParser(config.SUPPORTED_AI_COMMANDS)
+    adjectives = "small large thin thick tall short wide narrow round flat solid hollow".split()
+    nouns = ("bracket plate flange spacer shim block base mount holder clip rail beam post pad foot cap lid ring "
+             "washer bushing collar hub arm link lever panel tab rib boss web").split()
+    shapes = ["box", "cylinder", "sphere", "cube"]
+    response = json.dumps({"success": True, "actions": [{"action": "create_box", "parameters": {"length": 10}}]})
+    rows = []
+    for adjective, (first, second), shape in itertools.islice(
+            itertools.product(adjectives, itertools.combinations(nouns, 2), shapes), 20000):
+        template = f"{adjective} {first} {second} {shape} {similarity.SLOT}"
+        rows.append((template, "model", 1, json.dumps(parser.candidate_actions(template)),
+                     json.dumps(similarity.slot_contexts(template)), json.dumps([[0, "length", 0, 1.0]]),
+                     response, 0.0, 0.0, 0))
+    storage.write_many("INSERT INTO similarity_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    storage.flush()
+    cache = similarity.SimilarityCache("model", 1, keywords=parser.candidate_actions, store=storage)
+    assert cache.lookup("warm up 1mm") is None
+    assert cache.stats()["entries"] == 20000
+
+    rng = random.Random(7)
+    prompts = []
+    for template, *_ in rng.sample(rows, 200):
+        adjective, first, second, shape = template.split()[:4]
+        prompts.append(f"{adjective} {first}s {second} {shape} 12mm")  # another spelling of a stored template
+        prompts.append(f"shiny {first} {second} {shape} 12mm")  # a template that was never stored
+    timings = []
+    hits = 0
+    for prompt in prompts:
+        started = time.perf_counter()
+        hits += cache.lookup(prompt) is not None
+        timings.append((time.perf_counter() - started) * 1000)
+
+    # Plurals of short words mostly fall below the threshold; the lookups must still find the rest
+    assert hits > 0
+    assert statistics.median(timings) < 1.0
@@ -0,0 +1,68 @@
+import sqlite3
+import threading
+
+import pytest
+
+from conftest import load
+
+storage_module = load("storage")
+
+INSERT_MACRO = "INSERT INTO macros (name, actions, prompts, created_at, updated_at) VALUES (?, '[]', '[]', 0, 0)"
+
+
+def test_reads_do_not_commit_queued_writes(storage):
+    storage.write(INSERT_MACRO, ("m",))
+
+    assert storage.query_one("SELECT name FROM macros") is None
+    assert storage.batches == 0
+
+    storage.flush()
+    assert storage.query_one("SELECT name FROM macros") == ("m",)
+
+
+def test_reads_do_not_wait_for_the_writer(storage):
+    storage.migrate()
+    writing, done = threading.Event(), threading.Event()
+
+    def write():
+        # Hold the write connection inside an open transaction
+        with storage._db_lock:
+            storage._db.execute(INSERT_MACRO, ("m",))
+            writing.set()
+            done.wait(5)
+            storage._db.rollback()
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    try:
+        assert writing.wait(5)
+        assert storage.query("SELECT name FROM macros") == []
+    finally:
+        done.set()
+        writer.join()
+
+
+def test_read_connection_is_read_only(storage):
+    storage.migrate()
+    with pytest.raises(sqlite3.OperationalError):
+        storage.query("DELETE FROM macros")
+
+
+def test_fresh_reads_see_queued_writes(storage):
+    storage.write(INSERT_MACRO, ("m",))
+
+    assert storage.query_one("SELECT name FROM macros", fresh=True) == ("m",)
+
+
+def test_a_failing_statement_only_drops_itself(storage):
+    reported = []
+    storage.log = reported.append
+    storage.write(INSERT_MACRO, ("a",))
+    storage.write("INSERT INTO no_such_table VALUES (1)")
+    storage.write(INSERT_MACRO, ("b",))
+
+    storage.flush()
+
+    assert storage.query("SELECT name FROM macros ORDER BY name") == [("a",), ("b",)]
+    assert (storage.statements, storage.failed) == (2, 1)
+    assert len(reported) == 1 and "no_such_table" in reported[0]
@@ -0,0 +1,63 @@
+import pytest
+
+from conftest import load
+from fake_openai_server import FakeOpenAIServer, tool_call_chunks
+
+openai = pytest.importorskip("openai")
+ai_service = load("ai_service")
+openai_client = load("openai_client")
+
+
+@pytest.fixture
+def server():
+    server = FakeOpenAIServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(ai_service.metrics, "enabled", False)
+    for setting in ("AI_CACHE_ENABLED", "AI_SIMILARITY_CACHE_ENABLED"):
+        monkeypatch.setattr(ai_service.config, setting, False)
+    return ai_service.AIService()
+
+
+@pytest.fixture
+def client(server):
+    client = openai.OpenAI(api_key="test", base_url=server.url, max_retries=0, timeout=5)
+    yield client
+    client.close()
+
+
+REQUEST = {"model": "fake-model", "messages": [{"role": "user", "content": "two parts"}]}
+CALLS = [
+    ("create_box", {"length": 30, "width": 20, "height": 10}),
+    ("create_cylinder", {"radius": 5, "height": 40}),
+]
+
+
+def test_tool_call_deltas_are_assembled(server, service, client):
+    server.chunks = tool_call_chunks(CALLS, pieces=4)
+    progress = []
+
+    response = service._stream_completion(client, dict(REQUEST), progress.append)
+
+    assert response["success"]
+    assert [step["action"] for step in response["actions"]] == ["create_box", "create_cylinder"]
+    assert response["actions"][0]["parameters"] == {"length": 30, "width": 20, "height": 10}
+    assert response["actions"][1]["parameters"] == {"radius": 5, "height": 40}
+    # The first step is reported as soon as the second one starts
+    assert "Interpreting… create_box" in progress
+    assert any("length 30" in status for status in progress)
+
+
+@pytest.mark.parametrize("end", ["eof", "disconnect"])
+def test_truncated_stream_is_a_transient_error(server, service, client, end):
+    server.chunks = tool_call_chunks(CALLS)[:-1]
+    server.end = end
+
+    with pytest.raises(Exception) as raised:
+        service._stream_completion(client, dict(REQUEST), None)
+
+    assert openai_client.is_transient(raised.value)